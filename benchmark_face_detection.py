@@ -0,0 +1,81 @@
+import argparse
+import glob
+import os
+import tempfile
+import time
+
+from benchmark_modules import read_frames
+from library.face_detection import FaceDetector, OnnxFaceDetector, export_onnx
+from utils.config import load_config
+from utils.device import create_face_analysis, load_device_config
+
+
+def clip_frames(pattern, frames_per_clip):
+    """
+    first frames of every clip, the clips differ in resolution and orientation
+    """
+    frames = []
+    for video_path in sorted(glob.glob(pattern)):
+        frames += read_frames([video_path], frames_per_clip)
+    return frames
+
+
+def benchmark(detect_batch, frames, batch_size=1, warmup=3):
+    """
+    :return: Tuple (frames per second, faces per frame)
+    """
+    detect_batch(frames[:warmup])
+
+    num_faces = 0
+    start = time.perf_counter()
+    for begin in range(0, len(frames), batch_size):
+        num_faces += sum(len(bboxes) for bboxes, _ in detect_batch(frames[begin:begin + batch_size]))
+    elapsed = time.perf_counter() - start
+    return len(frames) / elapsed, num_faces / len(frames)
+
+
+def insightface_detect_batch(configs):
+    """
+    detection module of the configured FaceAnalysis, one frame at a time
+    """
+    device_config = load_device_config(configs)
+    face_app = create_face_analysis(configs["models"]["face_analysis_model"], device_config,
+                                    allowed_modules=["detection"], det_size=(640, 640))
+    det_model = face_app.det_model
+    return lambda frames: [det_model.detect(frame, max_num=0, metric='default') for frame in frames]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Detection FPS: RetinaFace input sizes and backends vs InsightFace")
+    parser.add_argument("--videos", default="face_data/*.mp4")
+    parser.add_argument("--frames", type=int, default=10, help="frames per clip")
+    parser.add_argument("--model", default="data/pretrained/retina_face.pth.tar")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[640, 480, 320])
+    parser.add_argument("--batch-size", type=int, default=4)
+    args = parser.parse_args()
+
+    frames = clip_frames(args.videos, args.frames)
+    if not frames:
+        raise SystemExit(f"No frames read from {args.videos}")
+
+    detectors = {}
+    try:
+        detectors["insightface 640"] = (insightface_detect_batch(load_config()), 1)
+    except Exception as e:
+        print(f"InsightFace detector unavailable, skipped: {e}")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        onnx_path = export_onnx(args.model, os.path.join(tmp_dir, "retina_face.onnx"))
+        for size in args.sizes:
+            input_size = (size, size)
+            detector = FaceDetector(args.model, input_size=input_size, max_images=args.batch_size)
+            detectors[f"retinaface torch {size}"] = (detector.detect_batch, 1)
+            detectors[f"retinaface torch {size} x{args.batch_size}"] = (detector.detect_batch, args.batch_size)
+            onnx_detector = OnnxFaceDetector(onnx_path, input_size=input_size, max_images=args.batch_size)
+            detectors[f"retinaface onnx {size}"] = (onnx_detector.detect_batch, 1)
+
+    print(f"\n{len(frames)} frames from {args.videos}, {os.cpu_count()} CPU")
+    print(f"{'detector':<28}{'FPS':>8}{'faces/frame':>14}")
+    for name, (detect_batch, batch_size) in detectors.items():
+        fps, faces = benchmark(detect_batch, frames, batch_size)
+        print(f"{name:<28}{fps:>8.2f}{faces:>14.2f}")
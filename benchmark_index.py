@@ -0,0 +1,90 @@
+import argparse
+import os
+import time
+
+import numpy as np
+
+from recognition.index import create_index
+from recognition.matcher import GalleryMatcher
+from utils.encoding import load_face_encodings
+
+
+def load_gallery(encoding_path, size, seed=0):
+    """
+    Enrolled gallery, padded with synthetic identities up to `size` rows.
+    """
+    rng = np.random.default_rng(seed)
+    gallery = np.empty((0, 512), dtype=np.float32)
+    if os.path.isfile(encoding_path):
+        gallery = GalleryMatcher.normalize(load_face_encodings(encoding_path)["encoding"])
+
+    if len(gallery) < size:
+        synthetic = rng.normal(size=(size - len(gallery), gallery.shape[1] if len(gallery) else 512))
+        gallery = np.concatenate([gallery, GalleryMatcher.normalize(synthetic)])
+    return gallery
+
+
+def make_queries(gallery, num_queries, noise, seed=1):
+    """
+    New captures of enrolled people: gallery rows with gaussian noise.
+    """
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(gallery), num_queries, replace=num_queries > len(gallery))
+    return GalleryMatcher.normalize(gallery[rows] + rng.normal(scale=noise, size=(num_queries, gallery.shape[1])))
+
+
+def run(index, queries, k, batch_size):
+    """
+    :return: Tuple (indices, ms per query)
+    """
+    results = []
+    start = time.perf_counter()
+    for i in range(0, len(queries), batch_size):
+        results.append(index.search(queries[i:i + batch_size], k)[1])
+    elapsed = time.perf_counter() - start
+    return np.concatenate(results), elapsed * 1000 / len(queries)
+
+
+def recall(found, truth):
+    """
+    fraction of the exact top-k found by the approximate search
+    """
+    hits = sum(len(np.intersect1d(f, t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall vs latency of gallery indexes against exact search")
+    parser.add_argument("--encoding", default="encoding_face.yaml")
+    parser.add_argument("--size", type=int, default=100000, help="gallery size, padded with synthetic identities")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--noise", type=float, default=0.03)
+    parser.add_argument("--k", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=1)
+    args = parser.parse_args()
+
+    gallery = load_gallery(args.encoding, args.size)
+    queries = make_queries(gallery, args.queries, args.noise)
+    print(f"gallery: {gallery.shape}, queries: {queries.shape}, k={args.k}, batch={args.batch_size}")
+
+    exact = create_index("flat").build(gallery)
+    truth, exact_ms = run(exact, queries, args.k, args.batch_size)
+    print(f"{'index':<32}{'build (s)':>12}{'ms/query':>12}{'recall':>10}")
+    print(f"{'flat':<32}{'-':>12}{exact_ms:>12.3f}{1.0:>10.4f}")
+
+    nlist = max(1, int(np.sqrt(len(gallery))))
+    candidates = [("ivf", dict(nlist=nlist, nprobe=nprobe)) for nprobe in (1, 4, 8, 16, 32)]
+    candidates += [("ivf", dict(nlist=nlist, nprobe=8, dtype="float16"))]
+    candidates += [("hnsw", dict(M=16, ef_search=ef)) for ef in (16, 64, 128)]
+
+    for kind, params in candidates:
+        try:
+            start = time.perf_counter()
+            index = create_index(kind, **params).build(gallery)
+            build_time = time.perf_counter() - start
+        except ImportError as e:
+            print(f"{kind:<32} skipped: {e}")
+            continue
+        found, ms = run(index, queries, args.k, args.batch_size)
+        name = kind + " " + ",".join(f"{key}={value}" for key, value in params.items())
+        print(f"{name:<32}{build_time:>12.2f}{ms:>12.3f}{recall(found, truth):>10.4f}")
@@ -0,0 +1,72 @@
+import argparse
+import glob
+import itertools
+import time
+
+import cv2
+
+from utils.config import load_config
+from utils.device import load_device_config, create_face_analysis
+
+REQUIRED_MODULES = ["detection", "recognition"]
+OPTIONAL_MODULES = ["landmark_3d_68", "landmark_2d_106", "genderage"]
+
+
+def read_frames(video_paths, num_frames):
+    """
+    first frames of the clips
+    """
+    frames = []
+    for video_path in video_paths:
+        cap = cv2.VideoCapture(video_path)
+        while len(frames) < num_frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(frame)
+        cap.release()
+        if len(frames) >= num_frames:
+            break
+    return frames
+
+
+def benchmark(modules, frames, model_name, device_config, warmup=3):
+    """
+    :return: Tuple (ms per frame, faces per frame)
+    """
+    face_app = create_face_analysis(model_name, device_config, allowed_modules=modules, det_size=(640, 640))
+
+    for frame in frames[:warmup]:
+        face_app.get(frame)
+
+    num_faces = 0
+    start = time.perf_counter()
+    for frame in frames:
+        num_faces += len(face_app.get(frame))
+    elapsed = time.perf_counter() - start
+    return elapsed * 1000 / len(frames), num_faces / len(frames)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-frame latency of each InsightFace module combination")
+    parser.add_argument("--videos", default="face_data/*.mp4")
+    parser.add_argument("--frames", type=int, default=100)
+    args = parser.parse_args()
+
+    configs = load_config()
+    model_name = configs["models"]["face_analysis_model"]
+    device_config = load_device_config(configs)
+    frames = read_frames(sorted(glob.glob(args.videos)), args.frames)
+    if not frames:
+        raise SystemExit(f"No frames read from {args.videos}")
+
+    results = []
+    for size in range(len(OPTIONAL_MODULES) + 1):
+        for extra in itertools.combinations(OPTIONAL_MODULES, size):
+            modules = REQUIRED_MODULES + list(extra)
+            results.append((modules, *benchmark(modules, frames, model_name, device_config)))
+
+    print(f"\n{len(frames)} frames, providers: {device_config['providers']}")
+    print(f"{'modules':<70}{'ms/frame':>10}{'faces':>8}")
+    for modules, ms, faces in results:
+        print(f"{' + '.join(modules):<70}{ms:>10.2f}{faces:>8.2f}")
@@ -0,0 +1,69 @@
+import argparse
+import os
+import tempfile
+
+import numpy as np
+
+from benchmark_spoofing import benchmark
+from library.face_antspoofing import (SpoofingDetector, OnnxSpoofingDetector, export_onnx, calibration_crops,
+                                      load_crops, quantize_dynamic_models, quantize_onnx)
+from spoofing_samples import evaluate, make_batch, read_frame, split_crops
+
+
+def labelled_crops(folder, margin=0.4):
+    """
+    ground truth crops for accuracy: `folder`/real/*.jpg and `folder`/spoof/*.jpg, never used for calibration
+    """
+    return (load_crops(os.path.join(folder, "real", "*.jpg"), margin=margin)
+            + load_crops(os.path.join(folder, "spoof", "*.jpg"), margin=margin))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Accuracy and latency of the int8 anti-spoofing modes")
+    parser.add_argument("--model", default="data/pretrained/fasnet_v1se_v2.pth.tar")
+    parser.add_argument("--onnx", default="data/cache/fasnet_v1se_v2.onnx")
+    parser.add_argument("--violations", default="violations_folder")
+    parser.add_argument("--dataset", default="dataset")
+    parser.add_argument("--labelled", help="folder of real/ and spoof/ crops kept out of calibration, "
+                                           "accuracy is only reported with it")
+    parser.add_argument("--video", default="face_data/kien.mp4")
+    parser.add_argument("--faces", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.onnx):
+        export_onnx(args.model, args.onnx)
+    calibration, held_out = split_crops(calibration_crops(args.violations, args.dataset))
+    if not held_out:
+        raise SystemExit(f"No crops in {args.violations} or {args.dataset}")
+    labelled = labelled_crops(args.labelled) if args.labelled else []
+    is_real = np.array([label == "real" for _, _, label in labelled], dtype=bool)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        quantized_path = quantize_onnx(args.onnx, os.path.join(tmp_dir, "int8.onnx"),
+                                       OnnxSpoofingDetector(args.onnx), calibration)
+        # the session holds the model once loaded, the int8 file is removed with the directory
+        quantized = OnnxSpoofingDetector(quantized_path)
+    detectors = {
+        "torch float": SpoofingDetector(args.model, device="cpu"),
+        "torch dynamic": SpoofingDetector(args.model, device="cpu"),
+        "onnx float": OnnxSpoofingDetector(args.onnx),
+        "onnx static": quantized,
+    }
+    quantize_dynamic_models(detectors["torch dynamic"].model)
+    reference = {"torch dynamic": "torch float", "onnx static": "onnx float"}
+
+    print(f"calibration crops: {len(calibration)}, held-out crops: {len(held_out)}, "
+          f"labelled crops: {len(labelled)} (real: {is_real.sum()}, spoof: {(~is_real).sum()})")
+    frame = read_frame(args.video)
+    results = {name: evaluate(detector, held_out) for name, detector in detectors.items()}
+
+    print(f"{'mode':<16}{'accuracy':>10}{'agreement':>11}{'max diff':>10}"
+          + "".join(f"{f'{n} faces (ms)':>16}" for n in args.faces))
+    for name, detector in detectors.items():
+        scores, real = results[name]
+        ref_scores, ref_real = results[reference.get(name, name)]
+        accuracy = f"{(evaluate(detector, labelled)[1] == is_real).mean():>10.3f}" if labelled else f"{'n/a':>10}"
+        timings = [benchmark(detector, frame, make_batch(frame, n), args.repeat) for n in args.faces]
+        print(f"{name:<16}{accuracy}{(real == ref_real).mean():>11.3f}"
+              f"{np.abs(scores - ref_scores).max():>10.4f}" + "".join(f"{ms:>16.2f}" for ms in timings))
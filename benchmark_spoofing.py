@@ -0,0 +1,44 @@
+import argparse
+import os
+import time
+
+from library.face_antspoofing import SpoofingDetector, OnnxSpoofingDetector, export_onnx
+from spoofing_samples import make_batch, read_frame
+
+
+def benchmark(detector, frame, boxes, repeat=20, warmup=3):
+    """
+    :return: ms per predict call
+    """
+    for _ in range(warmup):
+        detector(boxes, frame)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        detector(boxes, frame)
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latency of the anti-spoofing backends")
+    parser.add_argument("--model", default="data/pretrained/fasnet_v1se_v2.pth.tar")
+    parser.add_argument("--onnx", default="data/cache/fasnet_v1se_v2.onnx")
+    parser.add_argument("--video", default="face_data/kien.mp4")
+    parser.add_argument("--faces", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.onnx):
+        export_onnx(args.model, args.onnx)
+
+    detectors = {
+        "torch": SpoofingDetector(args.model, device="cpu"),
+        "torch concurrent": SpoofingDetector(args.model, device="cpu", concurrent=True),
+        "onnx": OnnxSpoofingDetector(args.onnx),
+        "onnx concurrent": OnnxSpoofingDetector(args.onnx, concurrent=True),
+    }
+
+    frame = read_frame(args.video)
+    print(f"{'backend':<24}" + "".join(f"{f'{n} faces (ms)':>16}" for n in args.faces))
+    for name, detector in detectors.items():
+        timings = [benchmark(detector, frame, make_batch(frame, n), args.repeat) for n in args.faces]
+        print(f"{name:<24}" + "".join(f"{ms:>16.2f}" for ms in timings))
@@ -0,0 +1,45 @@
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+
+LOAD_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from library.face_antspoofing import SpoofingDetector
+imported = time.perf_counter()
+SpoofingDetector(sys.argv[1], device=sys.argv[2], cache_dir=sys.argv[3] or None)
+print(json.dumps({"import": imported - start, "load": time.perf_counter() - imported}))
+"""
+
+
+def run(model_path, device, cache_dir):
+    """
+    Load the detector in a fresh interpreter, like a kiosk start.
+    :return: dict of seconds: import, load, process (whole interpreter)
+    """
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, "-c", LOAD_SCRIPT, model_path, device, cache_dir],
+                            check=True, capture_output=True, text=True).stdout
+    timings = json.loads(output.strip().splitlines()[-1])
+    timings["process"] = time.perf_counter() - start
+    return timings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cold and warm start of the anti-spoofing detector")
+    parser.add_argument("--model", default="data/pretrained/fasnet_v1se_v2.pth.tar")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    results = [("no cache", run(args.model, args.device, ""))]
+    with tempfile.TemporaryDirectory() as cache_dir:
+        results.append(("cold cache", run(args.model, args.device, cache_dir)))
+        results += [("warm cache", run(args.model, args.device, cache_dir)) for _ in range(args.repeat)]
+
+    print(f"{'run':<14}{'import (s)':>12}{'load (s)':>12}{'process (s)':>14}")
+    for name, timings in results:
+        print(f"{name:<14}{timings['import']:>12.3f}{timings['load']:>12.3f}{timings['process']:>14.3f}")
@@ -0,0 +1,141 @@
+import argparse
+import os
+import threading
+import time
+
+import numpy as np
+
+from library.task_manager import (ProcessWorker, SpoofingDetectorProcessWorker, SpoofingDetectorWorker, Worker,
+                                  WorkerPool, stop_worker)
+
+
+def frame_mean(frame):
+    return float(frame[::64, ::64].mean())
+
+
+class FrameMeanWorker(Worker):
+    """Cheap processor, the timing is the request transport"""
+
+    def processor(self):
+        return frame_mean
+
+
+class FrameMeanProcessWorker(ProcessWorker):
+    def processor(self):
+        return frame_mean
+
+
+def benchmark(worker, frame, repeat=100, warmup=5):
+    """
+    :return: ms per request, response included
+    """
+    for _ in range(warmup):
+        worker.request(frame).respond_data
+    start = time.perf_counter()
+    for _ in range(repeat):
+        worker.request(frame).respond_data
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def throughput(service, frame, boxes, requests=64):
+    """
+    every request in flight at once, like a pipeline stage
+    :return: requests per second
+    """
+    service.request(boxes, frame).respond_data
+    start = time.perf_counter()
+    messages = [service.request(boxes, frame) for _ in range(requests)]
+    for msg in messages:
+        msg.respond_data
+    return requests / (time.perf_counter() - start)
+
+
+def benchmark_spoofing(video, faces, replicas):
+    from spoofing_samples import make_batch, read_frame
+
+    frame = read_frame(video)
+    boxes = make_batch(frame, faces)
+    services = {"thread worker": SpoofingDetectorWorker()}
+    for count in replicas:
+        services[f"process pool x{count}"] = WorkerPool(lambda: SpoofingDetectorProcessWorker(frame_slots=4),
+                                                        replicas=count)
+
+    print(f"\n{faces} faces per request, {os.cpu_count()} CPU")
+    print(f"{'service':<22}{'requests/s':>12}")
+    for name, service in services.items():
+        service.start()
+        print(f"{name:<22}{throughput(service, frame, boxes):>12.2f}")
+        stop_worker(service)
+
+
+def camera_load(worker, frame, boxes, cameras, duration=5.0):
+    """
+    `cameras` threads, each sends its next request when the previous one is answered
+    :return: Tuple (requests per second, p50 latency ms, p95 latency ms)
+    """
+    latencies = []
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def camera():
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            worker.request(boxes, frame).respond_data
+            with lock:
+                latencies.append((time.perf_counter() - start) * 1000)
+
+    threads = [threading.Thread(target=camera) for _ in range(cameras)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(latencies) / duration, np.percentile(latencies, 50), np.percentile(latencies, 95)
+
+
+def benchmark_batching(video, faces, cameras, batch_sizes, max_wait_ms):
+    from spoofing_samples import make_batch, read_frame
+
+    frame = read_frame(video)
+    boxes = make_batch(frame, faces)
+    print(f"\n{cameras} cameras, {faces} faces per request, max_wait_ms {max_wait_ms}")
+    print(f"{'max_batch_size':<16}{'requests/s':>12}{'p50 (ms)':>10}{'p95 (ms)':>10}")
+    for batch_size in batch_sizes:
+        worker = SpoofingDetectorWorker(max_batch_size=batch_size, max_wait_ms=max_wait_ms)
+        worker.start()
+        worker.request(boxes, frame).respond_data
+        rate, p50, p95 = camera_load(worker, frame, boxes, cameras)
+        stop_worker(worker)
+        print(f"{batch_size:<16}{rate:>12.2f}{p50:>10.2f}{p95:>10.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Request latency of a Worker, pickled vs shared memory frames")
+    parser.add_argument("--sizes", nargs="+", default=["640x480", "1280x720", "1920x1080"])
+    parser.add_argument("--repeat", type=int, default=100)
+    parser.add_argument("--spoofing", action="store_true", help="also spoofing throughput, thread worker vs pools")
+    parser.add_argument("--video", default="face_data/kien.mp4")
+    parser.add_argument("--faces", type=int, default=4)
+    parser.add_argument("--replicas", type=int, nargs="+", default=[1, 2, os.cpu_count() or 1])
+    parser.add_argument("--batching", action="store_true", help="also micro-batching under concurrent cameras")
+    parser.add_argument("--cameras", type=int, default=4)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--max-wait-ms", type=float, default=5)
+    args = parser.parse_args()
+
+    # thread workers get the frame by reference, process workers pickle it or share it through the frame ring
+    print(f"{'frame':<12}{'thread (ms)':>14}{'pickle (ms)':>14}{'shared (ms)':>14}")
+    for size in args.sizes:
+        width, height = map(int, size.split("x"))
+        frame = np.random.default_rng(0).integers(0, 255, (height, width, 3), dtype=np.uint8)
+        timings = []
+        for worker in (FrameMeanWorker(), FrameMeanProcessWorker(),
+                       FrameMeanProcessWorker(frame_slots=4, frame_bytes=frame.nbytes)):
+            worker.start()
+            timings.append(benchmark(worker, frame, args.repeat))
+            stop_worker(worker)
+        print(f"{size:<12}" + "".join(f"{ms:>14.3f}" for ms in timings))
+
+    if args.spoofing:
+        benchmark_spoofing(args.video, args.faces, sorted(set(args.replicas)))
+    if args.batching:
+        benchmark_batching(args.video, args.faces, args.cameras, args.batch_sizes, args.max_wait_ms)
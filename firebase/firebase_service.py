@@ -1,9 +1,11 @@
 from datetime import datetime, timedelta
-from utils.config import load_config
+from utils.registry import get_config
+from utils.uploads import EncodedImage
 import firebase_admin
 from firebase_admin import credentials, db, auth
 import cloudinary
 import cloudinary.uploader
+import io
 import os
 
 
@@ -13,7 +15,7 @@ class FirebaseService:
         init Firebase with parameter from file config.yaml.
         """
         # load config file
-        self.configs = load_config(config_path)
+        self.configs = get_config(config_path)
 
         #firebase
         cred = credentials.Certificate(self.configs["firebase"]["credential_file"])
@@ -262,14 +264,15 @@ class FirebaseService:
     def upload_to_cloudinary(self, image_path, status):
         """
         upload image to Cloudinary.
-        :param image_path: path to image upload.
+        :param image_path: path to image upload, or EncodedImage (JPEG bytes uploaded without a file).
         :param status: unknown or spoof.
         :return: URL of image when upload successful.
         """
         folder = os.path.join(self.cloud_folder, status).replace("\\", "/")
+        image = io.BytesIO(image_path.data) if isinstance(image_path, EncodedImage) else image_path
         try:
             response = cloudinary.uploader.upload(
-                image_path,
+                image,
                 folder=folder,
                 overwrite=True,
                 resource_type="image"
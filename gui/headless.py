@@ -0,0 +1,46 @@
+import time
+
+# statuses the video processor sets every frame ("" = still checking), the other ones are attendance results
+FACE_STATUSES = {None, "", "waiting", "image", "spoof", "unknown"}
+
+
+class HeadlessApp:
+    """
+    Same interface as GUI for VideoProcessor and FirebaseProcessor, without a window:
+    frames are not rendered, status changes and attendance results are written to a sink.
+    """
+
+    def __init__(self, sink, source):
+        """
+        :param sink: object with write(event), see utils.sinks
+        :param source: camera index or video file, added to every event
+        """
+        self.sink = sink
+        self.source = source
+        self.frames = 0
+        self.face_status = None
+        self.process_infor_label = None
+
+    def emit(self, event_type, **fields):
+        self.sink.write({"type": event_type, "source": self.source, "time": time.time(), **fields})
+
+    def update_processed_frame(self, frame):
+        # nothing to render, count the frames for the stats
+        self.frames += 1
+
+    def update_image_label(self, status):
+        if status in FACE_STATUSES:
+            if status != self.face_status:
+                self.face_status = status
+                self.emit("face_status", status=status)
+        else:
+            self.emit("attendance", status=status, name=self.process_infor_label and self.process_infor_label[0])
+
+    def set_infor_label(self, name, major):
+        self.process_infor_label = (name, major)
+        self.emit("identity", name=name, major=major)
+
+    def reset_infor_label(self):
+        if self.process_infor_label is not None:
+            self.process_infor_label = None
+            self.emit("identity", name=None, major=None)
@@ -0,0 +1,85 @@
+import argparse
+import signal
+import sys
+import threading
+import time
+
+from gui.headless import HeadlessApp
+from main import open_sources, start_processors, start_services, start_uploads
+from firebase.firebase_service import FirebaseService
+from utils.drawing import DrawingTool
+from utils.registry import get_config
+from utils.sinks import StdoutSink, create_sink
+
+
+def run_headless(sink, sources=None, stats_interval=10.0):
+    """
+    VideoProcessor / FirebaseProcessor of every source without a display: nothing is rendered,
+    status changes, attendance results and per-stage stats are written to `sink` as they happen.
+    Returns when every source ended (video files) or on Ctrl+C.
+    :param sink: utils.sinks sink
+    :param sources: camera indices or video files. Default: `sources` of config.yaml
+    :param stats_interval: seconds between two "stats" events, 0 = off
+    """
+    configs = get_config()
+    captures = open_sources(sources or configs.get("sources") or [0])
+    if not captures:
+        return
+
+    services = start_services(configs, captures)
+    drawer = DrawingTool()
+    firebase = FirebaseService()
+    uploads = start_uploads(configs, firebase)
+    stop_event = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: stop_event.set())
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+
+    processors = []
+    for source, cap in captures:
+        app = HeadlessApp(sink, source)
+        video_processor, threads = start_processors(source, cap, app, configs, services, drawer, firebase,
+                                                    uploads, stop_event)
+        processors.append((app, video_processor, threads[0]))
+        app.emit("started")
+
+    next_stats = time.monotonic() + stats_interval
+    while not stop_event.is_set() and any(thread.is_alive() for _, _, thread in processors):
+        stop_event.wait(0.5)
+        if stats_interval and time.monotonic() >= next_stats:
+            for app, video_processor, _ in processors:
+                app.emit("stats", frames=app.frames, latency_ms=video_processor.frame_latency_ms,
+                         stages=video_processor.stats(), uploads=uploads.stats())
+            next_stats = time.monotonic() + stats_interval
+
+    stop_event.set()
+    for app, video_processor, thread in processors:
+        thread.join(5)
+        app.emit("stopped", frames=app.frames, stages=video_processor.stats(), uploads=uploads.stats())
+    for _, cap in captures:
+        cap.release()
+    if services is not None:
+        services.stop()
+    uploads.stop()
+    sink.close()
+
+
+def parse_source(value):
+    """camera index or video file"""
+    return int(value) if value.isdigit() else value
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Process camera streams without a display, results as JSON lines")
+    parser.add_argument("--sink", default="stdout", help="stdout, file:<path>, unix:<socket path> or tcp:<host>:<port>")
+    parser.add_argument("--sources", nargs="+", type=parse_source, help="camera indices or video files "
+                                                                        "(default: sources of config.yaml)")
+    parser.add_argument("--stats-interval", type=float, default=10.0, help="seconds between stats events, 0 = off")
+    args = parser.parse_args()
+
+    if args.sink == "stdout":
+        # the application logs with print, keep stdout for the JSON lines
+        sink = StdoutSink(sys.stdout)
+        sys.stdout = sys.stderr
+    else:
+        sink = create_sink(args.sink)
+    run_headless(sink, args.sources, args.stats_interval)
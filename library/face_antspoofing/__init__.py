@@ -1 +1,20 @@
-from library.face_antspoofing.detector import *
+import importlib
+
+from library.face_antspoofing.base import *
+from library.face_antspoofing.onnx_detector import *
+
+# torch (and the quantization tools) load on first use of their names, the onnx backend runs without them
+_LAZY_MODULES = {
+    "library.face_antspoofing.cache": ['CACHE_VERSION', 'cache_key', 'load_scripted_models', 'save_scripted_models'],
+    "library.face_antspoofing.detector": ['MulFasNet', 'SpoofingDetector'],
+    "library.face_antspoofing.onnx_export": ['export_onnx'],
+    "library.face_antspoofing.quantization": ['QUANTIZATION_MODES', 'load_crops', 'calibration_crops',
+                                              'quantize_dynamic_models', 'quantize_onnx', 'CropCalibrationReader'],
+}
+_LAZY_NAMES = {name: module for module, names in _LAZY_MODULES.items() for name in names}
+
+
+def __getattr__(name):
+    if name not in _LAZY_NAMES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(_LAZY_NAMES[name]), name)
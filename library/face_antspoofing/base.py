@@ -0,0 +1,138 @@
+import threading
+from typing import Any, Sequence, Tuple
+
+import cv2
+import nptyping as npt
+import numpy as np
+
+from library.util import scale_boxes
+from library.util.image import IM_RGB
+
+__all__ = ['BaseSpoofingDetector']
+
+
+class BaseSpoofingDetector:
+    """
+    Preprocessing and labelling of the anti-spoofing detectors, NumPy only.
+    Backends build the scoring model in `load_model`: an object with `max_scale`, `device` and
+    `forward(faces_scale) -> (N, 3) scores`.
+
+    Parameters:
+        model_path: model file of the backend
+        device: device model loaded in.
+        face_size: model face input size.
+        pixel_format: IM_RGB swaps the channels of the images given to `predict` before the models, IM_BGR passes
+            them as is. The MiniFASNet models have always been fed OpenCV BGR frames swapped (IM_RGB).
+        max_faces: faces per call the input buffers are allocated for, they grow when exceeded.
+        concurrent: run the models of the ensemble at the same time.
+    """
+
+    def __init__(self, model_path: str, device: str = "cpu", face_size=(80, 80), pixel_format=IM_RGB,
+                 max_faces=16, concurrent=False):
+        self.concurrent = concurrent
+        self.model = self.load_model(model_path, device, face_size)
+        self.device = self.model.device
+        self.face_size = face_size
+        self.pixel_format = pixel_format
+        self.max_faces = max_faces
+        # input buffers are reused between calls, one set per thread
+        self._buffers = threading.local()
+
+    def load_model(self, model_path: str, device: str, face_size):
+        """Build the scoring model."""
+        raise NotImplementedError
+
+    def _get_buffers(self, num_faces: int):
+        """
+        (S, N, H, W, 3) uint8 resize targets and (S, N, 3, H, W) float32 model inputs, N >= num_faces
+        """
+        buffers = self._buffers
+        if getattr(buffers, "crops", None) is None or buffers.crops.shape[1] < num_faces:
+            size = max(num_faces, self.max_faces)
+            width, height = self.face_size
+            buffers.crops = np.empty((len(self.model.max_scale), size, height, width, 3), dtype=np.uint8)
+            buffers.inputs = np.empty((len(self.model.max_scale), size, 3, height, width), dtype=np.float32)
+        return buffers.crops, buffers.inputs
+
+    def preprocess(self, boxes: Sequence[Sequence[int]], image: npt.NDArray[npt.UInt8]) -> Sequence[np.ndarray]:
+        """
+        Crop and resize faces for every scale of the model into the reused input buffers.
+
+        Returns
+        -------
+            One (N, 3, H, W) float32 array per scale. Views of the buffers, valid until the next call of the same
+            thread.
+        """
+        return self.preprocess_batch([(boxes, image)])
+
+    def preprocess_batch(self, items: Sequence[Tuple[Sequence[Sequence[int]], npt.NDArray[npt.UInt8]]]
+                         ) -> Sequence[np.ndarray]:
+        """
+        `preprocess` of several (boxes, image), faces stacked in order into one batch.
+        """
+        num_faces = sum(len(boxes) for boxes, _ in items)
+        crops, inputs = self._get_buffers(num_faces)
+
+        offset = 0
+        for boxes, image in items:
+            if not len(boxes):
+                continue
+            height, width = image.shape[:2]
+            for scale_idx, scaled in enumerate(scale_boxes(width, height, boxes, self.model.max_scale)):
+                for idx, (x1, y1, x2, y2) in enumerate(scaled, offset):
+                    cv2.resize(image[y1:y2, x1:x2], self.face_size, dst=crops[scale_idx, idx])
+            offset += len(boxes)
+
+        # HWC -> CHW and uint8 -> float32 in one copy, the channel swap folded in as a flip
+        faces = crops[:, :num_faces] if self.pixel_format != IM_RGB else crops[:, :num_faces, ..., ::-1]
+        np.copyto(inputs[:, :num_faces], faces.transpose(0, 1, 4, 2, 3), casting="unsafe")
+        return list(inputs[:, :num_faces])
+
+    def predict_scores(self, boxes: Sequence[Sequence[int]],
+                       image: npt.NDArray[npt.UInt8]) -> npt.NDArray[(Any, 3), npt.Float]:
+        """
+        Raw ensemble score of faces: sum of the models' softmax [2D_SPOOF | REAL | 3D_SPOOF].
+        """
+        return self.model(self.preprocess(boxes, image))
+
+    @staticmethod
+    def _label(predict) -> Sequence[Tuple[bool, float]]:
+        labels = np.argmax(predict, axis=1)
+        return [(label == 1, predict[idx][label] / 2.) for idx, label in enumerate(labels)]
+
+    def predict(self, boxes: Sequence[Sequence[int]],
+                image: npt.NDArray[npt.UInt8]) -> Sequence[Tuple[bool, float]]:
+        """
+        Post-process predict from model. Calculate average score and label face.
+
+        Parameters
+        ----------
+            boxes: Face's boxes
+            image: image source
+
+        Returns
+        -------
+            Label and score of faces in images.
+            [True|False] == [REAL|FAKE]
+        """
+        if not len(boxes):
+            return []
+        return self._label(self.predict_scores(boxes, image))
+
+    def predict_batch(self, items: Sequence[Tuple[Sequence[Sequence[int]], npt.NDArray[npt.UInt8]]]
+                      ) -> Sequence[Sequence[Tuple[bool, float]]]:
+        """
+        `predict` of several (boxes, image) in one forward of the model.
+
+        Returns
+        -------
+            One `predict` result per item.
+        """
+        counts = [len(boxes) for boxes, _ in items]
+        if not sum(counts):
+            return [[] for _ in items]
+        results = self._label(self.model(self.preprocess_batch(items)))
+        splits = np.cumsum([0] + counts)
+        return [results[begin:end] for begin, end in zip(splits[:-1], splits[1:])]
+
+    __call__ = predict
@@ -0,0 +1,97 @@
+import glob
+import hashlib
+import os
+from typing import Callable, Optional, Sequence
+
+import torch
+
+from library.models import mini_fasnet
+
+__all__ = ['CACHE_VERSION', 'cache_key', 'load_scripted_models', 'save_scripted_models']
+
+# bump when the traced graph changes outside library/models/mini_fasnet.py (model building, tracing, freezing)
+CACHE_VERSION = 1
+
+
+def _update_file(digest, path: str):
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+
+
+def cache_key(model_path: str, device: str, input_size) -> str:
+    """
+    Key of the compiled models: checkpoint content, source of the model code, `CACHE_VERSION`, torch version,
+    device and input size.
+    """
+    digest = hashlib.sha256()
+    _update_file(digest, model_path)
+    _update_file(digest, mini_fasnet.__file__)
+    digest.update(f"{CACHE_VERSION}|{torch.__version__}|{torch.device(device)}|{tuple(input_size)}".encode())
+    return digest.hexdigest()[:16]
+
+
+def _cache_path(cache_dir: str, model_path: str, key: str, name: str) -> str:
+    stem = os.path.basename(model_path).split(".")[0]
+    return os.path.join(cache_dir, f"{stem}.{name}.{key}.pt")
+
+
+def load_scripted_models(cache_dir: str, model_path: str, key: str, names: Sequence[str],
+                         device: str) -> Optional[list]:
+    """
+    Load the TorchScript models of `key`.
+
+    Returns
+    -------
+        One ScriptModule per name, or None when any of them is missing or unreadable.
+    """
+    models = []
+    for name in names:
+        path = _cache_path(cache_dir, model_path, key, name)
+        if not os.path.isfile(path):
+            return None
+        try:
+            models.append(torch.jit.load(path, map_location=device))
+        except (RuntimeError, ValueError) as e:
+            print(f"Ignoring compiled model cache {path}: {e}")
+            return None
+    return models
+
+
+def save_scripted_models(cache_dir: str, model_path: str, key: str, models: Sequence[torch.nn.Module],
+                         example: Callable[[], torch.Tensor]) -> list:
+    """
+    Trace and freeze eval models, write them under `key` and drop the artifacts of other keys.
+
+    Parameters
+    ----------
+        cache_dir: cache folder
+        model_path: checkpoint the models come from
+        key: `cache_key` of the checkpoint
+        models: eval models
+        example: builds an example input on the models' device
+
+    Returns
+    -------
+        The frozen ScriptModules
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    scripted = []
+    for model in models:
+        name = model.__class__.__name__
+        with torch.no_grad():
+            module = torch.jit.freeze(torch.jit.trace(model, example()))
+
+        path = _cache_path(cache_dir, model_path, key, name)
+        stale = set(glob.glob(_cache_path(cache_dir, model_path, "*", name))) - {path}
+        # write then rename, a concurrent reader never sees a partial file
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        torch.jit.save(module, tmp_path)
+        os.replace(tmp_path, path)
+        for stale_path in stale:
+            try:
+                os.remove(stale_path)
+            except OSError:
+                pass
+        scripted.append(module)
+    return scripted
@@ -1,17 +1,18 @@
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Sequence, Tuple
 
-import cv2
 import nptyping as npt
-import numpy as np
 import torch
 from torch.nn.functional import softmax
 
+from library.face_antspoofing.base import BaseSpoofingDetector
+from library.face_antspoofing.cache import cache_key, load_scripted_models, save_scripted_models
 from library.models.mini_fasnet import MiniFASNetV1SE, MiniFASNetV2
-from library.util import scale_box, remove_prefix
-from library.util.transform import Transform, resize
+from library.util import remove_prefix
+from library.util.image import IM_RGB
 
 __all__ = ['MulFasNet', 'SpoofingDetector']
-_CPU_DEVICE = "cuda:0"
+_CPU_DEVICE = "cpu"
 
 
 class MulFasNet:
@@ -22,25 +23,67 @@ class MulFasNet:
     `MiniFASNetV1SE` and `MiniFASNetV2` have been compiled into single model.
     """
 
-    def __init__(self, model_path: str, device=_CPU_DEVICE, input_size=(80, 80)):
+    def __init__(self, model_path: str, device=_CPU_DEVICE, input_size=(80, 80), concurrent=False, cache_dir=None):
         """
         Parameters:
             model_path: pretrained model
             device: device model loaded in.
             input_size: model input size.
+            concurrent: run the models at the same time, in a thread pool on cpu or on CUDA streams.
+            cache_dir: keep the models compiled with TorchScript here, rebuilt when the checkpoint, model code,
+                torch version or device change. (Default: no cache)
         """
-        model_load = torch.load(model_path, weights_only=True)
+        if cache_dir:
+            names = [MiniFASNetV1SE.__name__, MiniFASNetV2.__name__]
+            key = cache_key(model_path, device, input_size)
+            self.models = load_scripted_models(cache_dir, model_path, key, names, device)
+            if self.models is None:
+                print(f"Compiling {model_path} into {cache_dir}")
+                self.models = save_scripted_models(cache_dir, model_path, key,
+                                                   self._build_models(model_path, device, input_size),
+                                                   lambda: torch.zeros(1, 3, *input_size, device=device))
+        else:
+            self.models = self._build_models(model_path, device, input_size)
+
+        self.max_scale = [4, 2.7]
+        self.device = device
+        self.concurrent = concurrent
+        self._streams = None
+        self._executor = None
+        if concurrent and torch.device(device).type == "cuda":
+            self._streams = [torch.cuda.Stream(device) for _ in self.models]
+        elif concurrent:
+            self._executor = ThreadPoolExecutor(max_workers=len(self.models), thread_name_prefix="mul_fas_net")
+
+    @staticmethod
+    def _build_models(model_path: str, device: str, input_size) -> list:
+        model_load = torch.load(model_path, map_location=device, weights_only=True)
         kernel_size = ((input_size[0] + 15) // 16, (input_size[1] + 15) // 16)
-        self.models = [MiniFASNetV1SE(conv6_kernel=kernel_size), MiniFASNetV2(conv6_kernel=kernel_size)]
+        models = [MiniFASNetV1SE(conv6_kernel=kernel_size), MiniFASNetV2(conv6_kernel=kernel_size)]
 
         # Load model
-        for idx, model in enumerate(self.models):
+        for model in models:
             model.load_state_dict(remove_prefix(model_load[model.__class__.__name__], 'module.'), strict=False)
             model.to(device)
             model.eval()
+            model.fuse_for_inference()
+        return models
 
-        self.max_scale = [4, 2.7]
-        self.device = device
+    def _predict(self, model, images: torch.Tensor) -> torch.Tensor:
+        # no_grad is thread local, enter it in the pool threads too
+        with torch.no_grad():
+            return softmax(model(images.to(self.device, non_blocking=True)), dim=1)
+
+    def _predict_streams(self, faces_scale: Sequence[torch.Tensor]) -> Sequence[torch.Tensor]:
+        current = torch.cuda.current_stream(self.device)
+        results = []
+        for stream, model, images in zip(self._streams, self.models, faces_scale):
+            stream.wait_stream(current)
+            with torch.cuda.stream(stream):
+                results.append(self._predict(model, images))
+        for stream in self._streams:
+            current.wait_stream(stream)
+        return results
 
     def forward(self, faces_scale: Sequence[torch.Tensor]) -> npt.NDArray[(Any, 3), npt.Float]:
         """
@@ -54,22 +97,23 @@ class MulFasNet:
         -------
             Score of predict [2D_SPOOF | REAL | 3D_SPOOF]
         """
-        predict = torch.zeros(faces_scale[0].size(0), 3, dtype=torch.float64, device=self.device)
-        with torch.no_grad():
-            for model, images in zip(self.models, faces_scale):
-                images = images.to(self.device)
-                result = model(images)
-                result = softmax(result, dim=1)
-                predict += result
-        if self.device != _CPU_DEVICE:
-            predict = predict.detach().cpu()
-        predict = predict.detach().cpu()
-        return predict.detach().numpy()
+        if self._streams is not None:
+            results = self._predict_streams(faces_scale)
+        elif self._executor is not None:
+            results = list(self._executor.map(self._predict, self.models, faces_scale))
+        else:
+            results = [self._predict(model, images) for model, images in zip(self.models, faces_scale)]
+
+        predict = results[0]
+        for result in results[1:]:
+            predict = predict + result
+        # single transfer to host
+        return predict.cpu().numpy()
 
     __call__ = forward
 
 
-class SpoofingDetector:
+class SpoofingDetector(BaseSpoofingDetector):
     """
     Predict faces in image that is real or not.
 
@@ -77,46 +121,26 @@ class SpoofingDetector:
         model_path: pretrained model
         device: device model loaded in. (Default: cpu)
         face_size: model face input size.
+        pixel_format: IM_RGB swaps the channels of the images given to `predict` before the models, IM_BGR passes
+            them as is. The MiniFASNet models have always been fed OpenCV BGR frames swapped (IM_RGB).
+        max_faces: faces per call the input buffers are allocated for, they grow when exceeded.
+        concurrent: run the models of the ensemble at the same time.
+        cache_dir: compiled model cache of `MulFasNet`. (Default: no cache)
     """
 
-    def __init__(self, model_path: str, device: str = _CPU_DEVICE, face_size=(80, 80)):
-        self.model = MulFasNet(model_path, device=device, input_size=face_size)
-        self.device = self.model.device
-        self.face_size = face_size
+    def __init__(self, model_path: str, device: str = _CPU_DEVICE, face_size=(80, 80), pixel_format=IM_RGB,
+                 max_faces=16, concurrent=False, cache_dir=None):
+        self.cache_dir = cache_dir
+        super().__init__(model_path, device=device, face_size=face_size, pixel_format=pixel_format,
+                         max_faces=max_faces, concurrent=concurrent)
 
-        self.transform = Transform([
-            lambda x: cv2.cvtColor(x, cv2.COLOR_RGB2BGR),
-            resize(*face_size),
-            lambda x: torch.from_numpy(x.transpose((2, 0, 1))).float()
-        ])
+    def load_model(self, model_path: str, device: str, face_size):
+        return MulFasNet(model_path, device=device, input_size=face_size, concurrent=self.concurrent,
+                         cache_dir=self.cache_dir)
 
-    def predict(self, boxes: Sequence[Sequence[int]],
-                image: npt.NDArray[npt.UInt8]) -> Sequence[Tuple[bool, float]]:
+    def preprocess_batch(self, items: Sequence[Tuple[Sequence[Sequence[int]], npt.NDArray[npt.UInt8]]]
+                         ) -> Sequence[torch.Tensor]:
         """
-        Post-process predict from model. Calculate average score and label face.
-
-        Parameters
-        ----------
-            boxes: Face's boxes
-            image: image source
-
-        Returns
-        -------
-            Label and score of faces in images.
-            [True|False] == [REAL|FAKE]
+        `BaseSpoofingDetector.preprocess_batch` as tensors sharing the memory of the input buffers.
         """
-        faces_scale = list()
-        for scale in self.model.max_scale:
-            face_tensor = torch.zeros(len(boxes), 3, *self.face_size, dtype=torch.float32)
-            for idx, box in enumerate(boxes):
-                height, width = image.shape[:2]
-                box_scaled = scale_box(width, height, box, scale)
-                face_img = image[box_scaled[1]:box_scaled[3], box_scaled[0]:box_scaled[2]]
-                face_tensor[idx] = self.transform(face_img)
-            faces_scale.append(face_tensor)
-
-        predict = self.model(faces_scale)
-        labels = np.argmax(predict, axis=1)
-        return [(label == 1, predict[idx][label] / 2.) for idx, label in enumerate(labels)]
-
-    __call__ = predict
+        return [torch.from_numpy(faces) for faces in super().preprocess_batch(items)]
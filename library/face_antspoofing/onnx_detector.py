@@ -0,0 +1,77 @@
+from typing import Any, Sequence
+
+import nptyping as npt
+import numpy as np
+import onnxruntime
+
+from library.face_antspoofing.base import BaseSpoofingDetector
+from library.util.image import IM_RGB
+
+__all__ = ['OnnxMulFasNet', 'OnnxSpoofingDetector']
+
+
+class OnnxMulFasNet:
+    """
+    `MulFasNet` executed by ONNX Runtime. Same `max_scale` and `forward` contract, without torch.
+    """
+
+    def __init__(self, model_path: str, providers=None, sess_options=None, concurrent=False):
+        """
+        Parameters:
+            model_path: ONNX file from `export_onnx`
+            providers: onnxruntime execution providers. (Default: CPU)
+            sess_options: onnxruntime.SessionOptions
+            concurrent: run the two independent model branches of the graph in parallel (ORT_PARALLEL)
+        """
+        if concurrent:
+            sess_options = sess_options or onnxruntime.SessionOptions()
+            sess_options.execution_mode = onnxruntime.ExecutionMode.ORT_PARALLEL
+        self.session = onnxruntime.InferenceSession(model_path, sess_options=sess_options,
+                                                    providers=providers or ["CPUExecutionProvider"])
+        self.input_names = [node.name for node in self.session.get_inputs()]
+        self.max_scale = [4, 2.7]
+        self.device = "cpu"
+
+    def forward(self, faces_scale: Sequence[np.ndarray]) -> npt.NDArray[(Any, 3), npt.Float]:
+        """
+        Predict face spoof.
+
+        Parameters
+        ----------
+            faces_scale: face's image scaled, NCHW float32 arrays.
+
+        Returns
+        -------
+            Score of predict [2D_SPOOF | REAL | 3D_SPOOF]
+        """
+        feeds = {name: np.ascontiguousarray(images, dtype=np.float32)
+                 for name, images in zip(self.input_names, faces_scale)}
+        return self.session.run(None, feeds)[0]
+
+    __call__ = forward
+
+
+class OnnxSpoofingDetector(BaseSpoofingDetector):
+    """
+    Anti-spoofing detector with the ONNX Runtime backend, preprocessing in NumPy.
+
+    Parameters:
+        model_path: ONNX file from `export_onnx`
+        providers: onnxruntime execution providers. (Default: CPU)
+        sess_options: onnxruntime.SessionOptions
+        face_size: model face input size.
+        pixel_format: IM_RGB swaps the channels before the model, IM_BGR passes them as is.
+        max_faces: faces per call the input buffers are allocated for.
+        concurrent: run the two model branches of the graph in parallel.
+    """
+
+    def __init__(self, model_path: str, providers=None, sess_options=None, face_size=(80, 80), pixel_format=IM_RGB,
+                 max_faces=16, concurrent=False):
+        self.providers = providers
+        self.sess_options = sess_options
+        super().__init__(model_path, device="cpu", face_size=face_size, pixel_format=pixel_format,
+                         max_faces=max_faces, concurrent=concurrent)
+
+    def load_model(self, model_path: str, device: str, face_size):
+        return OnnxMulFasNet(model_path, providers=self.providers, sess_options=self.sess_options,
+                             concurrent=self.concurrent)
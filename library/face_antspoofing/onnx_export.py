@@ -0,0 +1,64 @@
+import argparse
+import inspect
+import os
+
+import torch
+from torch.nn.functional import softmax
+
+from library.face_antspoofing.detector import MulFasNet
+
+__all__ = ['export_onnx']
+
+
+class _MulFasNetGraph(torch.nn.Module):
+    """Both MiniFASNet models in one graph: one input per scale, output is the sum of their softmax."""
+
+    def __init__(self, models):
+        super().__init__()
+        self.models = torch.nn.ModuleList(models)
+
+    def forward(self, *faces_scale):
+        predict = softmax(self.models[0](faces_scale[0]), dim=1)
+        for model, images in zip(self.models[1:], faces_scale[1:]):
+            predict = predict + softmax(model(images), dim=1)
+        return predict
+
+
+def export_onnx(model_path: str, output_path: str, input_size=(80, 80), opset_version=13) -> str:
+    """
+    Export `MiniFASNetV1SE` and `MiniFASNetV2` of a checkpoint into a single ONNX graph.
+    Offline step, the ONNX backend itself runs without torch.
+
+    Parameters
+    ----------
+        model_path: pretrained torch checkpoint
+        output_path: ONNX file to write
+        input_size: model input size.
+        opset_version: ONNX opset
+
+    Returns
+    -------
+        output_path
+    """
+    mul_fas_net = MulFasNet(model_path, device="cpu", input_size=input_size)
+    graph = _MulFasNetGraph(mul_fas_net.models).eval()
+
+    input_names = [f"scale_{idx}" for idx in range(len(mul_fas_net.models))]
+    dummy = tuple(torch.zeros(1, 3, *input_size) for _ in input_names)
+    dynamic_axes = {name: {0: "faces"} for name in input_names + ["score"]}
+
+    # keep the TorchScript exporter on torch versions where dynamo became the default
+    kwargs = {"dynamo": False} if "dynamo" in inspect.signature(torch.onnx.export).parameters else {}
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with torch.no_grad():
+        torch.onnx.export(graph, dummy, output_path, input_names=input_names, output_names=["score"],
+                          dynamic_axes=dynamic_axes, opset_version=opset_version, **kwargs)
+    return output_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the anti-spoofing checkpoint to ONNX")
+    parser.add_argument("model_path", nargs="?", default="data/pretrained/fasnet_v1se_v2.pth.tar")
+    parser.add_argument("output_path", nargs="?", default="data/cache/fasnet_v1se_v2.onnx")
+    args = parser.parse_args()
+    print(f"Exported: {export_onnx(args.model_path, args.output_path)}")
@@ -0,0 +1,148 @@
+import argparse
+import glob
+import os
+import tempfile
+from typing import Iterable, Sequence, Tuple
+
+import cv2
+import numpy as np
+from onnxruntime.quantization import (CalibrationDataReader, CalibrationMethod, QuantFormat, QuantType,
+                                      quantize_static)
+from onnxruntime.quantization.shape_inference import quant_pre_process
+
+from library.face_antspoofing.base import BaseSpoofingDetector
+
+__all__ = ['QUANTIZATION_MODES', 'load_crops', 'calibration_crops', 'quantize_dynamic_models', 'quantize_onnx',
+           'CropCalibrationReader']
+
+QUANTIZATION_MODES = ("none", "dynamic", "static")
+
+
+def load_crops(pattern: str, margin: float, label: str = None) -> Sequence[Tuple[np.ndarray, list, str]]:
+    """
+    Load face crops saved with a relative `margin` around the face box.
+
+    Parameters
+    ----------
+        pattern: glob of the crop images
+        margin: margin added on each side of the face, relative to the face size.
+            0.4 for `Face_process.save_warning`, 0.2 for enrollment images.
+        label: label of every crop. (Default: name of the image folder)
+
+    Returns
+    -------
+        list of (image, face box, label)
+    """
+    samples = []
+    for image_path in sorted(glob.glob(pattern)):
+        image = cv2.imread(image_path)
+        if image is None:
+            continue
+        height, width = image.shape[:2]
+        x_margin = int(width * margin / (1 + 2 * margin))
+        y_margin = int(height * margin / (1 + 2 * margin))
+        box = [x_margin, y_margin, width - x_margin, height - y_margin]
+        samples.append((image, box, label or os.path.basename(os.path.dirname(image_path))))
+    return samples
+
+
+def calibration_crops(violations_folder="violations_folder", dataset_dir="dataset"):
+    """
+    Saved spoof/unknown warnings plus the enrollment images, for calibration only: their labels are the folder
+    names (spoof, unknown, person names), not ground truth, so they cannot measure accuracy.
+    """
+    return (load_crops(os.path.join(violations_folder, "*", "*.jpg"), margin=0.4)
+            + load_crops(os.path.join(dataset_dir, "*", "*.jpg"), margin=0.2))
+
+
+def quantize_dynamic_models(mul_fas_net):
+    """
+    Dynamic int8 quantization of the Linear layers of both models of a `MulFasNet`, in place. CPU only.
+    """
+    import torch
+
+    if mul_fas_net.device != "cpu":
+        raise ValueError(f"dynamic quantization runs on cpu, not {mul_fas_net.device}")
+    mul_fas_net.models = [torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+                          for model in mul_fas_net.models]
+    return mul_fas_net
+
+
+class CropCalibrationReader(CalibrationDataReader):
+    """
+    Feed face crops to onnxruntime calibration, preprocessed like the detectors.
+
+    Parameters:
+        detector: any `BaseSpoofingDetector`, only its `preprocess` is used
+        samples: (image, box, label) from `load_crops`
+        input_names: ONNX inputs, one per scale
+        batch_size: faces per calibration batch
+    """
+
+    def __init__(self, detector: BaseSpoofingDetector, samples, input_names, batch_size=8):
+        feeds = []
+        for start in range(0, len(samples), batch_size):
+            faces_scale = [[] for _ in input_names]
+            for image, box, _ in samples[start:start + batch_size]:
+                for idx, images in enumerate(detector.preprocess([box], image)):
+                    faces_scale[idx].append(np.asarray(images, dtype=np.float32))
+            feeds.append({name: np.concatenate(images) for name, images in zip(input_names, faces_scale)})
+        self._feeds = iter(feeds)
+
+    def get_next(self):
+        return next(self._feeds, None)
+
+
+def quantize_onnx(onnx_path: str, output_path: str, detector: BaseSpoofingDetector, samples: Iterable,
+                  quant_format=QuantFormat.QDQ, per_channel=True) -> str:
+    """
+    Post-training static int8 quantization of an `export_onnx` graph.
+
+    Parameters
+    ----------
+        onnx_path: float ONNX file
+        output_path: quantized ONNX file to write
+        detector: detector used to preprocess the calibration crops
+        samples: calibration crops (image, box, label) from `load_crops`
+        quant_format: QDQ or QOperator
+        per_channel: per-channel weight scales
+
+    Returns
+    -------
+        output_path
+    """
+    samples = list(samples)
+    if not samples:
+        raise ValueError("no calibration crops")
+
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        prepared_path = os.path.join(tmp_dir, "prepared.onnx")
+        quant_pre_process(onnx_path, prepared_path)
+        input_names = [f"scale_{idx}" for idx in range(len(detector.model.max_scale))]
+        reader = CropCalibrationReader(detector, samples, input_names)
+        quantize_static(prepared_path, output_path, reader, quant_format=quant_format, per_channel=per_channel,
+                        activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8,
+                        calibrate_method=CalibrationMethod.MinMax)
+    return output_path
+
+
+if __name__ == "__main__":
+    from library.face_antspoofing.onnx_detector import OnnxSpoofingDetector
+    from library.face_antspoofing.onnx_export import export_onnx
+
+    # offline step: the kiosk loads the int8 file (models.antispoofing_quantized_onnx), it never calibrates
+    parser = argparse.ArgumentParser(description="Static int8 quantization of the anti-spoofing ONNX model")
+    parser.add_argument("--model", default="data/pretrained/fasnet_v1se_v2.pth.tar")
+    parser.add_argument("--onnx", default="data/cache/fasnet_v1se_v2.onnx")
+    parser.add_argument("--output", default="data/cache/fasnet_v1se_v2.int8.onnx")
+    parser.add_argument("--violations", default="violations_folder")
+    parser.add_argument("--dataset", default="dataset")
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.onnx):
+        export_onnx(args.model, args.onnx)
+    crops = calibration_crops(args.violations, args.dataset)
+    print(f"Calibration crops: {len(crops)}")
+    detector = OnnxSpoofingDetector(args.onnx)
+    print(f"Quantized: {quantize_onnx(args.onnx, args.output, detector, crops)}")
@@ -0,0 +1,18 @@
+import importlib
+
+from library.face_detection.box_utils import *
+from library.face_detection.base import *
+from library.face_detection.onnx_detector import *
+
+# torch loads on first use of these names, the onnx backend runs without it
+_LAZY_MODULES = {
+    "library.face_detection.detector": ['RetinaFaceNet', 'FaceDetector'],
+    "library.face_detection.onnx_export": ['export_onnx'],
+}
+_LAZY_NAMES = {name: module for module, names in _LAZY_MODULES.items() for name in names}
+
+
+def __getattr__(name):
+    if name not in _LAZY_NAMES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(_LAZY_NAMES[name]), name)
@@ -0,0 +1,142 @@
+import threading
+from typing import Any, Sequence, Tuple
+
+import cv2
+import nptyping as npt
+import numpy as np
+
+from library.face_detection.box_utils import decode_boxes, decode_landmarks, nms, prior_boxes
+from library.util.image import IM_BGR, IM_RGB
+
+__all__ = ['BaseFaceDetector']
+_CPU_DEVICE = "cpu"
+_MEAN_BGR = (104, 117, 123)
+
+
+class BaseFaceDetector:
+    """
+    Detect faces and their 5 landmarks. A lighter alternative to the InsightFace detector,
+    results have the layout of `insightface.model_zoo.RetinaFace.detect`.
+    Letterboxing, decoding and NMS, NumPy only. Backends build the model in `load_model`: an object with `cfg`,
+    `device` and `forward(images) -> (loc, scores, landms)` arrays.
+
+    Parameters:
+        model_path: model file of the backend
+        device: device model loaded in. (Default: cpu)
+        input_size: (width, height) the images are letterboxed into. Smaller is faster and misses small faces.
+        confidence_threshold: minimum face score
+        nms_threshold: IoU above which overlapping faces are merged
+        pixel_format: IM_RGB or IM_BGR, channel order of the images given to `detect`.
+        max_images: images per call the input buffers are allocated for, they grow when exceeded.
+    """
+
+    def __init__(self, model_path: str, device: str = _CPU_DEVICE, input_size=(640, 640), confidence_threshold=0.5,
+                 nms_threshold=0.4, pixel_format=IM_BGR, max_images=1):
+        self.model = self.load_model(model_path, device)
+        self.device = self.model.device
+        self.input_size = tuple(input_size)
+        self.confidence_threshold = confidence_threshold
+        self.nms_threshold = nms_threshold
+        self.pixel_format = pixel_format
+        # padding is written before the channel flip, in the order of the input images
+        self._pad_color = _MEAN_BGR if pixel_format != IM_RGB else _MEAN_BGR[::-1]
+        self.max_images = max_images
+        cfg = self.model.cfg
+        self.variances = cfg['variance']
+        self.priors = prior_boxes(self.input_size, cfg['min_sizes'], cfg['steps'])
+        # input buffers are reused between calls, one set per thread
+        self._buffers = threading.local()
+
+    def load_model(self, model_path: str, device: str):
+        """Build the detection model."""
+        raise NotImplementedError
+
+    def _get_buffers(self, num_images: int):
+        """
+        (N, H, W, 3) uint8 letterbox targets and (N, 3, H, W) float32 model inputs, N >= num_images
+        """
+        buffers = self._buffers
+        if getattr(buffers, "canvas", None) is None or buffers.canvas.shape[0] < num_images:
+            size = max(num_images, self.max_images)
+            width, height = self.input_size
+            buffers.canvas = np.empty((size, height, width, 3), dtype=np.uint8)
+            buffers.inputs = np.empty((size, 3, height, width), dtype=np.float32)
+        return buffers.canvas, buffers.inputs
+
+    def preprocess_batch(self, images: Sequence[npt.NDArray[npt.UInt8]]) -> Tuple[np.ndarray, Sequence[float]]:
+        """
+        Letterbox images into the reused input buffers: resize keeping the aspect ratio,
+        pad right and bottom with the mean color, subtract the mean.
+
+        Returns
+        -------
+            (N, 3, H, W) array, valid until the next call of the same thread, and the resize ratio of every image
+        """
+        canvas, inputs = self._get_buffers(len(images))
+        width, height = self.input_size
+        ratios = []
+        for idx, image in enumerate(images):
+            ratio = min(width / image.shape[1], height / image.shape[0])
+            new_w, new_h = min(width, round(image.shape[1] * ratio)), min(height, round(image.shape[0] * ratio))
+            canvas[idx, :new_h, :new_w] = cv2.resize(image, (new_w, new_h))
+            canvas[idx, new_h:] = self._pad_color
+            canvas[idx, :new_h, new_w:] = self._pad_color
+            ratios.append(ratio)
+
+        # HWC -> CHW and uint8 -> float32 in one copy, RGB -> BGR folded in as a channel flip
+        count = len(images)
+        batch = canvas[:count] if self.pixel_format != IM_RGB else canvas[:count, ..., ::-1]
+        model_inputs = inputs[:count]
+        np.copyto(model_inputs, batch.transpose(0, 3, 1, 2), casting="unsafe")
+        model_inputs -= np.asarray(_MEAN_BGR, dtype=np.float32).reshape(1, 3, 1, 1)
+        return model_inputs, ratios
+
+    def postprocess(self, loc, scores, landms, ratio: float
+                    ) -> Tuple[npt.NDArray[(Any, 5), npt.Float32], npt.NDArray[(Any, 5, 2), npt.Float32]]:
+        """
+        Decode the outputs of one image, filter by score and NMS, scale back to the image.
+        """
+        mask = scores > self.confidence_threshold
+        if not mask.any():
+            return np.zeros((0, 5), dtype=np.float32), np.zeros((0, 5, 2), dtype=np.float32)
+
+        priors = self.priors[mask]
+        size = np.asarray(self.input_size, dtype=np.float32)
+        boxes = decode_boxes(loc[mask], priors, self.variances) * np.tile(size, 2) / ratio
+        kpss = decode_landmarks(landms[mask], priors, self.variances) * size / ratio
+        dets = np.hstack((boxes, scores[mask, None])).astype(np.float32, copy=False)
+
+        keep = nms(dets, self.nms_threshold)
+        return dets[keep], kpss[keep].astype(np.float32, copy=False)
+
+    def detect_batch(self, images: Sequence[npt.NDArray[npt.UInt8]]
+                     ) -> Sequence[Tuple[npt.NDArray[(Any, 5), npt.Float32], npt.NDArray[(Any, 5, 2), npt.Float32]]]:
+        """
+        `detect` of several images in one forward of the model.
+
+        Returns
+        -------
+            One `detect` result per image.
+        """
+        if not len(images):
+            return []
+        inputs, ratios = self.preprocess_batch(images)
+        loc, scores, landms = self.model(inputs)
+        return [self.postprocess(loc[idx], scores[idx], landms[idx], ratio) for idx, ratio in enumerate(ratios)]
+
+    def detect(self, image: npt.NDArray[npt.UInt8]
+               ) -> Tuple[npt.NDArray[(Any, 5), npt.Float32], npt.NDArray[(Any, 5, 2), npt.Float32]]:
+        """
+        Detect faces in an image.
+
+        Parameters
+        ----------
+            image: image source
+
+        Returns
+        -------
+            bboxes (N, 5) [x1, y1, x2, y2, score] and kpss (N, 5, 2) landmarks, highest score first
+        """
+        return self.detect_batch([image])[0]
+
+    __call__ = detect
@@ -0,0 +1,74 @@
+from itertools import product
+from typing import Any, Sequence
+
+import nptyping as npt
+import numpy as np
+
+__all__ = ['prior_boxes', 'decode_boxes', 'decode_landmarks', 'nms']
+
+
+def prior_boxes(input_size, min_sizes: Sequence[Sequence[int]], steps: Sequence[int]
+                ) -> npt.NDArray[(Any, 4), npt.Float32]:
+    """
+    Anchors of RetinaFace for an input size, in the order of the model outputs.
+
+    Parameters
+    ----------
+        input_size: (width, height) of the model input
+        min_sizes: anchor sizes of every feature map
+        steps: stride of every feature map
+
+    Returns
+    -------
+        (P, 4) [cx, cy, w, h] relative to the input size
+    """
+    width, height = input_size
+    anchors = []
+    for sizes, step in zip(min_sizes, steps):
+        rows, cols = (height + step - 1) // step, (width + step - 1) // step
+        for i, j in product(range(rows), range(cols)):
+            for size in sizes:
+                anchors.append(((j + 0.5) * step / width, (i + 0.5) * step / height, size / width, size / height))
+    return np.asarray(anchors, dtype=np.float32).reshape(-1, 4)
+
+
+def decode_boxes(loc, priors, variances) -> npt.NDArray[(Any, 4), npt.Float32]:
+    """Box regressions to [x1, y1, x2, y2] relative to the input size"""
+    centers = priors[:, :2] + loc[:, :2] * variances[0] * priors[:, 2:]
+    sizes = priors[:, 2:] * np.exp(loc[:, 2:] * variances[1])
+    return np.concatenate((centers - sizes / 2, centers + sizes / 2), axis=1)
+
+
+def decode_landmarks(pre, priors, variances) -> npt.NDArray[(Any, 5, 2), npt.Float32]:
+    """Landmark regressions to 5 (x, y) points relative to the input size"""
+    offsets = pre.reshape(-1, 5, 2) * variances[0] * priors[:, None, 2:]
+    return priors[:, None, :2] + offsets
+
+
+def nms(dets, threshold: float) -> npt.NDArray[npt.Int]:
+    """
+    Greedy non-maximum suppression.
+
+    Parameters
+    ----------
+        dets: (N, 5) [x1, y1, x2, y2, score]
+        threshold: IoU above which the lower score box is dropped
+
+    Returns
+    -------
+        Indices of the kept boxes, highest score first
+    """
+    x1, y1, x2, y2, scores = dets.T
+    areas = (x2 - x1 + 1) * (y2 - y1 + 1)
+    order = scores.argsort()[::-1]
+
+    keep = []
+    while order.size > 0:
+        i = order[0]
+        keep.append(i)
+        w = np.maximum(0.0, np.minimum(x2[i], x2[order[1:]]) - np.maximum(x1[i], x1[order[1:]]) + 1)
+        h = np.maximum(0.0, np.minimum(y2[i], y2[order[1:]]) - np.maximum(y1[i], y1[order[1:]]) + 1)
+        inter = w * h
+        iou = inter / (areas[i] + areas[order[1:]] - inter)
+        order = order[1:][iou <= threshold]
+    return np.asarray(keep, dtype=np.int64)
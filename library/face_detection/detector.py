@@ -0,0 +1,76 @@
+from typing import Sequence, Tuple
+
+import nptyping as npt
+import numpy as np
+import torch
+
+from library.face_detection.base import BaseFaceDetector
+from library.models.retina_face import CFG_MOBILENET, RetinaFace, backbone_of
+from library.util import remove_prefix
+
+__all__ = ['RetinaFaceNet', 'FaceDetector']
+_CPU_DEVICE = "cpu"
+
+
+class RetinaFaceNet:
+    """
+    Ref: https://github.com/biubug6/Pytorch_Retinaface
+
+    RetinaFace MobileNet-0.25 with the BatchNorm folded, raw outputs for every prior box.
+    """
+
+    def __init__(self, model_path: str, device=_CPU_DEVICE):
+        """
+        Parameters:
+            model_path: pretrained model, a state dict or a checkpoint with it under 'header'
+            device: device model loaded in.
+        """
+        self.model = self._build_model(model_path, device)
+        self.cfg = CFG_MOBILENET
+        self.device = device
+
+    @staticmethod
+    def _build_model(model_path: str, device: str) -> RetinaFace:
+        model_load = torch.load(model_path, map_location=device, weights_only=True)
+        state_dict = remove_prefix(model_load.get('header', model_load), 'module.')
+        backbone = backbone_of(state_dict)
+        if backbone != CFG_MOBILENET['name']:
+            raise ValueError(f"RetinaFace backbone {backbone} is not supported, only {CFG_MOBILENET['name']}")
+
+        model = RetinaFace(CFG_MOBILENET)
+        model.load_state_dict(state_dict)
+        model.to(device)
+        model.eval()
+        return model.fuse_for_inference()
+
+    def forward(self, images: torch.Tensor) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Parameters
+        ----------
+            images: (N, 3, H, W) float32 BGR minus the mean
+
+        Returns
+        -------
+            Box regressions (N, P, 4), face scores (N, P), landmark regressions (N, P, 10)
+        """
+        with torch.no_grad():
+            outputs = self.model(images.to(self.device, non_blocking=True))
+        return tuple(output.cpu().numpy() for output in outputs)
+
+    __call__ = forward
+
+
+class FaceDetector(BaseFaceDetector):
+    """
+    `BaseFaceDetector` with the torch backend, `model_path` is the pretrained checkpoint.
+    """
+
+    def load_model(self, model_path: str, device: str):
+        return RetinaFaceNet(model_path, device=device)
+
+    def preprocess_batch(self, images: Sequence[npt.NDArray[npt.UInt8]]) -> Tuple[torch.Tensor, Sequence[float]]:
+        """
+        `BaseFaceDetector.preprocess_batch`, the inputs as a tensor sharing the buffer.
+        """
+        inputs, ratios = super().preprocess_batch(images)
+        return torch.from_numpy(inputs), ratios
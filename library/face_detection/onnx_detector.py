@@ -0,0 +1,69 @@
+from typing import Any, Tuple
+
+import numpy as np
+import onnxruntime
+
+from library.face_detection.base import BaseFaceDetector
+from library.models.retina_face_config import CFG_MOBILENET
+from library.util.image import IM_BGR
+
+__all__ = ['OnnxRetinaFaceNet', 'OnnxFaceDetector']
+
+
+class OnnxRetinaFaceNet:
+    """
+    `RetinaFaceNet` executed by ONNX Runtime. Same `cfg` and `forward` contract, without torch.
+    """
+
+    def __init__(self, model_path: str, providers=None, sess_options=None):
+        """
+        Parameters:
+            model_path: ONNX file from `export_onnx`
+            providers: onnxruntime execution providers. (Default: CPU)
+            sess_options: onnxruntime.SessionOptions
+        """
+        self.session = onnxruntime.InferenceSession(model_path, sess_options=sess_options,
+                                                    providers=providers or ["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        self.cfg = CFG_MOBILENET
+        self.device = "cpu"
+
+    def forward(self, images: Any) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Parameters
+        ----------
+            images: (N, 3, H, W) float32 BGR minus the mean
+
+        Returns
+        -------
+            Box regressions (N, P, 4), face scores (N, P), landmark regressions (N, P, 10)
+        """
+        return tuple(self.session.run(None, {self.input_name: np.asarray(images, dtype=np.float32)}))
+
+    __call__ = forward
+
+
+class OnnxFaceDetector(BaseFaceDetector):
+    """
+    `BaseFaceDetector` with the ONNX Runtime backend.
+
+    Parameters:
+        model_path: ONNX file from `export_onnx`
+        providers: onnxruntime execution providers. (Default: CPU)
+        sess_options: onnxruntime.SessionOptions
+        input_size: (width, height) the images are letterboxed into.
+        confidence_threshold: minimum face score
+        nms_threshold: IoU above which overlapping faces are merged
+        pixel_format: IM_RGB or IM_BGR, channel order of the images given to `detect`.
+        max_images: images per call the input buffers are allocated for.
+    """
+
+    def __init__(self, model_path: str, providers=None, sess_options=None, input_size=(640, 640),
+                 confidence_threshold=0.5, nms_threshold=0.4, pixel_format=IM_BGR, max_images=1):
+        self.providers = providers
+        self.sess_options = sess_options
+        super().__init__(model_path, device="cpu", input_size=input_size, confidence_threshold=confidence_threshold,
+                         nms_threshold=nms_threshold, pixel_format=pixel_format, max_images=max_images)
+
+    def load_model(self, model_path: str, device: str):
+        return OnnxRetinaFaceNet(model_path, providers=self.providers, sess_options=self.sess_options)
@@ -0,0 +1,49 @@
+import argparse
+import inspect
+import os
+
+import torch
+
+from library.face_detection.detector import RetinaFaceNet
+
+__all__ = ['export_onnx']
+
+
+def export_onnx(model_path: str, output_path: str, input_size=(640, 640), opset_version=13) -> str:
+    """
+    Export the RetinaFace checkpoint to ONNX. Batch, height and width stay dynamic,
+    the prior boxes are computed by the detector for its input size.
+
+    Parameters
+    ----------
+        model_path: pretrained torch checkpoint
+        output_path: ONNX file to write
+        input_size: (width, height) of the example input
+        opset_version: ONNX opset
+
+    Returns
+    -------
+        output_path
+    """
+    model = RetinaFaceNet(model_path, device="cpu").model
+    width, height = input_size
+    dummy = torch.zeros(1, 3, height, width)
+    output_names = ["loc", "score", "landms"]
+    dynamic_axes = {"images": {0: "batch", 2: "height", 3: "width"}}
+    dynamic_axes.update({name: {0: "batch", 1: "priors"} for name in output_names})
+
+    # keep the TorchScript exporter on torch versions where dynamo became the default
+    kwargs = {"dynamo": False} if "dynamo" in inspect.signature(torch.onnx.export).parameters else {}
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with torch.no_grad():
+        torch.onnx.export(model, dummy, output_path, input_names=["images"], output_names=output_names,
+                          dynamic_axes=dynamic_axes, opset_version=opset_version, **kwargs)
+    return output_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the RetinaFace checkpoint to ONNX")
+    parser.add_argument("model_path", nargs="?", default="data/pretrained/retina_face.pth.tar")
+    parser.add_argument("output_path", nargs="?", default="data/cache/retina_face.onnx")
+    args = parser.parse_args()
+    print(f"Exported: {export_onnx(args.model_path, args.output_path)}")
@@ -7,7 +7,37 @@
 import torch
 import torch.nn.functional as F
 from torch.nn import Linear, Conv2d, BatchNorm1d, BatchNorm2d, PReLU, ReLU, Sigmoid, \
-    AdaptiveAvgPool2d, Sequential, Module
+    AdaptiveAvgPool2d, Sequential, Module, Identity
+
+
+def _bn_scale_shift(bn):
+    """BatchNorm in eval mode as y = x * scale + shift"""
+    scale = bn.weight / torch.sqrt(bn.running_var + bn.eps)
+    shift = bn.bias - bn.running_mean * scale
+    return scale, shift
+
+
+@torch.no_grad()
+def fuse_conv_bn(conv, bn):
+    """Fold BatchNorm2d into the preceding Conv2d, return a Conv2d with bias"""
+    scale, shift = _bn_scale_shift(bn)
+    fused = Conv2d(conv.in_channels, conv.out_channels, kernel_size=conv.kernel_size, stride=conv.stride,
+                   padding=conv.padding, dilation=conv.dilation, groups=conv.groups, bias=True)
+    fused.weight.copy_(conv.weight * scale.reshape(-1, 1, 1, 1))
+    bias = conv.bias if conv.bias is not None else torch.zeros_like(shift)
+    fused.bias.copy_(bias * scale + shift)
+    return fused.to(conv.weight.device)
+
+
+@torch.no_grad()
+def fuse_bn_linear(bn, linear):
+    """Fold BatchNorm1d into the following Linear, return a Linear with bias"""
+    scale, shift = _bn_scale_shift(bn)
+    fused = Linear(linear.in_features, linear.out_features, bias=True)
+    fused.weight.copy_(linear.weight * scale.reshape(1, -1))
+    bias = linear.bias if linear.bias is not None else torch.zeros(linear.out_features, device=shift.device)
+    fused.bias.copy_(bias + linear.weight @ shift)
+    return fused.to(linear.weight.device)
 
 
 class L2Norm(Module):
@@ -34,6 +64,10 @@ class Conv_block(Module):
         x = self.prelu(x)
         return x
 
+    def fuse(self):
+        self.conv = fuse_conv_bn(self.conv, self.bn)
+        self.bn = Identity()
+
 
 class Linear_block(Module):
     def __init__(self, in_c, out_c, kernel=(1, 1), stride=(1, 1), padding=(0, 0), groups=1):
@@ -47,6 +81,10 @@ class Linear_block(Module):
         x = self.bn(x)
         return x
 
+    def fuse(self):
+        self.conv = fuse_conv_bn(self.conv, self.bn)
+        self.bn = Identity()
+
 
 class Depth_Wise(Module):
     def __init__(self, c1, c2, c3, residual=False, kernel=(3, 3), stride=(2, 2), padding=(1, 1), groups=1):
@@ -113,6 +151,12 @@ class SEModule(Module):
         x = self.sigmoid(x)
         return module_input * x
 
+    def fuse(self):
+        self.fc1 = fuse_conv_bn(self.fc1, self.bn1)
+        self.bn1 = Identity()
+        self.fc2 = fuse_conv_bn(self.fc2, self.bn2)
+        self.bn2 = Identity()
+
 
 class ResidualSE(Module):
     def __init__(self, c1, c2, c3, num_block, groups, kernel=(3, 3), stride=(1, 1), padding=(1, 1), se_reduct=4):
@@ -237,6 +281,23 @@ class MiniFASNet(Module):
         out = self.prob(out)
         return out
 
+    def fuse_for_inference(self):
+        """
+        Inference-only transformation: fold every BatchNorm into its conv/linear layer
+        and replace no-op layers (eval BatchNorm, Dropout) with Identity.
+        The model can't be trained afterwards.
+        """
+        self.eval()
+        for module in list(self.modules()):
+            if isinstance(module, (Conv_block, Linear_block, SEModule)):
+                module.fuse()
+
+        # bn -> drop (no-op in eval) -> prob: fold bn into prob
+        self.prob = fuse_bn_linear(self.bn, self.prob)
+        self.bn = Identity()
+        self.drop = Identity()
+        return self
+
 
 class MiniFASNetSE(MiniFASNet):
     def __init__(self, keep, embedding_size, conv6_kernel=(7, 7), drop_p=0.75, num_classes=4, img_channel=3):
@@ -0,0 +1,170 @@
+# RetinaFace with a MobileNet-0.25 backbone
+# Ref: https://github.com/biubug6/Pytorch_Retinaface
+import torch
+import torch.nn.functional as F
+from torch.nn import Conv2d, BatchNorm2d, LeakyReLU, Sequential, Module, ModuleList, Identity
+
+from library.models.mini_fasnet import fuse_conv_bn
+from library.models.retina_face_config import CFG_MOBILENET
+
+__all__ = ['RetinaFace', 'CFG_MOBILENET', 'backbone_of']
+
+
+def backbone_of(state_dict) -> str:
+    """Backbone of a RetinaFace state dict, from its layer names"""
+    if any(key.startswith('body.stage1.') for key in state_dict):
+        return 'mobilenet0.25'
+    if any(key.startswith('body.layer1.') for key in state_dict):
+        return 'resnet50'
+    raise ValueError("Unknown RetinaFace checkpoint: no body.stage1 (mobilenet0.25) or body.layer1 (resnet50) layers")
+
+
+def conv_bn(inp, oup, stride=1, leaky=0.):
+    return Sequential(Conv2d(inp, oup, 3, stride, 1, bias=False), BatchNorm2d(oup),
+                      LeakyReLU(negative_slope=leaky, inplace=True))
+
+
+def conv_bn_no_relu(inp, oup, stride):
+    return Sequential(Conv2d(inp, oup, 3, stride, 1, bias=False), BatchNorm2d(oup))
+
+
+def conv_bn1x1(inp, oup, stride, leaky=0.):
+    return Sequential(Conv2d(inp, oup, 1, stride, padding=0, bias=False), BatchNorm2d(oup),
+                      LeakyReLU(negative_slope=leaky, inplace=True))
+
+
+def conv_dw(inp, oup, stride, leaky=0.1):
+    return Sequential(Conv2d(inp, inp, 3, stride, 1, groups=inp, bias=False), BatchNorm2d(inp),
+                      LeakyReLU(negative_slope=leaky, inplace=True),
+                      Conv2d(inp, oup, 1, 1, 0, bias=False), BatchNorm2d(oup),
+                      LeakyReLU(negative_slope=leaky, inplace=True))
+
+
+class MobileNetV1(Module):
+    """MobileNet-0.25 stages, returns the output of every stage"""
+
+    def __init__(self):
+        super(MobileNetV1, self).__init__()
+        self.stage1 = Sequential(
+            conv_bn(3, 8, 2, leaky=0.1),
+            conv_dw(8, 16, 1),
+            conv_dw(16, 32, 2),
+            conv_dw(32, 32, 1),
+            conv_dw(32, 64, 2),
+            conv_dw(64, 64, 1),
+        )
+        self.stage2 = Sequential(
+            conv_dw(64, 128, 2),
+            conv_dw(128, 128, 1),
+            conv_dw(128, 128, 1),
+            conv_dw(128, 128, 1),
+            conv_dw(128, 128, 1),
+            conv_dw(128, 128, 1),
+        )
+        self.stage3 = Sequential(
+            conv_dw(128, 256, 2),
+            conv_dw(256, 256, 1),
+        )
+
+    def forward(self, x):
+        stage1 = self.stage1(x)
+        stage2 = self.stage2(stage1)
+        return stage1, stage2, self.stage3(stage2)
+
+
+class FPN(Module):
+    def __init__(self, in_channels_list, out_channels):
+        super(FPN, self).__init__()
+        leaky = 0.1 if out_channels <= 64 else 0.
+        self.output1 = conv_bn1x1(in_channels_list[0], out_channels, stride=1, leaky=leaky)
+        self.output2 = conv_bn1x1(in_channels_list[1], out_channels, stride=1, leaky=leaky)
+        self.output3 = conv_bn1x1(in_channels_list[2], out_channels, stride=1, leaky=leaky)
+        self.merge1 = conv_bn(out_channels, out_channels, leaky=leaky)
+        self.merge2 = conv_bn(out_channels, out_channels, leaky=leaky)
+
+    def forward(self, inputs):
+        output1 = self.output1(inputs[0])
+        output2 = self.output2(inputs[1])
+        output3 = self.output3(inputs[2])
+
+        output2 = self.merge2(output2 + F.interpolate(output3, size=output2.shape[2:], mode="nearest"))
+        output1 = self.merge1(output1 + F.interpolate(output2, size=output1.shape[2:], mode="nearest"))
+        return output1, output2, output3
+
+
+class SSH(Module):
+    def __init__(self, in_channel, out_channel):
+        super(SSH, self).__init__()
+        leaky = 0.1 if out_channel <= 64 else 0.
+        self.conv3X3 = conv_bn_no_relu(in_channel, out_channel // 2, stride=1)
+        self.conv5X5_1 = conv_bn(in_channel, out_channel // 4, stride=1, leaky=leaky)
+        self.conv5X5_2 = conv_bn_no_relu(out_channel // 4, out_channel // 4, stride=1)
+        self.conv7X7_2 = conv_bn(out_channel // 4, out_channel // 4, stride=1, leaky=leaky)
+        self.conv7x7_3 = conv_bn_no_relu(out_channel // 4, out_channel // 4, stride=1)
+
+    def forward(self, x):
+        conv5X5_1 = self.conv5X5_1(x)
+        conv7X7_2 = self.conv7X7_2(conv5X5_1)
+        out = torch.cat([self.conv3X3(x), self.conv5X5_2(conv5X5_1), self.conv7x7_3(conv7X7_2)], dim=1)
+        return F.relu(out)
+
+
+class Head(Module):
+    """1x1 conv predicting `values` numbers per anchor, output (N, anchors, values)"""
+
+    def __init__(self, in_channels, num_anchors, values):
+        super(Head, self).__init__()
+        self.values = values
+        self.conv1x1 = Conv2d(in_channels, num_anchors * values, kernel_size=1)
+
+    def forward(self, x):
+        out = self.conv1x1(x).permute(0, 2, 3, 1)
+        return out.reshape(out.shape[0], -1, self.values)
+
+
+class RetinaFace(Module):
+    """
+    Face boxes, scores and 5 landmarks for every prior box.
+    Input: BGR image minus the mean (104, 117, 123), NCHW float32.
+    """
+
+    def __init__(self, cfg=CFG_MOBILENET):
+        super(RetinaFace, self).__init__()
+        in_channel, out_channel = cfg['in_channel'], cfg['out_channel']
+        num_anchors = len(cfg['min_sizes'][0])
+
+        self.body = MobileNetV1()
+        self.fpn = FPN([in_channel * 2, in_channel * 4, in_channel * 8], out_channel)
+        self.ssh1 = SSH(out_channel, out_channel)
+        self.ssh2 = SSH(out_channel, out_channel)
+        self.ssh3 = SSH(out_channel, out_channel)
+        self.ClassHead = ModuleList([Head(out_channel, num_anchors, 2) for _ in range(3)])
+        self.BboxHead = ModuleList([Head(out_channel, num_anchors, 4) for _ in range(3)])
+        self.LandmarkHead = ModuleList([Head(out_channel, num_anchors, 10) for _ in range(3)])
+
+    def forward(self, inputs):
+        """
+        Returns
+        -------
+            Tuple (box regressions (N, P, 4), face scores (N, P), landmark regressions (N, P, 10))
+        """
+        fpn = self.fpn(self.body(inputs))
+        features = [self.ssh1(fpn[0]), self.ssh2(fpn[1]), self.ssh3(fpn[2])]
+
+        bbox_regressions = torch.cat([head(feature) for head, feature in zip(self.BboxHead, features)], dim=1)
+        classifications = torch.cat([head(feature) for head, feature in zip(self.ClassHead, features)], dim=1)
+        ldm_regressions = torch.cat([head(feature) for head, feature in zip(self.LandmarkHead, features)], dim=1)
+        return bbox_regressions, F.softmax(classifications, dim=-1)[..., 1], ldm_regressions
+
+    def fuse_for_inference(self):
+        """
+        Fold every BatchNorm into its convolution. Call after `eval()`.
+        """
+        for module in list(self.modules()):
+            if not isinstance(module, Sequential):
+                continue
+            for idx in range(len(module) - 1):
+                if isinstance(module[idx], Conv2d) and isinstance(module[idx + 1], BatchNorm2d):
+                    module[idx] = fuse_conv_bn(module[idx], module[idx + 1])
+                    module[idx + 1] = Identity()
+        return self
@@ -0,0 +1,11 @@
+# RetinaFace configurations, without torch: the ONNX backend needs the anchors but not the network
+__all__ = ['CFG_MOBILENET']
+
+CFG_MOBILENET = {
+    'name': 'mobilenet0.25',
+    'min_sizes': [[16, 32], [64, 128], [256, 512]],
+    'steps': [8, 16, 32],
+    'variance': [0.1, 0.2],
+    'in_channel': 32,
+    'out_channel': 64,
+}
@@ -0,0 +1,92 @@
+import multiprocessing
+from multiprocessing import shared_memory
+from typing import NamedTuple, Optional, Tuple
+
+import numpy as np
+
+__all__ = ['FrameRef', 'SharedFrameRing', 'DEFAULT_SLOT_BYTES']
+
+DEFAULT_SLOT_BYTES = 1920 * 1080 * 3  # one 1080p BGR frame
+
+
+class FrameRef(NamedTuple):
+    """Frame written in a `SharedFrameRing` slot. Only this is sent to workers."""
+    slot: int
+    shape: Tuple[int, ...]
+    dtype: str
+
+
+class SharedFrameRing:
+    """
+    Ring of fixed-size frame slots in one `multiprocessing.shared_memory` block.
+
+    The requester writes a frame once with `put` and sends the returned `FrameRef`,
+    the worker reads it in place with `get` and gives the slot back with `release`.
+    Slots are taken in ring order, a slot stays busy until released.
+
+    Parameters:
+        slots: number of frames in flight
+        slot_bytes: size of a slot, larger arrays are not shared
+    """
+
+    def __init__(self, slots=4, slot_bytes=DEFAULT_SLOT_BYTES):
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.memory = shared_memory.SharedMemory(create=True, size=slots * slot_bytes)
+        # 1 = slot in use, the array lock guards the ring cursor too
+        self._busy = multiprocessing.Array('b', slots)
+        self._cursor = 0
+
+    def _acquire(self) -> Optional[int]:
+        with self._busy.get_lock():
+            for step in range(self.slots):
+                slot = (self._cursor + step) % self.slots
+                if not self._busy[slot]:
+                    self._busy[slot] = 1
+                    self._cursor = (slot + 1) % self.slots
+                    return slot
+        return None
+
+    def _view(self, slot: int, shape, dtype) -> np.ndarray:
+        return np.ndarray(shape, dtype=dtype, buffer=self.memory.buf, offset=slot * self.slot_bytes)
+
+    def put(self, array: np.ndarray) -> Optional[FrameRef]:
+        """
+        Copy `array` into a free slot.
+
+        Returns
+        -------
+            FrameRef, or None when the array does not fit or every slot is busy
+        """
+        if array.nbytes > self.slot_bytes:
+            return None
+        slot = self._acquire()
+        if slot is None:
+            return None
+        self._view(slot, array.shape, array.dtype)[...] = array
+        return FrameRef(slot, array.shape, array.dtype.str)
+
+    def get(self, ref: FrameRef) -> np.ndarray:
+        """Array of a slot, without copy. Valid until the slot is released."""
+        return self._view(ref.slot, ref.shape, np.dtype(ref.dtype))
+
+    def release(self, ref: FrameRef):
+        with self._busy.get_lock():
+            self._busy[ref.slot] = 0
+
+    def in_use(self) -> int:
+        with self._busy.get_lock():
+            return sum(self._busy)
+
+    def close(self, unlink=True):
+        """Detach the shared memory, `unlink` frees it (owner side)."""
+        try:
+            self.memory.close()
+        except BufferError:
+            # a caller still holds an array of a slot, the mapping goes away with it
+            pass
+        if unlink:
+            try:
+                self.memory.unlink()
+            except FileNotFoundError:
+                pass
@@ -1,50 +1,166 @@
+import asyncio
+import os
+import queue
+import signal
+import threading
 import time
+import traceback
 from abc import ABC
-from multiprocessing import Queue, Pipe, connection
+from multiprocessing import Queue, Pipe, Process, Value, connection
+from multiprocessing.reduction import ForkingPickler
 from threading import Thread
-from typing import Callable, Any
+from typing import Callable, Any, Tuple
 
-from library.face_antspoofing import SpoofingDetector
+import numpy as np
 
-__all__ = ['Message', 'Worker', 'SpoofingDetectorWorker', 'stop_worker']
+from library.face_antspoofing.base import BaseSpoofingDetector
+from library.face_detection.base import BaseFaceDetector
+from library.shared_frames import DEFAULT_SLOT_BYTES, FrameRef, SharedFrameRing
+
+__all__ = ['Message', 'Worker', 'ProcessWorker', 'WorkerPool', 'SpoofingDetectorWorker', 'SpoofingDetectorProcessWorker',
+           'FaceDetectorWorker', 'FaceDetectorProcessWorker', 'stop_worker']
+
+
+class _RemoteTraceback(Exception):
+    """traceback of an error raised in a worker, chained to the error re-raised for the caller"""
+
+    def __str__(self):
+        return self.args[0]
+
+
+class _WorkerError:
+    """Respond of a request whose processor raised, re-raised by `Message.respond_data`"""
+
+    def __init__(self, error: BaseException):
+        self.traceback = "".join(traceback.format_exception(type(error), error, error.__traceback__))
+        try:
+            ForkingPickler.dumps(error)
+            self.error = error
+        except Exception:
+            self.error = RuntimeError(f"{type(error).__name__}: {error}")
+
+    def reraise(self):
+        raise self.error from _RemoteTraceback(self.traceback)
 
 
 class Message:
     """Respond data type of Worker"""
     __NO_DATA = b"0x00"
 
-    def __init__(self, request_data: Any, data_fetcher: connection.Connection = None):
+    def __init__(self, request_data: Any, data_fetcher: connection.Connection = None,
+                 is_alive: Callable[[], bool] = None):
         """
         Parameters
         ----------
             request_data: input data to Worker
             data_fetcher: Connect of PIPE.
+            is_alive: liveness of the worker, waiting for a dead worker raises EOFError
         """
         self.__respond_data = Message.__NO_DATA
         self.__data_fetcher = data_fetcher
         self.__request_data = request_data
+        self.__is_alive = is_alive
 
     @property
     def request_data(self):
         return self.__request_data
 
+    def __wait(self):
+        while not self.__data_fetcher.poll(0.2):
+            if not self.__is_alive() and not self.__data_fetcher.poll(0):
+                raise EOFError("worker stopped before responding")
+
     @property
     def respond_data(self):
+        """
+        Result of the processor for this request, an error raised by the processor is raised here.
+        """
         if self.__respond_data == Message.__NO_DATA:
-            self.__respond_data = self.__data_fetcher.recv()
-            self.__data_fetcher.close()
+            try:
+                if self.__is_alive is not None:
+                    self.__wait()
+                self.__respond_data = self.__data_fetcher.recv()
+            except ConnectionResetError as e:
+                raise EOFError("worker closed the connection") from e
+            finally:
+                self.__data_fetcher.close()
+        if isinstance(self.__respond_data, _WorkerError):
+            self.__respond_data.reraise()
         return self.__respond_data
 
+    async def respond_async(self):
+        """
+        `respond_data` for coroutines: the event loop watches the pipe instead of a thread blocking on it.
+        Loops that cannot watch pipes (Windows proactor) wait in the default executor instead.
+        """
+        if self.__respond_data != Message.__NO_DATA or self.__data_fetcher.closed:
+            return self.respond_data
+
+        loop = asyncio.get_running_loop()
+        readable = loop.create_future()
+        fd = self.__data_fetcher.fileno()
+        try:
+            loop.add_reader(fd, lambda: readable.done() or readable.set_result(None))
+        except (NotImplementedError, ValueError, OSError):
+            return await loop.run_in_executor(None, lambda: self.respond_data)
+
+        try:
+            while not readable.done():
+                await asyncio.wait([readable], timeout=0.2)
+                if (not readable.done() and self.__is_alive is not None and not self.__is_alive()
+                        and not self.__data_fetcher.poll(0)):
+                    self.__data_fetcher.close()
+                    raise EOFError("worker stopped before responding")
+        finally:
+            loop.remove_reader(fd)
+        # the respond is written at once by the worker, recv does not wait for long
+        return self.respond_data
 
-class Worker(Thread):
-    """Worker extend Thread for define data flow and process async"""
-    __STOP_SIGNAL = b'U1RPUA=='
 
-    def __init__(self, name=None):
-        super().__init__(name=name or self.__class__.__name__)
-        self.queue_request = Queue()
+class _LocalRequest:
+    """
+    Request to a thread worker: the arguments are handed over by reference, only the respond goes through the pipe.
+    """
+
+    def __init__(self, data_pipe: connection.Connection, args, kwargs):
+        self.data_pipe = data_pipe
+        self.args = args
+        self.kwargs = kwargs
+
+    def recv(self):
+        return self.args, self.kwargs
+
+    def send(self, result):
+        self.data_pipe.send(result)
+
+
+def _is_image(value) -> bool:
+    """uint8 (H, W, C) array: the frames the shared memory slots are sized for"""
+    return isinstance(value, np.ndarray) and value.ndim == 3 and value.dtype == np.uint8
+
+
+class _WorkerLoop:
+    """
+    Request / respond loop shared by thread and process workers.
+    An error of the processor is sent back to the request that raised it, the loop keeps serving the others.
+
+    Parameters:
+        frame_slots: > 0 sends image arguments (uint8 H x W x C frames) through a shared memory ring of this many
+            slots, the request pipe only carries the slot index, shape and dtype. Other arguments are pickled.
+        frame_bytes: size of a slot, larger arrays and requests made while every slot is busy are pickled.
+        max_batch_size: requests handled together by `process_batch`, 1 = one at a time
+        max_wait_ms: how long the first request of a batch waits for more
+    """
+    _STOP_SIGNAL = b'U1RPUA=='
+
+    def _init_loop(self, frame_slots=0, frame_bytes=DEFAULT_SLOT_BYTES, max_batch_size=1, max_wait_ms=0):
+        self.queue_request = self._make_queue()
         self.task_count = 0
-        self.__stop = 1
+        self.max_batch_size = max(max_batch_size, 1)
+        self.max_wait_ms = max_wait_ms
+        # requests sent and not answered yet, shared with the worker process
+        self.pending = Value('i', 0)
+        self.frames = SharedFrameRing(frame_slots, frame_bytes) if frame_slots > 0 else None
 
     def __enter__(self):
         self.start()
@@ -54,7 +170,13 @@ class Worker(Thread):
         self.stop()
 
     def stop(self):
-        self.queue_request.put_nowait(Worker.__STOP_SIGNAL)
+        self.queue_request.put_nowait(self._STOP_SIGNAL)
+
+    def close(self):
+        """Free the shared frame ring, once the worker has stopped."""
+        if self.frames is not None:
+            self.frames.close()
+            self.frames = None
 
     def __repr__(self):
         return self.__class__.__name__
@@ -62,64 +184,464 @@ class Worker(Thread):
     def processor(self) -> Callable:
         raise NotImplementedError
 
+    def _make_queue(self):
+        return Queue()
+
+    def _put_pipe(self, request: connection.Connection):
+        self.queue_request.put(request)
+
+    def _get_pipe(self, timeout=None):
+        return self.queue_request.get(timeout=timeout)
+
+    def _is_stop(self, data_pipe) -> bool:
+        return isinstance(data_pipe, bytes) and data_pipe == self._STOP_SIGNAL
+
+    def process_batch(self, processor: Callable, calls) -> list:
+        """
+        Results of several requests, one per (args, kwargs) of `calls`.
+        Workers whose processor can batch override this, default calls it once per request.
+        """
+        return [processor(*args, **kwargs) for args, kwargs in calls]
+
+    def _collect(self, first) -> Tuple[list, bool]:
+        """
+        `first` request plus the ones queued within max_wait_ms, up to max_batch_size.
+        :return: Tuple (request pipes, stop signal received)
+        """
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            try:
+                data_pipe = self._get_pipe(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                break
+            if self._is_stop(data_pipe):
+                return batch, True
+            batch.append(data_pipe)
+        return batch, False
+
+    def _results(self, processor: Callable, calls) -> list:
+        """
+        One result per call, `_WorkerError` for the calls that raised.
+        A failed batch is run again one call at a time, only the failing requests get the error.
+        """
+        if len(calls) > 1:
+            try:
+                return self.process_batch(processor, calls)
+            except Exception:
+                pass
+        results = []
+        for args, kwargs in calls:
+            try:
+                results.append(processor(*args, **kwargs))
+            except Exception as e:
+                results.append(_WorkerError(e))
+        return results
+
+    @staticmethod
+    def _respond(data_pipe: connection.Connection, result):
+        try:
+            data_pipe.send(result)
+        except OSError:
+            # the caller closed its end, nobody waits for this respond
+            pass
+        except Exception as e:
+            # result the pipe cannot pickle
+            data_pipe.send(_WorkerError(e))
+
+    def _process(self, processor: Callable, batch):
+        refs, answered = [], 0
+        try:
+            calls, callers = [], []
+            for data_pipe in batch:
+                try:
+                    args, kwargs = data_pipe.recv()
+                    call_refs = [value for value in (*args, *kwargs.values()) if isinstance(value, FrameRef)]
+                    refs.extend(call_refs)
+                    if call_refs:
+                        args, kwargs = self._unpack_frames(args, kwargs)
+                except (EOFError, OSError):
+                    # the caller went away before its arguments were read
+                    continue
+                except Exception as e:
+                    self._respond(data_pipe, _WorkerError(e))
+                    continue
+                calls.append((args, kwargs))
+                callers.append(data_pipe)
+
+            results = self._results(processor, calls)
+            # no longer in flight once the caller can read its respond
+            with self.pending.get_lock():
+                self.pending.value -= len(batch)
+            answered = len(batch)
+            for data_pipe, result in zip(callers, results):
+                self._respond(data_pipe, result)
+        finally:
+            # the results are pickled by send, the slots can be reused now
+            for ref in refs:
+                self.frames.release(ref)
+            with self.pending.get_lock():
+                self.pending.value -= len(batch) - answered
+
     def run(self):
         processor = self.processor()
 
-        while self.__stop:
-            data_pipe = self.queue_request.get()
-            if data_pipe == Worker.__STOP_SIGNAL:
+        stop = False
+        while not stop:
+            data_pipe = self._get_pipe()
+            if self._is_stop(data_pipe):
                 break
+            batch, stop = self._collect(data_pipe)
+            self._process(processor, batch)
 
-            args, kwargs = data_pipe.recv()
-            result = processor(*args, **kwargs)
-            data_pipe.send(result)
+    def _pack_frames(self, args, kwargs):
+        """image arguments written to the frame ring, replaced by their FrameRef"""
+        def pack(value):
+            if _is_image(value):
+                return self.frames.put(value) or value
+            return value
+
+        return tuple(pack(value) for value in args), {key: pack(value) for key, value in kwargs.items()}
+
+    def _unpack_frames(self, args, kwargs):
+        def unpack(value):
+            return self.frames.get(value) if isinstance(value, FrameRef) else value
+
+        return tuple(unpack(value) for value in args), {key: unpack(value) for key, value in kwargs.items()}
 
     def request(self, *args, **kwargs) -> Message:
         request, respond = Pipe()
-        msg = Message((args, kwargs), respond)
-        self.queue_request.put(request)
-        respond.send((args, kwargs))
+        msg = Message((args, kwargs), respond, self.is_alive)
+        with self.pending.get_lock():
+            self.pending.value += 1
+        self._send_request(request, respond, args, kwargs)
         return msg
 
+    def _send_request(self, request: connection.Connection, respond: connection.Connection, args, kwargs):
+        self._put_pipe(request)
+        if self.frames is not None:
+            respond.send(self._pack_frames(args, kwargs))
+        else:
+            respond.send((args, kwargs))
+
+    def call(self, *args, **kwargs):
+        """`request` and wait for its respond data, the worker used like its processor"""
+        return self.request(*args, **kwargs).respond_data
+
+    async def submit(self, *args, **kwargs):
+        """
+        `request` awaited on the running event loop, returns the respond data.
+        Arguments are written to the pipe at once, share frames with frame_slots to keep that short.
+        """
+        return await self.request(*args, **kwargs).respond_async()
+
+    __call__ = request
+
+
+class Worker(_WorkerLoop, Thread):
+    """
+    Worker extend Thread for define data flow and process async.
+    The processor gets the arguments of `request` by reference, without copy: the caller must not modify them
+    before it has the respond. Only the respond is pickled.
+
+    Parameters:
+        name: thread name
+        frame_slots: unused, arguments are not copied (same signature as `ProcessWorker`)
+        frame_bytes: unused
+        max_batch_size: requests handled together by `process_batch`, 1 = one at a time
+        max_wait_ms: how long the first request of a batch waits for more
+    """
+
+    def __init__(self, name=None, frame_slots=0, frame_bytes=DEFAULT_SLOT_BYTES, max_batch_size=1, max_wait_ms=0):
+        Thread.__init__(self, name=name or self.__class__.__name__)
+        self._init_loop(0, frame_bytes, max_batch_size, max_wait_ms)
+
+    def _make_queue(self):
+        return queue.Queue()
+
+    def _send_request(self, request: connection.Connection, respond: connection.Connection, args, kwargs):
+        self._put_pipe(_LocalRequest(request, args, kwargs))
+
+
+class ProcessWorker(_WorkerLoop, Process):
+    """
+    Worker running in its own process, the processor is built there and does not share the GIL.
+    Same request / Message contract as `Worker`, `processor`, args and kwargs must be usable in the child.
+    Requests in flight when the process dies raise EOFError on `Message.respond_data`, an error of the processor
+    is raised there for its request only and the process keeps serving.
+
+    Parameters:
+        name: process name
+        frame_slots: > 0 sends image arguments (uint8 H x W x C frames) through a shared memory ring of this many
+            slots, the request pipe only carries the slot index, shape and dtype. Other arguments are pickled.
+        frame_bytes: size of a slot, larger arrays and requests made while every slot is busy are pickled.
+        max_batch_size: requests handled together, see `Worker`
+        max_wait_ms: how long the first request of a batch waits for more
+    """
+
+    def __init__(self, name=None, frame_slots=0, frame_bytes=DEFAULT_SLOT_BYTES, max_batch_size=1, max_wait_ms=0):
+        Process.__init__(self, name=name or self.__class__.__name__, daemon=True)
+        self._init_loop(frame_slots, frame_bytes, max_batch_size, max_wait_ms)
+
+    def _put_pipe(self, request: connection.Connection):
+        # pickled now so our end can be closed, the queue would pickle it later in its feeder thread
+        self.queue_request.put(bytes(ForkingPickler.dumps(request)))
+        request.close()
+
+    def _get_pipe(self, timeout=None):
+        data = self.queue_request.get(timeout=timeout)
+        return data if data == self._STOP_SIGNAL else ForkingPickler.loads(data)
+
+    def run(self):
+        # Ctrl+C goes to the whole process group, the parent stops workers with stop_worker
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        super().run()
+
+
+def _has_died(worker) -> bool:
+    """started and no longer running"""
+    return worker.ident is not None and not worker.is_alive()
+
+
+class WorkerPool:
+    """
+    N replicas of a worker behind one `request`.
+
+    Parameters:
+        factory: builds a replica, e.g. `lambda: SpoofingDetectorProcessWorker(frame_slots=4)`
+        replicas: number of replicas. (Default: CPU count)
+        dispatch: round_robin, or least_loaded (fewest requests in flight)
+        health_interval: seconds between `check_health` runs of a monitor thread, so an idle pool restarts
+            dead replicas too. None = only checked when a request is routed to a dead replica
+    """
+    DISPATCH_MODES = ("round_robin", "least_loaded")
+
+    def __init__(self, factory: Callable[[], _WorkerLoop], replicas=None, dispatch="least_loaded",
+                 health_interval=5.0):
+        if dispatch not in WorkerPool.DISPATCH_MODES:
+            raise ValueError(f"Unknown dispatch: {dispatch}, expected one of {WorkerPool.DISPATCH_MODES}")
+        self.factory = factory
+        self.dispatch = dispatch
+        self.replicas = [factory() for _ in range(replicas or os.cpu_count() or 1)]
+        self._next = 0
+        self._lock = threading.Lock()
+        self._stopped = False
+        self.health_interval = health_interval
+        self._stop_event = threading.Event()
+        self._monitor = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        stop_worker(self)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({len(self.replicas)} x {self.replicas[0]!r}, {self.dispatch})"
+
+    def start(self):
+        for replica in self.replicas:
+            replica.start()
+        if self.health_interval:
+            self._monitor = Thread(target=self._watch, name=f"{self.__class__.__name__}-health", daemon=True)
+            self._monitor.start()
+        return self
+
+    def _watch(self):
+        while not self._stop_event.wait(self.health_interval):
+            try:
+                self.check_health()
+            except Exception as e:
+                # a replica that fails to start is retried at the next check
+                print(f"{self!r} health check failed: {e}")
+
+    def stop(self):
+        with self._lock:
+            self._stopped = True
+        self._stop_event.set()
+        for replica in self.replicas:
+            if replica.is_alive():
+                replica.stop()
+
+    def is_alive(self) -> bool:
+        return any(replica.is_alive() for replica in self.replicas)
+
+    def close(self):
+        for replica in self.replicas:
+            replica.close()
+
+    def check_health(self) -> int:
+        """
+        Replace replicas that died.
+
+        Returns
+        -------
+            Number of restarted replicas
+        """
+        restarted = 0
+        with self._lock:
+            if self._stopped:
+                return 0
+            for idx, replica in enumerate(self.replicas):
+                if not _has_died(replica):
+                    continue
+                print(f"{replica} replica {idx} died (exit code {getattr(replica, 'exitcode', None)}), restarting")
+                replica.close()
+                self.replicas[idx] = self.factory()
+                self.replicas[idx].start()
+                restarted += 1
+        return restarted
+
+    def _select(self) -> _WorkerLoop:
+        with self._lock:
+            if self.dispatch == "round_robin":
+                replica = self.replicas[self._next % len(self.replicas)]
+                self._next += 1
+                return replica
+            return min(self.replicas, key=lambda worker: worker.pending.value)
+
+    def request(self, *args, **kwargs) -> Message:
+        replica = self._select()
+        if _has_died(replica):
+            self.check_health()
+            replica = self._select()
+        return replica.request(*args, **kwargs)
+
+    def call(self, *args, **kwargs):
+        """`request` and wait for its respond data"""
+        return self.request(*args, **kwargs).respond_data
+
+    async def submit(self, *args, **kwargs):
+        """`request` awaited on the running event loop, see `Worker.submit`"""
+        return await self.request(*args, **kwargs).respond_async()
+
     __call__ = request
 
 
-def stop_worker(*services: Worker):
+def stop_worker(*services, timeout=5):
+    """
+    Stop thread workers, process workers and pools, then free their frame rings.
+    Workers still running after `timeout` seconds are abandoned, processes are terminated.
+    """
+    workers = []
     for service in services:
-        if not isinstance(service, Thread):
-            continue
-
-        service.stop()
-        time_estimate = 0
-        while service.is_alive():
-            time.sleep(0.1)
-            time_estimate += 0.1
-            if time_estimate >= 5:
-                service.queue_request.close()
-                break
+        if isinstance(service, WorkerPool):
+            service.stop()
+            workers.extend(service.replicas)
+        elif isinstance(service, (Thread, Process)):
+            service.stop()
+            workers.append(service)
+
+    deadline = time.monotonic() + timeout
+    for service in workers:
+        if service.ident is not None:
+            service.join(max(deadline - time.monotonic(), 0))
+        if service.is_alive() and isinstance(service, Process):
+            service.queue_request.close()
+            service.terminate()
+            service.join(1)
+        if not service.is_alive():
+            service.close()
+
+
+def _face_detector(args, kwargs):
+    if not args and not kwargs:
+        # no explicit model: share the process-wide detector of config.yaml
+        from utils.registry import get_config, get_face_detector
+        return get_face_detector(get_config())
+    # torch only loads in the worker that runs the torch detector
+    from library.face_detection.detector import FaceDetector
+    return FaceDetector(*args, **kwargs)
+
+
+def _detect_args(image):
+    return image
+
+
+def _detect_batch(processor: BaseFaceDetector, calls):
+    """requests of `FaceDetector.detect` in one `detect_batch`"""
+    return processor.detect_batch([_detect_args(*args, **kwargs) for args, kwargs in calls])
 
 
 class FaceDetectorWorker(Worker, ABC):
-    """FaceDetectorWorker implement from Worker & FaceDetector"""
+    """
+    FaceDetectorWorker implement from Worker & FaceDetector.
+    With max_batch_size > 1, frames queued together share one model forward.
+    """
+
+    def __init__(self, *args, frame_slots=0, max_batch_size=1, max_wait_ms=0, **kwargs):
+        super().__init__(frame_slots=frame_slots, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+        self.args = args
+        self.kwargs = kwargs
+
+    def processor(self):
+        return _face_detector(self.args, self.kwargs)
+
+    def process_batch(self, processor, calls):
+        return _detect_batch(processor, calls)
+
+
+class FaceDetectorProcessWorker(ProcessWorker, ABC):
+    """FaceDetectorWorker in its own process, the detector is loaded in the child"""
 
-    def __init__(self, *args, **kwargs):
-        super().__init__()
+    def __init__(self, *args, frame_slots=0, max_batch_size=1, max_wait_ms=0, **kwargs):
+        super().__init__(frame_slots=frame_slots, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
         self.args = args
         self.kwargs = kwargs
 
     def processor(self):
-        model = FaceDetector(*self.args, **self.kwargs)
-        return model
+        return _face_detector(self.args, self.kwargs)
+
+    def process_batch(self, processor, calls):
+        return _detect_batch(processor, calls)
+
+
+def _spoofing_detector(args, kwargs):
+    if not args and not kwargs:
+        # no explicit model: share the process-wide detector of config.yaml
+        from utils.registry import get_config, get_spoofing_detector
+        return get_spoofing_detector(get_config())
+    from library.face_antspoofing.detector import SpoofingDetector
+    return SpoofingDetector(*args, **kwargs)
+
+
+def _predict_args(boxes, image):
+    return boxes, image
+
+
+def _spoofing_batch(processor: BaseSpoofingDetector, calls):
+    """requests of `SpoofingDetector.predict` in one `predict_batch`"""
+    return processor.predict_batch([_predict_args(*args, **kwargs) for args, kwargs in calls])
 
 
 class SpoofingDetectorWorker(Worker, ABC):
-    """SpoofingDetectorWorker implement from Worker & SpoofingDetector"""
+    """
+    SpoofingDetectorWorker implement from Worker & SpoofingDetector.
+    With max_batch_size > 1, requests queued together share one model forward.
+    """
+
+    def __init__(self, *args, frame_slots=0, max_batch_size=1, max_wait_ms=0, **kwargs):
+        super().__init__(frame_slots=frame_slots, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+        self.args = args
+        self.kwargs = kwargs
+
+    def processor(self):
+        return _spoofing_detector(self.args, self.kwargs)
 
-    def __init__(self, *args, **kwargs):
-        super().__init__()
+    def process_batch(self, processor, calls):
+        return _spoofing_batch(processor, calls)
+
+
+class SpoofingDetectorProcessWorker(ProcessWorker, ABC):
+    """SpoofingDetectorWorker in its own process, the detector is loaded in the child"""
+
+    def __init__(self, *args, frame_slots=0, max_batch_size=1, max_wait_ms=0, **kwargs):
+        super().__init__(frame_slots=frame_slots, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
         self.args = args
         self.kwargs = kwargs
 
     def processor(self):
-        spoofing_detector = SpoofingDetector(*self.args, **self.kwargs)
-        return spoofing_detector
+        return _spoofing_detector(self.args, self.kwargs)
+
+    def process_batch(self, processor, calls):
+        return _spoofing_batch(processor, calls)
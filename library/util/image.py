@@ -13,7 +13,7 @@ Drawing: https://docs.opencv.org/2.4/modules/core/doc/drawing_functions.html
 """
 
 IM_RGB = 0
-IM_BGR = 0
+IM_BGR = 1
 DEFAULT_QUALITY = 95
 
 
@@ -2,7 +2,7 @@ from typing import Union, Iterator, Type
 
 import numpy
 
-__all__ = ['check_type', 'euclidean_distance', 'scale_box', 'remove_prefix']
+__all__ = ['check_type', 'euclidean_distance', 'scale_box', 'scale_boxes', 'remove_prefix']
 
 
 def remove_prefix(state_dict, prefix):
@@ -76,3 +76,46 @@ def scale_box(src_w, src_h, bbox, scale):
         right_bottom_y = src_h - 1
 
     return int(left_top_x), int(left_top_y), int(right_bottom_x), int(right_bottom_y)
+
+
+def scale_boxes(src_w, src_h, boxes, scales):
+    """
+    Vectorized `scale_box` for every box and every scale.
+
+    Parameters
+    ----------
+        src_w: image width
+        src_h: image height
+        boxes: (N, 4) boxes [x1, y1, x2, y2]
+        scales: (S,) scales
+
+    Returns
+    -------
+        (S, N, 4) int boxes, same values as `scale_box`
+    """
+    boxes = numpy.asarray(boxes, dtype=numpy.float64).reshape(1, -1, 4)
+    scales = numpy.asarray(scales, dtype=numpy.float64).reshape(-1, 1)
+    box_w = boxes[..., 2] - boxes[..., 0]
+    box_h = boxes[..., 3] - boxes[..., 1]
+
+    scale = numpy.minimum((src_h - 1) / box_h, numpy.minimum((src_w - 1) / box_w, scales))
+    new_width = box_w * scale
+    new_height = box_h * scale
+    center_x, center_y = box_w / 2 + boxes[..., 0], box_h / 2 + boxes[..., 1]
+
+    left_top_x = center_x - new_width / 2
+    left_top_y = center_y - new_height / 2
+    right_bottom_x = center_x + new_width / 2
+    right_bottom_y = center_y + new_height / 2
+
+    # shift inside the image, like scale_box
+    shift = numpy.minimum(left_top_x, 0)
+    left_top_x, right_bottom_x = left_top_x - shift, right_bottom_x - shift
+    shift = numpy.minimum(left_top_y, 0)
+    left_top_y, right_bottom_y = left_top_y - shift, right_bottom_y - shift
+    shift = numpy.maximum(right_bottom_x - src_w + 1, 0)
+    left_top_x, right_bottom_x = left_top_x - shift, right_bottom_x - shift
+    shift = numpy.maximum(right_bottom_y - src_h + 1, 0)
+    left_top_y, right_bottom_y = left_top_y - shift, right_bottom_y - shift
+
+    return numpy.trunc(numpy.stack([left_top_x, left_top_y, right_bottom_x, right_bottom_y], axis=-1)).astype(int)
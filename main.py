@@ -1,74 +1,118 @@
+import os
 import cv2
 from recognition.face_recognition import FaceRecognition
+from recognition.shared_inference import SharedInference
 from utils.drawing import DrawingTool
 from firebase.firebase_service import FirebaseService
-import tkinter as tk
-from gui.gui import GUI
 import threading
+import time
 from queue import Queue
+from utils.pipeline import Pipeline
+from utils.registry import get_config
+from utils.uploads import LocalUploader, UploadExecutor
+
+class FrameTask:
+    """
+    a frame and what the pipeline stages found in it
+    """
+    __slots__ = ("frame", "start_point", "end_point", "captured_at", "faces", "bbox", "face_status",
+                 "recognized_user_ids")
+
+    def __init__(self, frame, start_point, end_point):
+        self.frame = frame
+        self.start_point = start_point
+        self.end_point = end_point
+        self.captured_at = time.perf_counter()
+        self.faces = []
+        self.bbox = None
+        self.face_status = None
+        self.recognized_user_ids = set()
+
 
 class VideoProcessor:
     """
-    process video
+    process video in stages: capture -> detect -> recognize (liveness, recognition, drawing) -> publish (GUI,
+    warnings, attendance). Each stage has its own thread, a stage busy on a frame lets the previous one overwrite
+    the frames waiting for it (drop oldest), so the frame rate is the one of the slowest stage.
     """
-    def __init__(self, cap, face_recognition, drawer, app, stop_event, firebase_queue, firebase_service):
+    def __init__(self, cap, face_recognition, drawer, app, stop_event, firebase_queue, uploads,
+                 queue_size=2, stats_interval=0, name="camera"):
         self.cap = cap
         self.face_recognition = face_recognition
         self.drawer = drawer
         self.app = app
         self.stop_event = stop_event
         self.firebase_queue = firebase_queue
-        self.firebase_service = firebase_service
-        self.last_recognized_id = None
+        self.uploads = uploads
+        self.last_recognized_ids = set()
+        self.stats_interval = stats_interval
+        self.frame_latency_ms = 0.0
+        self.pipeline = (Pipeline(queue_size, stop_event, name=name)
+                         .add("capture", self.capture)
+                         .add("detect", self.detect)
+                         .add("recognize", self.recognize)
+                         .add("publish", self.publish))
 
     def process(self):
-        while not self.stop_event.is_set():
-            ret, frame = self.cap.read()
-            if not ret:
-                print("Could not receive frame from camera!")
-                break
-
-            # crop frame
-            frame = self.face_recognition.crop_frame(frame)
-            frame, start_point, end_point = self.drawer.draw_target_frame(frame, 350, (0, 0, 255))
-
-            # face recognition
-            faces = self.face_recognition.detect_faces(frame)
-            processed_frame, bbox, recognized_user_id, face_status = self.face_recognition.process_frame(
-                frame, faces, start_point, end_point, self.drawer
+        self.pipeline.run(self.stats_interval)
+
+    def stats(self):
+        """
+        throughput of every stage, see Pipeline.stats
+        """
+        return self.pipeline.stats()
+
+    def capture(self):
+        ret, frame = self.cap.read()
+        if not ret:
+            print("Could not receive frame from camera!")
+            return None
+
+        # crop frame
+        frame = self.face_recognition.crop_frame(frame)
+        frame, start_point, end_point = self.drawer.draw_target_frame(frame, 350, (0, 0, 255))
+        return FrameTask(frame, start_point, end_point)
+
+    def detect(self, task):
+        task.faces = self.face_recognition.detect_faces(task.frame)
+        return task
+
+    def recognize(self, task):
+        if self.face_recognition.multi_face:
+            task.frame, face_results = self.face_recognition.process_frame_multi(
+                task.frame, task.faces, task.start_point, task.end_point, self.drawer
+            )
+            task.bbox, task.face_status = self.face_recognition.summarize_results(face_results)
+            task.recognized_user_ids = {user_id for _, user_id, _ in face_results if user_id}
+        else:
+            task.frame, task.bbox, recognized_user_id, task.face_status = self.face_recognition.process_frame(
+                task.frame, task.faces, task.start_point, task.end_point, self.drawer
             )
+            task.recognized_user_ids = {recognized_user_id} if recognized_user_id else set()
+        return task
 
-            # update frame and img label
-            self.app.update_processed_frame(processed_frame)
-            self.app.update_image_label(face_status)
+    def publish(self, task):
+        # update frame and img label
+        self.app.update_processed_frame(task.frame)
+        self.app.update_image_label(task.face_status)
 
-            # upload img to cloud
-            img_path = self.face_recognition.handle_warning(processed_frame, bbox, face_status)
-            if img_path:
-                threading.Thread(target=self.upload_to_cloudinary, args=(img_path, face_status), daemon=True).start()
+        # upload img to cloud, journaled and uploaded by the upload workers
+        img_path = self.face_recognition.handle_warning(task.frame, task.bbox, task.face_status)
+        if img_path:
+            self.uploads.submit(img_path, task.face_status)
 
-            # recognition process
-            if recognized_user_id != self.last_recognized_id:
-                self.last_recognized_id = recognized_user_id
-                if recognized_user_id:
-                    self.firebase_queue.put(recognized_user_id)
-                else:
-                    self.app.reset_infor_label()
+        # recognition process
+        recognized_user_ids = task.recognized_user_ids
+        if recognized_user_ids != self.last_recognized_ids:
+            for user_id in recognized_user_ids - self.last_recognized_ids:
+                self.firebase_queue.put(user_id)
+            if not recognized_user_ids:
+                self.app.reset_infor_label()
+            self.last_recognized_ids = recognized_user_ids
 
-    def upload_to_cloudinary(self, img_path, face_status):
-        """
-        upload and write alert log
-        """
-        try:
-            link_img = self.firebase_service.upload_to_cloudinary(img_path, face_status)
-            if link_img:
-                # write log alert on Firebase
-                self.firebase_service.log_alert_access(link_img, message=f"{face_status.capitalize()} detected")
-                print(f"Image link on Cloudinary: {link_img}")
-            else:
-                print("Cannot log due to Cloudinary upload error.")
-        except Exception as e:
-            print(f"Error uploading to Cloudinary: {e}")
+        # capture to display
+        self.frame_latency_ms = (time.perf_counter() - task.captured_at) * 1000
+        return None
 
 
 
@@ -99,27 +143,108 @@ class FirebaseProcessor:
                 pass
 
 
+def open_sources(sources):
+    """
+    open camera indices / video files, the ones that cannot be opened are skipped
+    :return: list of (source, cap)
+    """
+    opened = []
+    for source in sources:
+        cap = cv2.VideoCapture(source)
+        if not cap.isOpened():
+            print(f"Cannot open camera {source}. Please check the connection!")
+            continue
+        opened.append((source, cap))
+    return opened
+
+
+def start_processors(source, cap, app, configs, services, drawer, firebase, uploads, stop_event):
+    """
+    VideoProcessor and FirebaseProcessor of one source on daemon threads.
+    Counters, tracker and warning timers are per source, the models and the gallery index are shared.
+    :param app: GUI, or any object with its update/set/reset methods (gui.headless.HeadlessApp)
+    :param uploads: UploadExecutor shared by the sources, see start_uploads
+    :return: Tuple (video_processor, threads)
+    """
+    face_recognition = FaceRecognition(services=services)
+    pipeline_config = configs.get("pipeline", {})
+
+    # init queue
+    firebase_queue = Queue()
+    video_processor = VideoProcessor(cap, face_recognition, drawer, app, stop_event, firebase_queue, uploads,
+                                     queue_size=pipeline_config.get("queue_size", 2),
+                                     stats_interval=pipeline_config.get("stats_interval", 0),
+                                     name=str(source))
+    firebase_processor = FirebaseProcessor(firebase, app, firebase_queue, stop_event)
+
+    # start queue
+    threads = [threading.Thread(target=video_processor.process, daemon=True),
+               threading.Thread(target=firebase_processor.process, daemon=True)]
+    for thread in threads:
+        thread.start()
+    return video_processor, threads
+
+
+def start_services(configs, captures):
+    """
+    SharedInference when several sources are open, else None (models called directly)
+    """
+    if len(captures) > 1:
+        return SharedInference(configs, **configs.get("shared_inference", {})).start()
+    return None
+
+
+def start_uploads(configs, firebase):
+    """
+    UploadExecutor of the violation images: journal next to the violations folder, a fixed number of upload
+    threads, failed uploads retried with exponential backoff. Every upload is logged as an alert on Firebase.
+    Images encoded in memory are also saved to the violations folder by the upload threads (uploads.persist).
+    """
+    upload_config = configs.get("uploads", {})
+    if upload_config.get("backend", "cloudinary") == "local":
+        upload = LocalUploader(upload_config.get("local_folder", "uploads")).upload
+    else:
+        upload = firebase.upload_to_cloudinary
+
+    def log_alert(link_img, face_status):
+        firebase.log_alert_access(link_img, message=f"{face_status.capitalize()} detected")
+        print(f"Image link on Cloudinary: {link_img}")
+
+    violations_folder = configs["capture"]["violations"]
+    journal_path = os.path.join(violations_folder, upload_config.get("journal", "uploads.sqlite3"))
+    return UploadExecutor(upload, journal_path, workers=upload_config.get("workers", 2),
+                          backoff=upload_config.get("backoff", 1.0),
+                          max_backoff=upload_config.get("max_backoff", 300.0),
+                          on_uploaded=log_alert,
+                          persist_folder=violations_folder if upload_config.get("persist", True) else None).start()
+
+
 def setup_gui_and_processors():
     """
-    GUI and processors
+    GUI and processors, one window, pipeline and counters per source of `sources` in config.yaml.
+    With several sources the models are shared: detection, anti-spoofing and embedding requests of all
+    cameras go to one worker per model and are batched together.
     """
     # Khởi tạo các thành phần chính
-    cap = cv2.VideoCapture(0)
-    if not cap.isOpened():
-        print("Cannot open camera. Please check the connection!")
+    configs = get_config()
+    captures = open_sources(configs.get("sources") or [0])
+    if not captures:
         return
 
-    face_recognition = FaceRecognition()
+    import tkinter as tk
+    from gui.gui import GUI
+
+    services = start_services(configs, captures)
     drawer = DrawingTool()
     firebase = FirebaseService()
+    uploads = start_uploads(configs, firebase)
     root = tk.Tk()
-    app = GUI(root, cap)
     stop_event = threading.Event()
 
-    # init queue
-    firebase_queue = Queue()
-    video_processor = VideoProcessor(cap, face_recognition, drawer, app, stop_event, firebase_queue, firebase)
-    firebase_processor = FirebaseProcessor(firebase, app, firebase_queue, stop_event)
+    for idx, (source, cap) in enumerate(captures):
+        window = root if idx == 0 else tk.Toplevel(root)
+        window.title(f"Camera {source}")
+        start_processors(source, cap, GUI(window, cap), configs, services, drawer, firebase, uploads, stop_event)
 
     # close process
     def on_closing():
@@ -129,15 +254,16 @@ def setup_gui_and_processors():
 
     root.protocol("WM_DELETE_WINDOW", on_closing)
 
-    # start queue
-    threading.Thread(target=video_processor.process, daemon=True).start()
-    threading.Thread(target=firebase_processor.process, daemon=True).start()
-
     # run GUI Tkinter
     root.mainloop()
 
     # release window
-    cap.release()
+    for _, cap in captures:
+        cap.release()
+    if services is not None:
+        services.stop()
+    print(f"Uploads: {uploads.stats()}")
+    uploads.stop()
     cv2.destroyAllWindows()
     print("Resources released!")
 
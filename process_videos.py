@@ -0,0 +1,71 @@
+import argparse
+import glob
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+
+from recognition.video_analysis import VideoAnalyzer, write_columns
+from utils.registry import get_config, get_or_create
+
+
+def process_file(path, output_dir, stride=1, batch_size=8, recognition=True, output_format="parquet",
+                 face_detector=None):
+    """
+    analyse one video and write its columns to `output_dir`/<video name>.<format>
+    :return: Tuple (path, frames, faces, seconds, written path)
+    """
+    configs = get_config()
+    # one analyzer per process, reused for every file the process gets
+    analyzer = get_or_create(("video_analyzer", recognition, batch_size, face_detector),
+                             lambda: VideoAnalyzer(configs, recognition=recognition, batch_size=batch_size,
+                                                   face_detector=face_detector))
+    start = time.perf_counter()
+    columns = analyzer.analyze_video(path, stride)
+    elapsed = time.perf_counter() - start
+
+    name = os.path.splitext(os.path.basename(path))[0]
+    written = write_columns(columns, os.path.join(output_dir, f"{name}.{output_format}"))
+    return path, len(np.unique(columns["frame"])), int((columns["face"] >= 0).sum()), elapsed, written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Detection, liveness and recognition of recorded videos, "
+                                                 "one row per face and frame in a columnar file per video")
+    parser.add_argument("videos", nargs="*", default=["face_data/*.mp4"], help="video files or glob patterns")
+    parser.add_argument("--output-dir", default="video_results")
+    parser.add_argument("--format", choices=["parquet", "npz"], default="parquet",
+                        help="parquet needs pyarrow, npz is used when it is missing")
+    parser.add_argument("--stride", type=int, default=1, help="analyse one frame out of N")
+    parser.add_argument("--batch-size", type=int, default=8, help="frames per model forward")
+    parser.add_argument("--workers", type=int, default=1, help="processes, the files are split between them")
+    parser.add_argument("--no-recognition", action="store_true", help="detection and liveness only")
+    parser.add_argument("--face-detector", choices=["insightface", "retinaface"],
+                        help="default: models.face_detector of config.yaml")
+    args = parser.parse_args()
+
+    paths = sorted({path for pattern in args.videos for path in glob.glob(pattern)})
+    if not paths:
+        raise SystemExit(f"No video matches {args.videos}")
+    os.makedirs(args.output_dir, exist_ok=True)
+    process = partial(process_file, output_dir=args.output_dir, stride=args.stride, batch_size=args.batch_size,
+                      recognition=not args.no_recognition, output_format=args.format,
+                      face_detector=args.face_detector)
+
+    start = time.perf_counter()
+    if args.workers > 1:
+        # spawn: every worker loads its own models, nothing torch related is inherited from this process
+        with ProcessPoolExecutor(args.workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            results = list(executor.map(process, paths))
+    else:
+        results = [process(path) for path in paths]
+    elapsed = time.perf_counter() - start
+
+    print(f"{'video':<28}{'frames':>8}{'faces':>8}{'FPS':>8}  output")
+    for path, frames, faces, seconds, written in results:
+        print(f"{os.path.basename(path):<28}{frames:>8}{faces:>8}{frames / seconds:>8.1f}  {written}")
+    total_frames = sum(result[1] for result in results)
+    print(f"{len(paths)} videos, {total_frames} frames in {elapsed:.1f}s ({total_frames / elapsed:.1f} FPS overall)")
@@ -1,8 +1,9 @@
 import os
 import cv2
 import numpy as np
-from utils.config import load_config
-from insightface.app import FaceAnalysis
+from utils.encoding import save_face_encodings
+from utils.registry import get_config, get_face_analysis
+from utils.uploads import EncodedImage
 import yaml
 from datetime import datetime
 
@@ -14,20 +15,24 @@ class Face_process:
         :param config_path:
         """
         #load config file
-        self.configs = load_config(config_path)
+        self.configs = get_config(config_path)
         self.dataset_dir = self.configs["capture"]["dataset_dir"]
         self.violations_folder = self.configs["capture"]["violations"]
         self.max_images = self.configs["capture"]["max_images"]
         self.face_model_name = self.configs["models"]["face_analysis_model"]
         self.output_file = self.configs["encoding"]["output_file"]
-
-        # Initialize InsightFace
-        self.face_app = FaceAnalysis(name=self.face_model_name, providers=["CUDAExecutionProvider"])
-        self.face_app.prepare(ctx_id=0, det_size=(640, 640))  # ctx_id=0: Use GPU; ctx_id=-1: Use CPU
+        self.encoding_dtype = self.configs["encoding"].get("dtype", "float32")
 
         # Ensure dataset directory exists
         os.makedirs(self.dataset_dir, exist_ok=True)
 
+    @property
+    def face_app(self):
+        """
+        InsightFace from the shared registry, loaded on first use (save_warning never needs it)
+        """
+        return get_face_analysis(self.configs, det_size=(640, 640))
+
     def capture(self, user_name, user_id, video_path=0):
         """
         Capture images of a user's face from a video source.
@@ -125,15 +130,18 @@ class Face_process:
                 print(f"Mean encoding shape for {person_name}: {mean_encoding.shape}")
                 person_encodings[f"{person_name}.{user_id}"] = mean_encoding.tolist()
 
-        #save to yaml file
+        #save to yaml file or binary gallery
         data = {
             'encoding': list(person_encodings.values()),
             'name': [key.split('.')[0] for key in person_encodings.keys()],
             'id': [key.split('.')[1] for key in person_encodings.keys()]
         }
 
-        with open(self.output_file, 'w') as file:
-            yaml.dump(data, file)
+        if self.output_file.endswith(".npy"):
+            save_face_encodings(self.output_file, data['encoding'], data['name'], data['id'], self.encoding_dtype)
+        else:
+            with open(self.output_file, 'w') as file:
+                yaml.dump(data, file)
 
         print(type(data['encoding']))
         print(f"num of encoding: {len(data['encoding'])}")
@@ -142,9 +150,9 @@ class Face_process:
         for i, name in enumerate(data['name']):
             print(f"name in {i} : {name}")
 
-        print("Process completed, data has been saved to file YAML")
+        print(f"Process completed, data has been saved to {self.output_file}")
 
-    def save_warning(self, frame, bbox, status):
+    def crop_warning(self, frame, bbox):
         x1, y1, x2, y2 = bbox
         # Calculate the margin
         width = x2 - x1
@@ -159,7 +167,10 @@ class Face_process:
         y2 = min(frame.shape[0], y2 + y_margin)
 
         # Crop the face with the margin
-        cropped_face = frame[y1:y2, x1:x2]
+        return frame[y1:y2, x1:x2]
+
+    def save_warning(self, frame, bbox, status):
+        cropped_face = self.crop_warning(frame, bbox)
 
         # create folder (spoof or unknown)
         status_folder = os.path.join(self.violations_folder, status)
@@ -174,3 +185,28 @@ class Face_process:
 
         return image_path
 
+    def encode_warning(self, frame, bbox, status):
+        """
+        crop of save_warning encoded as JPEG in memory, nothing is written to disk.
+        Quality and longest side come from `uploads` of config.yaml (jpeg_quality, max_size, 0 = full size).
+
+        :return: EncodedImage (file name, JPEG bytes)
+        """
+        upload_config = self.configs.get("uploads", {})
+        cropped_face = self.crop_warning(frame, bbox)
+
+        max_size = upload_config.get("max_size", 0)
+        height, width = cropped_face.shape[:2]
+        if max_size and max(height, width) > max_size:
+            scale = max_size / max(height, width)
+            # linear: INTER_AREA is several times slower at non-integer ratios, this runs on the video thread
+            cropped_face = cv2.resize(cropped_face, (max(round(width * scale), 1), max(round(height * scale), 1)),
+                                      interpolation=cv2.INTER_LINEAR)
+
+        ok, data = cv2.imencode(".jpg", cropped_face,
+                                [cv2.IMWRITE_JPEG_QUALITY, int(upload_config.get("jpeg_quality", 90))])
+        if not ok:
+            raise RuntimeError("Cannot encode warning image.")
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        return EncodedImage(f"{status}_{timestamp}.jpg", data.tobytes())
+
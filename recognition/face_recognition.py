@@ -1,30 +1,37 @@
+import os
 import cv2
 import numpy as np
 import math
-from insightface.app import FaceAnalysis
-from library.face_antspoofing import SpoofingDetector
+from insightface.app.common import Face
 from numpy.linalg import norm
-from utils.config import load_config
-from utils.encoding import load_face_encodings
+from utils.registry import (get_config, get_device_config, get_face_analysis, get_face_detector, get_face_encodings,
+                            get_or_create, get_spoofing_detector)
 import time
 from recognition.face_process import Face_process
+from recognition.matcher import GalleryMatcher
+from recognition.index import create_index, gallery_fingerprint, load_index
+from recognition.tracker import IoUTracker
 
 class FaceRecognition:
-    def __init__(self, config_path="config.yaml", encoding_path="encoding_face.yaml"):
+    def __init__(self, config_path="config.yaml", encoding_path=None, services=None):
         """
         :param config_path: (str) path to config.yaml file
-        :param encoding_path: (str) path to encoding_face file
+        :param encoding_path: (str) path to encoding_face file (.yaml or .npy). Default: encoding.output_file
+        :param services: (SharedInference) send detection, anti-spoofing and embedding to these workers, shared
+            and batched with the other cameras. Default: call the models directly
         """
         #load config file
-        self.configs = load_config(config_path)
-        #load face encodings
-        self.data = load_face_encodings(encoding_path)
+        self.configs = get_config(config_path)
+        self.services = services
+        #load face encodings (shared by every instance in the process)
+        self.encoding_path = encoding_path or self.configs["encoding"]["output_file"]
+        self.data = get_face_encodings(self.encoding_path)
         #Load model parameters and recognition parameters
         self.load_model_parameters()
         self.load_face_recognition_parameters()
         self.load_face_encoding_parameters()
         #tạo đối tượng
-        self.face_process = Face_process()
+        self.face_process = Face_process(config_path)
 
 
     def load_model_parameters(self):
@@ -35,13 +42,26 @@ class FaceRecognition:
         models_config = self.configs["models"]
         self.face_model_name = models_config["face_analysis_model"]
         self.antispoofing_model = models_config["antispoofing_model"]
+        self.face_modules = models_config.get("face_analysis_modules")
+        self.show_landmarks = self.configs.get("debug", {}).get("draw_landmarks", False)
 
-        #load model face analysis
-        self.face_app = FaceAnalysis(name=self.face_model_name, providers=["CUDAExecutionProvider"])
-        self.face_app.prepare(ctx_id=0, det_size=(640, 640)) # ctx_id = 0 to use GPU ctx = 1 to use CPU
+        #load model face analysis (shared by every instance in the process)
+        self.device_config = get_device_config(self.configs)
+        self.face_app = get_face_analysis(self.configs, det_size=(640, 640))
+
+        #load the lighter RetinaFace detector in place of the FaceAnalysis one
+        detector_name = models_config.get("face_detector", "insightface")
+        if detector_name not in ("insightface", "retinaface"):
+            raise ValueError(f"Unknown face_detector: {detector_name}, expected insightface or retinaface")
+        self.face_detector = None
+        if detector_name == "retinaface" and self.services is None:
+            self.face_detector = get_face_detector(self.configs)
 
         #load model face anti spoofing
-        self.spoofing_detector = SpoofingDetector(self.antispoofing_model)
+        if self.services is not None:
+            self.spoofing_detector = self.services.spoofing.call
+        else:
+            self.spoofing_detector = get_spoofing_detector(self.configs)
 
     def load_face_recognition_parameters(self):
 
@@ -49,6 +69,7 @@ class FaceRecognition:
         self.similarity_threshold = recognition_config["similarity_threshold"]
         self.margin = recognition_config["margin"]
         self.s = recognition_config["s"]
+        self.top_k = recognition_config.get("top_k", 1)
         self.real_threshold = recognition_config["real_threshold"]
         self.spoof_threshold = recognition_config["spoof_threshold"]
         self.num_true = recognition_config["num_true"]
@@ -57,17 +78,47 @@ class FaceRecognition:
         self.spoof_time_threshold = recognition_config["spoof_time_threshold"]
         self.last_unknown_time = None
         self.last_spoof_time = None
+        # violations encoded in memory and uploaded as bytes instead of written to and read back from disk
+        self.encode_warnings = self.configs.get("uploads", {}).get("in_memory", False)
 
+        # multi-face mode: real/spoof counters per face, matched between frames by IoU
+        self.multi_face = recognition_config.get("multi_face", False)
+        self.load_tracking_parameters()
+
+    def load_tracking_parameters(self):
+        """
+        With tracking enabled, identity and liveness of a face are cached on its track
+        and only recomputed for new tracks, every `reverify_interval` frames,
+        or while the similarity stays below `min_confidence`.
+        """
+        tracking_config = self.configs.get("tracking", {})
+        self.tracking = tracking_config.get("enabled", False)
+        self.reverify_interval = tracking_config.get("reverify_interval", 30)
+        self.min_confidence = tracking_config.get("min_confidence", self.similarity_threshold)
+        self.tracker = IoUTracker(iou_threshold=tracking_config.get("iou_threshold", 0.3),
+                                  max_age=tracking_config.get("max_age", 5) if self.tracking else 0)
+        self.frame_index = 0
+        if self.tracking:
+            self.multi_face = True
 
     def load_face_encoding_parameters(self):
         try:
             self.user_ids = self.data['id']
             self.known_names = self.data['name']
-            self.known_encodings = np.array(self.data['encoding'])
+            # keep .npy galleries memory-mapped
+            self.known_encodings = np.asanyarray(self.data['encoding'])
+            self.normalized_encodings = self.data.get('normalized', False)
 
             if self.known_encodings.ndim == 1:
                 self.known_encodings = self.known_encodings[np.newaxis, :]
 
+            # normalize gallery once for batched matching, one index per gallery shared by the cameras
+            key = ("gallery_matcher", os.path.abspath(self.encoding_path), self.margin, self.s,
+                   repr(sorted(self.configs["recognition"].get("index", {}).items())),
+                   self.configs.get("encoding", {}).get("dtype", "float32"))
+            self.matcher = get_or_create(key, lambda: GalleryMatcher(self.known_encodings, self.margin, self.s,
+                                                                     index=self.load_gallery_index()))
+
         except KeyError as e:
             print(f"Missing key in encoding file: {e}")
             exit(1)
@@ -75,6 +126,37 @@ class FaceRecognition:
             print(f"Error loading face encodings: {e}")
             exit(1)
 
+    def load_gallery_index(self):
+        """
+        Load the nearest-neighbour index of the gallery from `recognition.index` config.
+        A saved index is reused when it was built from the same normalized gallery (same vectors in the same
+        order), index type and parameters, else it is rebuilt and saved.
+        .npy galleries are indexed in place: already normalized, in the `encoding.dtype` of the index, and
+        fingerprinted from their sidecar.
+        """
+        index_config = dict(self.configs["recognition"].get("index", {}))
+        kind = index_config.pop("type", "flat")
+        path = index_config.pop("path", None)
+        index_config.setdefault("dtype", self.configs.get("encoding", {}).get("dtype", "float32"))
+
+        if self.normalized_encodings:
+            vectors, content = self.known_encodings, self.data.get("fingerprint")
+        else:
+            vectors, content = GalleryMatcher.normalize(self.known_encodings), None
+        fingerprint = gallery_fingerprint(vectors, kind, index_config, content=content)
+        if path and os.path.isfile(path if path.endswith(".npz") else f"{path}.npz"):
+            index = load_index(path, **index_config)
+            if index.fingerprint == fingerprint:
+                return index
+            print(f"Index {path} does not match the gallery or the index config, rebuilding...")
+
+        index = create_index(kind, **index_config)
+        index.build(vectors)
+        index.fingerprint = fingerprint
+        if path:
+            index.save(path)
+        return index
+
     def crop_frame(self, frame):
         """
         :param frame:
@@ -86,14 +168,52 @@ class FaceRecognition:
     def detect_faces(self, frame):
         """
         detect face
+        With tracking enabled only the detector runs, embeddings are computed later for the faces that need them.
         """
         try:
+            if self.tracking:
+                return self.detect_face_boxes(frame)
+            if self.face_detector is not None or self.services is not None:
+                return self.embed_faces(frame, self.detect_face_boxes(frame))
             faces = self.face_app.get(frame)
             return faces
         except Exception as e:
             print(f"Error detecting faces: {e}")
             return []
 
+    def detect_face_boxes(self, frame):
+        """
+        run the detection model only
+        :return: list of Face with bbox, kps and det_score
+        """
+        if self.services is not None:
+            bboxes, kpss = self.services.detector.call(frame)
+        elif self.face_detector is not None:
+            bboxes, kpss = self.face_detector.detect(frame)
+        else:
+            bboxes, kpss = self.face_app.det_model.detect(frame, max_num=0, metric='default')
+        return [Face(bbox=bboxes[i, 0:4], kps=kpss[i] if kpss is not None else None, det_score=bboxes[i, 4])
+                for i in range(bboxes.shape[0])]
+
+    def embed_faces(self, frame, faces):
+        """
+        run the other models of face analysis on faces from detect_face_boxes
+        With services, the embeddings of all faces come from one request to the shared embedding worker.
+        """
+        faces_to_embed = [face for face in faces if face.embedding is None]
+        skipped_tasks = {"detection"}
+        if self.services is not None and faces_to_embed:
+            embeddings = self.services.embedding.call(frame, np.stack([face.kps for face in faces_to_embed]))
+            for face, embedding in zip(faces_to_embed, embeddings):
+                face.embedding = embedding
+            skipped_tasks.add("recognition")
+
+        for face in faces_to_embed:
+            for taskname, model in self.face_app.models.items():
+                if taskname not in skipped_tasks:
+                    model.get(frame, face)
+        return faces
+
     def is_face_inside(self, bbox, start_point, end_point):
         """
         check is face inside target
@@ -113,6 +233,15 @@ class FaceRecognition:
         spoofing_results = self.spoofing_detector([bbox], frame)
         return spoofing_results[0] #(is real, score)
 
+    def check_spoofing_batch(self, bboxes, frame):
+        """
+        check spoof of all faces with one predict
+        :return: list of (is_real, score)
+        """
+        if not len(bboxes):
+            return []
+        return self.spoofing_detector(bboxes, frame)
+
     def calculate_similarity(self, embedding1, embedding2):
         """
         cal similarity of 2 embedding
@@ -126,22 +255,34 @@ class FaceRecognition:
         """
         recognize
         """
-        best_similarity = 0
-        best_identity = "Unknown"
-        best_id_index = -1
-        user_id = None
+        return self.recognize_faces([face_embedding])[0]
 
-        for i, encoding in enumerate(self.known_encodings):
-            similarity = self.calculate_similarity(face_embedding, encoding)
-            if similarity > best_similarity:
-                best_similarity = similarity
-                best_identity = self.known_names[i]
-                best_id_index = i
-                user_id = self.user_ids[best_id_index]
+    def recognize_faces(self, face_embeddings):
+        """
+        recognize a batch of faces with one gallery match
+        :param face_embeddings: (n, D) face embeddings
+        :return: list of (identity, similarity, user_id) per face
+        """
+        results = []
+        for scores, indices in zip(*self.match_faces(face_embeddings, top_k=1)):
+            best_similarity = 0
+            user_id = None
+            if len(scores) and scores[0] > best_similarity:
+                best_similarity = float(scores[0])
+                user_id = self.user_ids[indices[0]]
+
+            if best_similarity > self.similarity_threshold:
+                results.append((self.known_names[indices[0]], best_similarity, user_id))
+            else:
+                results.append(("Unknown", best_similarity, user_id))
+        return results
 
-        if best_similarity > self.similarity_threshold:
-            return best_identity, best_similarity, user_id
-        return "Unknown", best_similarity, user_id
+    def match_faces(self, face_embeddings, top_k=None):
+        """
+        top-k gallery candidates of a batch of faces
+        :return: Tuple (scores, indices), both (n, top_k), best first
+        """
+        return self.matcher.search(face_embeddings, top_k or self.top_k)
 
     def process_frame(self, frame, faces, start_point, end_point, drawer):
         """
@@ -158,9 +299,8 @@ class FaceRecognition:
             status = "waiting"
             return frame, bbox, recognized_user_id, status
         for face in faces:
-            landmarks = face.landmark_3d_68
-            for landmark in landmarks:
-                cv2.circle(frame, (int(landmark[0]), int(landmark[1])), 2, (0, 0, 255), -1)
+            if self.show_landmarks:
+                self.draw_landmarks(frame, face)
             bbox = face.bbox.astype(int)
             face_embedding = face.normed_embedding.flatten()
             # check face in target?
@@ -188,6 +328,107 @@ class FaceRecognition:
                     status = "spoof"
 
             return frame, bbox, recognized_user_id, status
+    def process_frame_multi(self, frame, faces, start_point, end_point, drawer):
+        """
+        process all faces inside the target in one batch:
+        one spoof predict over all boxes, one gallery match over all real faces
+        :return: Tuple (frame, results), results is a list of (bbox, recognized_user_id, status) per face
+        """
+        self.frame_index += 1
+        if not faces:
+            self.tracker.update([])
+            drawer.put_text(frame, "No Face Detected", (start_point[0], start_point[1] - 10), (0, 0, 255))
+            return frame, []
+
+        if self.show_landmarks:
+            for face in faces:
+                self.draw_landmarks(frame, face)
+
+        # check faces in target
+        faces = [face for face in faces if self.is_face_inside(face.bbox.astype(int), start_point, end_point)]
+        if not faces:
+            self.tracker.update([])
+            drawer.put_text(frame, "Face Outside", (start_point[0], start_point[1] - 10), (0, 0, 255))
+            return frame, []
+
+        bboxes = [face.bbox.astype(int) for face in faces]
+        tracks = self.tracker.update(bboxes)
+        to_check = [idx for idx, track in enumerate(tracks) if self.needs_verification(track)]
+
+        # check spoof
+        to_recognize = []
+        spoofing_results = self.check_spoofing_batch([bboxes[idx] for idx in to_check], frame)
+        for idx, (is_real, score) in zip(to_check, spoofing_results):
+            track = tracks[idx]
+            track.reset()
+            if is_real:
+                track.num_true += 1
+                track.num_false = 0
+                if track.num_true >= self.real_threshold:
+                    to_recognize.append(idx)
+            else:
+                track.num_false += 1
+                track.num_true = 0
+                if track.num_false >= self.spoof_threshold:
+                    track.status = "spoof"
+                    track.verified_at = self.frame_index
+
+        # recognition
+        if to_recognize:
+            self.embed_faces(frame, [faces[idx] for idx in to_recognize])
+            embeddings = np.stack([faces[idx].normed_embedding.flatten() for idx in to_recognize])
+            for idx, match in zip(to_recognize, self.recognize_faces(embeddings)):
+                track = tracks[idx]
+                track.match = match
+                track.status = "image" if match[0] != "Unknown" else "unknown"
+                track.verified_at = self.frame_index
+
+        results = []
+        for bbox, track in zip(bboxes, tracks):
+            recognized_user_id = None
+            if track.status == "spoof":
+                self.handle_spoofing(frame, bbox, drawer)
+            elif track.match is not None:
+                recognized_user_id = self.draw_recognition(frame, bbox, track.match, drawer)
+            results.append((bbox, recognized_user_id, track.status))
+        return frame, results
+
+    def needs_verification(self, track):
+        """
+        run spoof check and recognition again on this track?
+        """
+        if not self.tracking or track.verified_at is None:
+            return True
+        if self.frame_index - track.verified_at >= self.reverify_interval:
+            return True
+        # low confidence identity
+        return track.match is not None and track.match[1] < self.min_confidence
+
+    def summarize_results(self, results):
+        """
+        pick the face that drives the GUI label and warnings: spoof > unknown > image > checking
+        :return: Tuple (bbox, status)
+        """
+        if not results:
+            return [], "waiting"
+        priority = {"spoof": 0, "unknown": 1, "image": 2}
+        bbox, _, status = min(results, key=lambda result: priority.get(result[2], len(priority)))
+        return bbox, status
+
+    def draw_landmarks(self, frame, face):
+        """
+        debug overlay: draw the densest landmarks the loaded modules provide
+        """
+        for name in ("landmark_3d_68", "landmark_2d_106", "kps"):
+            landmarks = face.get(name)
+            if landmarks is not None:
+                break
+        else:
+            return frame
+        for landmark in landmarks:
+            cv2.circle(frame, (int(landmark[0]), int(landmark[1])), 2, (0, 0, 255), -1)
+        return frame
+
     #=====================handle_methods=========================
     def handle_spoofing(self, frame, bbox, drawer):
         """
@@ -200,7 +441,15 @@ class FaceRecognition:
         """
 
         """
-        identity, similarity, user_id = self.recognize_face(face_embedding)
+        return self.draw_recognition(frame, bbox, self.recognize_face(face_embedding), drawer)
+
+    def draw_recognition(self, frame, bbox, match, drawer):
+        """
+        draw result of recognize_face
+        :param match: (identity, similarity, user_id)
+        :return: user_id, None if unknown
+        """
+        identity, similarity, user_id = match
         split_name = identity.split('_')[0] if '_' in identity else identity
         if split_name != "Unknown":
             drawer.draw_rectangle(frame, bbox, (0, 255, 0))
@@ -212,9 +461,17 @@ class FaceRecognition:
             drawer.put_text(frame, f"Unknown {similarity:.2f}", (bbox[0], bbox[1] - 10), (0, 0, 255))
             return None
 
-    def handle_warning(self, frame, bbox, status):
+    def make_warning(self, frame, bbox, status):
         """
+        :return: EncodedImage when uploads.in_memory, else the path of the JPEG saved in the violations folder
+        """
+        if self.encode_warnings:
+            return self.face_process.encode_warning(frame, bbox, status)
+        return self.face_process.save_warning(frame, bbox, status)
 
+    def handle_warning(self, frame, bbox, status):
+        """
+        :return: image to upload (see make_warning) when a spoof / unknown face lasted long enough, else None
         """
 
         current_time = time.time()
@@ -234,9 +491,9 @@ class FaceRecognition:
                 return None
 
             if current_time - self.last_spoof_time > self.spoof_time_threshold:
-                img_path = self.face_process.save_warning(frame, bbox, status)
+                img_path = self.make_warning(frame, bbox, status)
                 self.last_spoof_time = None
-                print(f"Spoof warning saved: {img_path}")
+                print(f"Spoof warning: {img_path}")
                 return img_path
 
         # process unknown
@@ -248,7 +505,7 @@ class FaceRecognition:
                 return None
 
             if current_time - self.last_unknown_time > self.unknown_time_threshold:
-                img_path = self.face_process.save_warning(frame, bbox, status)
+                img_path = self.make_warning(frame, bbox, status)
                 self.last_unknown_time = None
-                print(f"Unknown warning saved: {img_path}")
+                print(f"Unknown warning: {img_path}")
                 return img_path
\ No newline at end of file
@@ -0,0 +1,273 @@
+import hashlib
+import json
+
+import numpy as np
+
+__all__ = ['FlatIndex', 'IVFIndex', 'HNSWIndex', 'INDEX_TYPES', 'create_index', 'load_index', 'gallery_fingerprint']
+
+
+def _top_k(scores, ids, k):
+    """
+    keep the k best (score, id) pairs of one query, best first
+    """
+    k = min(k, scores.shape[0])
+    if k < scores.shape[0]:
+        part = np.argpartition(-scores, k - 1)[:k]
+        scores, ids = scores[part], ids[part]
+    order = np.argsort(-scores)
+    return scores[order], ids[order]
+
+
+def _base_path(path):
+    """
+    path of an index file without the .npz extension
+    """
+    return path[:-4] if path.endswith(".npz") else path
+
+
+def _pad(results, k):
+    """
+    stack per-query results into (n, k) arrays, pad with score -1 / index -1
+    """
+    scores = np.full((len(results), k), -1.0, dtype=np.float32)
+    indices = np.full((len(results), k), -1, dtype=np.int64)
+    for row, (score, ids) in enumerate(results):
+        scores[row, :len(score)] = score
+        indices[row, :len(ids)] = ids
+    return scores, indices
+
+
+def gallery_fingerprint(vectors, kind, params, content=None):
+    """
+    hash of the indexed vectors (values and order), the index type and its parameters.
+    Saved with the index, a saved index is only reused for the same fingerprint.
+    :param content: hash of the vectors computed when they were written (gallery sidecar), the vectors are not
+        read then
+    """
+    digest = hashlib.sha256(f"{kind}|{json.dumps(params, sort_keys=True, default=str)}|".encode())
+    if content:
+        digest.update(f"content|{content}".encode())
+    else:
+        vectors = np.ascontiguousarray(vectors)
+        digest.update(f"{vectors.dtype}|{vectors.shape}".encode())
+        digest.update(vectors.reshape(-1).view(np.uint8))
+    return digest.hexdigest()
+
+
+class FlatIndex:
+    """
+    Exact inner-product search over L2-normalized vectors.
+    """
+    kind = "flat"
+    # gallery_fingerprint of the build, saved with the index
+    fingerprint = ""
+
+    def __init__(self, dtype="float32", **kwargs):
+        self.dtype = np.dtype(dtype)
+        self.vectors = np.empty((0, 0), dtype=self.dtype)
+
+    def __len__(self):
+        return self.vectors.shape[0]
+
+    def build(self, vectors):
+        """
+        :param vectors: (N, D) normalized vectors, kept as is (a memory-mapped gallery stays mapped) when they
+            already have the index dtype
+        """
+        self.vectors = np.asanyarray(vectors, dtype=self.dtype)
+        return self
+
+    def _cosine(self, queries, chunk=65536):
+        if self.vectors.dtype == np.float32:
+            return queries @ self.vectors.T
+        # float16 storage: upcast one chunk of the gallery at a time, never the whole matrix
+        return np.concatenate([queries @ self.vectors[start:start + chunk].astype(np.float32).T
+                               for start in range(0, max(len(self), 1), chunk)], axis=1)
+
+    def search(self, queries, k):
+        """
+        :param queries: (n, D) normalized queries
+        :return: Tuple (cosine, indices), both (n, k), best first
+        """
+        k = min(k, len(self))
+        cosine = self._cosine(queries)
+        if k < cosine.shape[1]:
+            indices = np.argpartition(-cosine, k - 1, axis=1)[:, :k]
+        else:
+            indices = np.broadcast_to(np.arange(cosine.shape[1]), cosine.shape)
+        top = np.take_along_axis(cosine, indices, axis=1)
+        order = np.argsort(-top, axis=1)
+        return np.take_along_axis(top, order, axis=1), np.take_along_axis(indices, order, axis=1)
+
+    def state(self):
+        return {"vectors": self.vectors}
+
+    def save(self, path):
+        np.savez(path, kind=self.kind, fingerprint=self.fingerprint, **self.state())
+
+    @classmethod
+    def from_state(cls, data, path=None, **kwargs):
+        kwargs["dtype"] = data["vectors"].dtype
+        index = cls(**kwargs)
+        index.vectors = data["vectors"]
+        return index
+
+
+class IVFIndex(FlatIndex):
+    """
+    Inverted-file index written in NumPy.
+    Vectors are clustered with spherical k-means, a query only scans the `nprobe` closest lists.
+    """
+    kind = "ivf"
+
+    def __init__(self, nlist=0, nprobe=8, train_iters=10, train_size=50000, seed=0, dtype="float32", **kwargs):
+        """
+        :param nlist: (int) number of lists. 0 = sqrt(N)
+        :param nprobe: (int) number of lists scanned per query
+        :param train_iters: (int) k-means iterations
+        :param train_size: (int) max vectors sampled for k-means
+        :param dtype: storage dtype of vectors, float16 halves the memory
+        """
+        super().__init__(dtype=dtype)
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_iters = train_iters
+        self.train_size = train_size
+        self.seed = seed
+        self.centroids = np.empty((0, 0), dtype=np.float32)
+        self.ids = np.empty(0, dtype=np.int64)
+        self.offsets = np.zeros(1, dtype=np.int64)
+
+    def train(self, vectors):
+        """
+        spherical k-means on a sample of vectors
+        """
+        rng = np.random.default_rng(self.seed)
+        nlist = self.nlist or max(1, int(np.sqrt(len(vectors))))
+        nlist = min(nlist, len(vectors))
+        if len(vectors) > self.train_size:
+            vectors = vectors[rng.choice(len(vectors), self.train_size, replace=False)]
+
+        centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+        for _ in range(self.train_iters):
+            assign = np.argmax(vectors @ centroids.T, axis=1)
+            order = np.argsort(assign, kind="stable")
+            # sum the members of each list, empty lists keep their old centroid
+            filled, starts = np.unique(assign[order], return_index=True)
+            sums = np.add.reduceat(vectors[order], starts, axis=0)
+            centroids[filled] = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+        return centroids
+
+    def build(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        self.centroids = self.train(vectors)
+
+        # group vectors by list, so each list is one contiguous slice
+        assign = np.concatenate([np.argmax(chunk @ self.centroids.T, axis=1)
+                                 for chunk in np.array_split(vectors, max(1, len(vectors) // 65536))])
+        self.ids = np.argsort(assign, kind="stable")
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=len(self.centroids)))])
+        self.vectors = vectors[self.ids].astype(self.dtype)
+        return self
+
+    def search(self, queries, k):
+        nprobe = min(self.nprobe, len(self.centroids))
+        probes = np.argpartition(-(queries @ self.centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+
+        results = []
+        for query, lists in zip(queries, probes):
+            rows = np.concatenate([np.arange(self.offsets[i], self.offsets[i + 1]) for i in lists])
+            scores = self.vectors[rows].astype(np.float32, copy=False) @ query
+            results.append(_top_k(scores, self.ids[rows], k))
+        return _pad(results, min(k, len(self)))
+
+    def state(self):
+        return {"vectors": self.vectors, "centroids": self.centroids, "ids": self.ids, "offsets": self.offsets,
+                "nprobe": self.nprobe}
+
+    @classmethod
+    def from_state(cls, data, path=None, **kwargs):
+        kwargs.setdefault("nprobe", int(data["nprobe"]))
+        kwargs["dtype"] = data["vectors"].dtype
+        index = cls(**kwargs)
+        index.vectors = data["vectors"]
+        index.centroids = data["centroids"]
+        index.ids = data["ids"]
+        index.offsets = data["offsets"]
+        return index
+
+
+class HNSWIndex:
+    """
+    HNSW graph index backed by the optional `hnswlib` package.
+    """
+    kind = "hnsw"
+    fingerprint = ""
+
+    def __init__(self, M=16, ef_construction=200, ef_search=64, **kwargs):
+        try:
+            import hnswlib
+        except ImportError:
+            raise ImportError("HNSW index requires `hnswlib`, install it with `pip install hnswlib`") from None
+        self.hnswlib = hnswlib
+        self.M = M
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.graph = None
+
+    def __len__(self):
+        return 0 if self.graph is None else self.graph.get_current_count()
+
+    def build(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        self.graph = self.hnswlib.Index(space="ip", dim=vectors.shape[1])
+        self.graph.init_index(max_elements=len(vectors), M=self.M, ef_construction=self.ef_construction)
+        self.graph.add_items(vectors, np.arange(len(vectors)))
+        self.graph.set_ef(self.ef_search)
+        return self
+
+    def search(self, queries, k):
+        k = min(k, len(self))
+        self.graph.set_ef(max(self.ef_search, k))
+        labels, distances = self.graph.knn_query(np.asarray(queries, dtype=np.float32), k=k)
+        # hnswlib returns 1 - inner product for space "ip"
+        return (1.0 - distances).astype(np.float32), labels.astype(np.int64)
+
+    def save(self, path):
+        path = _base_path(path)
+        self.graph.save_index(f"{path}.hnsw")
+        np.savez(path, kind=self.kind, fingerprint=self.fingerprint, dim=self.graph.dim)
+
+    @classmethod
+    def from_state(cls, data, path=None, **kwargs):
+        index = cls(**kwargs)
+        index.graph = index.hnswlib.Index(space="ip", dim=int(data["dim"]))
+        index.graph.load_index(f"{path}.hnsw")
+        index.graph.set_ef(index.ef_search)
+        return index
+
+
+INDEX_TYPES = {index.kind: index for index in (FlatIndex, IVFIndex, HNSWIndex)}
+
+
+def create_index(kind="flat", **kwargs):
+    """
+    :param kind: (str) flat, ivf or hnsw
+    :param kwargs: parameters of the index type
+    """
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type `{kind}`, expected one of {list(INDEX_TYPES)}")
+    return INDEX_TYPES[kind](**kwargs)
+
+
+def load_index(path, **kwargs):
+    """
+    load an index saved with `index.save(path)`
+    """
+    path = _base_path(path)
+    with np.load(f"{path}.npz") as data:
+        kind = str(data["kind"])
+        state = {key: data[key] for key in data.files}
+    index = INDEX_TYPES[kind].from_state(state, path=path, **kwargs)
+    index.fingerprint = str(state.get("fingerprint", ""))
+    return index
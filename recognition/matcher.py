@@ -0,0 +1,66 @@
+import numpy as np
+
+from recognition.index import FlatIndex
+
+
+class GalleryMatcher:
+    def __init__(self, encodings, margin, s, index=None):
+        """
+        Batched matcher over the enrolled gallery.
+        The gallery is L2-normalized once here, so scoring is one matrix product.
+
+        :param encodings: (N, D) array of known face encodings. Unused when `index` is already built
+        :param margin: (float) additive angular margin
+        :param s: (float) scale of the margin score
+        :param index: nearest-neighbour index from recognition.index (default: exact FlatIndex)
+        """
+        self.margin = margin
+        self.s = s
+        self.index = index if index is not None else FlatIndex()
+        if not len(self.index):
+            self.index.build(self.normalize(encodings))
+
+        # cos(theta + m) = cos(theta) * cos(m) - sin(theta) * sin(m)
+        self.cos_m = np.float32(np.cos(margin))
+        self.sin_m = np.float32(np.sin(margin))
+
+    def __len__(self):
+        return len(self.index)
+
+    @staticmethod
+    def normalize(embeddings):
+        """
+        L2-normalize rows, return (n, D) float32 array
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if embeddings.ndim == 1:
+            embeddings = embeddings[np.newaxis, :]
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings / np.maximum(norms, np.finfo(np.float32).eps)
+
+    def margin_score(self, cosine):
+        """
+        vectorized s * cos(acos(cosine) + margin)
+        """
+        cosine = np.clip(cosine, -1.0, 1.0)
+        sine = np.sqrt(1.0 - cosine * cosine)
+        return self.s * (cosine * self.cos_m - sine * self.sin_m)
+
+    def search(self, queries, top_k=1):
+        """
+        Score queries against the gallery and keep the top-k identities.
+        The margin score is monotonic in the cosine for every score above 0,
+        so ranking on the cosine gives the same best match as ranking on the score.
+
+        :param queries: (D,) or (n, D) query embeddings
+        :param top_k: (int) number of identities returned per query
+        :return: Tuple (scores, indices), both (n, top_k), best first
+        """
+        queries = self.normalize(queries)
+        top_k = min(top_k, len(self))
+        if top_k <= 0:
+            empty = np.empty((queries.shape[0], 0))
+            return empty.astype(np.float32), empty.astype(np.int64)
+
+        top_cosine, indices = self.index.search(queries, top_k)
+        return self.margin_score(top_cosine), indices
@@ -0,0 +1,116 @@
+import numpy as np
+from insightface.utils import face_align
+
+from library.task_manager import FaceDetectorWorker, SpoofingDetectorWorker, Worker, stop_worker
+from utils.registry import get_face_analysis, get_face_detector, get_spoofing_detector
+
+
+class FaceEmbedder:
+    """
+    arcface embeddings of the faces of several frames in one forward
+    :param model: recognition model of FaceAnalysis (insightface ArcFaceONNX)
+    """
+
+    def __init__(self, model):
+        self.model = model
+
+    def embed_batch(self, items):
+        """
+        :param items: list of (frame, kpss), kpss (N, 5, 2) landmarks of the faces of the frame
+        :return: one (N, D) embedding array per item
+        """
+        crops = [face_align.norm_crop(frame, landmark=kps, image_size=self.model.input_size[0])
+                 for frame, kpss in items for kps in kpss]
+        counts = [len(kpss) for _, kpss in items]
+        embeddings = self.model.get_feat(crops) if crops else np.zeros((0, 0), dtype=np.float32)
+        splits = np.cumsum([0] + counts)
+        return [embeddings[begin:end] for begin, end in zip(splits[:-1], splits[1:])]
+
+    def __call__(self, frame, kpss):
+        return self.embed_batch([(frame, kpss)])[0]
+
+
+class EmbeddingWorker(Worker):
+    """
+    EmbeddingWorker implement from Worker & FaceEmbedder: request(frame, kpss) -> (N, D) embeddings.
+    With max_batch_size > 1, faces of requests queued together share one forward.
+    :param model: recognition model, default the one of the shared FaceAnalysis of `configs`
+    """
+
+    def __init__(self, configs=None, model=None, max_batch_size=1, max_wait_ms=0):
+        super().__init__(max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+        self.configs = configs
+        self.model = model
+
+    def processor(self):
+        return FaceEmbedder(self.model or get_face_analysis(self.configs, det_size=(640, 640)).models["recognition"])
+
+    def process_batch(self, processor, calls):
+        return processor.embed_batch([_embed_args(*args, **kwargs) for args, kwargs in calls])
+
+
+def _embed_args(frame, kpss):
+    return frame, kpss
+
+
+class _InsightFaceDetectorWorker(Worker):
+    """detection module of the shared FaceAnalysis, it takes one frame per call"""
+
+    def __init__(self, configs, **kwargs):
+        super().__init__(**kwargs)
+        self.configs = configs
+
+    def processor(self):
+        det_model = get_face_analysis(self.configs, det_size=(640, 640)).det_model
+        return lambda frame: det_model.detect(frame, max_num=0, metric='default')
+
+
+class _RetinaFaceDetectorWorker(FaceDetectorWorker):
+    def __init__(self, configs, **kwargs):
+        super().__init__(**kwargs)
+        self.configs = configs
+
+    def processor(self):
+        return get_face_detector(self.configs)
+
+
+class _SpoofingWorker(SpoofingDetectorWorker):
+    def __init__(self, configs, **kwargs):
+        super().__init__(**kwargs)
+        self.configs = configs
+
+    def processor(self):
+        return get_spoofing_detector(self.configs)
+
+
+class SharedInference:
+    """
+    one set of models for several cameras: the detection, anti-spoofing and embedding requests of every
+    FaceRecognition go to one worker per model, requests queued together run as one batch.
+    The workers are threads of this process, frames are handed over without copy.
+    :param configs: config of the models (config.yaml)
+    :param max_batch_size: requests of different cameras handled in one forward
+    :param max_wait_ms: how long the first request of a batch waits for the other cameras
+    """
+
+    def __init__(self, configs, max_batch_size=4, max_wait_ms=5):
+        options = dict(max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+        if configs["models"].get("face_detector", "insightface") == "retinaface":
+            self.detector = _RetinaFaceDetectorWorker(configs, **options)
+        else:
+            # no batched forward in the InsightFace detector, the worker still serializes it for every camera
+            self.detector = _InsightFaceDetectorWorker(configs, **options)
+        self.spoofing = _SpoofingWorker(configs, **options)
+        self.embedding = EmbeddingWorker(configs, **options)
+
+    @property
+    def workers(self):
+        return [self.detector, self.spoofing, self.embedding]
+
+    def start(self):
+        for worker in self.workers:
+            worker.start()
+        return self
+
+    def stop(self):
+        stop_worker(*self.workers)
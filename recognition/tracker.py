@@ -0,0 +1,102 @@
+__all__ = ['bbox_iou', 'Track', 'IoUTracker']
+
+
+def bbox_iou(box1, box2):
+    """
+    intersection over union of 2 boxes (x1, y1, x2, y2)
+    """
+    inter_w = min(box1[2], box2[2]) - max(box1[0], box2[0])
+    inter_h = min(box1[3], box2[3]) - max(box1[1], box2[1])
+    if inter_w <= 0 or inter_h <= 0:
+        return 0.0
+    inter = inter_w * inter_h
+    union = (box1[2] - box1[0]) * (box1[3] - box1[1]) + (box2[2] - box2[0]) * (box2[3] - box2[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+class Track:
+    """
+    One face followed across frames, with the cached result of the expensive stages.
+    """
+
+    def __init__(self, track_id, bbox):
+        self.track_id = track_id
+        self.bbox = bbox
+        self.misses = 0
+        # liveness votes
+        self.num_true = 0
+        self.num_false = 0
+        # cached result: (identity, similarity, user_id), status, frame index of the last verification
+        self.match = None
+        self.status = ""
+        self.verified_at = None
+
+    def reset(self):
+        """
+        drop the cached result, the track is checked again from the next frame
+        """
+        self.match = None
+        self.status = ""
+        self.verified_at = None
+
+    def __repr__(self):
+        return f"Track(id={self.track_id}, bbox={list(self.bbox)}, status={self.status!r})"
+
+
+class IoUTracker:
+    """
+    Greedy IoU association of face boxes between frames.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_age=0):
+        """
+        :param iou_threshold: (float) min IoU for a box to continue a track
+        :param max_age: (int) frames a track is kept without a matching box
+        """
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.tracks = []
+        self.next_id = 0
+
+    def reset(self):
+        self.tracks = []
+
+    def update(self, bboxes):
+        """
+        :param bboxes: face boxes of the current frame
+        :return: list of Track, one per box, in the order of `bboxes`
+        """
+        pairs = sorted(((bbox_iou(bbox, track.bbox), box_idx, track_idx)
+                        for box_idx, bbox in enumerate(bboxes)
+                        for track_idx, track in enumerate(self.tracks)), reverse=True)
+
+        assigned = [None] * len(bboxes)
+        used = set()
+        for iou, box_idx, track_idx in pairs:
+            if iou < self.iou_threshold:
+                break
+            if assigned[box_idx] is not None or track_idx in used:
+                continue
+            assigned[box_idx] = self.tracks[track_idx]
+            used.add(track_idx)
+
+        # age unmatched tracks
+        kept = []
+        for track_idx, track in enumerate(self.tracks):
+            if track_idx in used:
+                continue
+            track.misses += 1
+            if track.misses <= self.max_age:
+                kept.append(track)
+
+        for box_idx, bbox in enumerate(bboxes):
+            track = assigned[box_idx]
+            if track is None:
+                track = Track(self.next_id, bbox)
+                self.next_id += 1
+            track.bbox = bbox
+            track.misses = 0
+            assigned[box_idx] = track
+
+        self.tracks = assigned + kept
+        return assigned
@@ -0,0 +1,179 @@
+"""
+Offline analysis of recorded videos: every face of every (strided) frame with its detection, liveness and
+identity, as columns. Frames are decoded on a background thread and analysed in batches.
+"""
+import os
+import queue
+import threading
+
+import cv2
+import numpy as np
+
+from utils.registry import get_face_analysis, get_face_detector, get_spoofing_detector
+
+COLUMNS = ("video", "frame", "time_ms", "face", "x1", "y1", "x2", "y2", "det_score", "is_real", "liveness_score",
+           "identity", "similarity", "user_id")
+
+
+class FrameReader(threading.Thread):
+    """
+    decode a video in the background, iterate over (frame index, time ms, frame)
+    :param stride: keep one frame out of `stride`, the others are only grabbed (not converted)
+    :param queue_size: decoded frames waiting for the consumer, the reader blocks when it is full
+    """
+
+    def __init__(self, path, stride=1, queue_size=32):
+        super().__init__(name=f"reader-{os.path.basename(path)}", daemon=True)
+        self.path = path
+        self.stride = max(stride, 1)
+        self.frames = queue.Queue(maxsize=queue_size)
+        self._stop_event = threading.Event()
+
+    def run(self):
+        cap = cv2.VideoCapture(self.path)
+        try:
+            index = 0
+            while not self._stop_event.is_set():
+                if index % self.stride:
+                    if not cap.grab():
+                        break
+                else:
+                    ret, frame = cap.read()
+                    if not ret:
+                        break
+                    self._put((index, cap.get(cv2.CAP_PROP_POS_MSEC), frame))
+                index += 1
+        finally:
+            cap.release()
+            self._put(None)
+
+    def _put(self, item):
+        while not self._stop_event.is_set():
+            try:
+                self.frames.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def stop(self):
+        self._stop_event.set()
+
+    def __iter__(self):
+        if self.ident is None:
+            self.start()
+        try:
+            while True:
+                item = self.frames.get()
+                if item is None:
+                    return
+                yield item
+        finally:
+            self.stop()
+
+
+class VideoAnalyzer:
+    """
+    detection, liveness and recognition of batches of frames, with the models of config.yaml
+    :param configs: config
+    :param recognition: match faces against the gallery (needs the FaceAnalysis recognition model)
+    :param batch_size: frames per model forward
+    :param face_detector: insightface | retinaface. Default: models.face_detector of config
+    """
+
+    def __init__(self, configs, recognition=True, batch_size=8, face_detector=None):
+        self.batch_size = batch_size
+        if (face_detector or configs["models"].get("face_detector", "insightface")) == "retinaface":
+            self.detect_batch = get_face_detector(configs).detect_batch
+        else:
+            det_model = get_face_analysis(configs, det_size=(640, 640)).det_model
+            self.detect_batch = lambda frames: [det_model.detect(frame, max_num=0, metric='default')
+                                                for frame in frames]
+        self.spoofing_detector = get_spoofing_detector(configs)
+
+        self.face_recognition = None
+        self.embedder = None
+        if recognition:
+            from recognition.face_recognition import FaceRecognition
+            from recognition.shared_inference import FaceEmbedder
+            self.face_recognition = FaceRecognition()
+            self.embedder = FaceEmbedder(self.face_recognition.face_app.models["recognition"])
+
+    def analyze_batch(self, frames):
+        """
+        :return: one list per frame of (bbox (5,) with score, is_real, liveness score, (identity, similarity, user_id))
+        """
+        detections = self.detect_batch(frames)
+        items = [([box[:4].astype(int) for box in bboxes], frame) for (bboxes, _), frame in zip(detections, frames)]
+        liveness = self.spoofing_detector.predict_batch(items)
+
+        matches = [[(None, np.nan, None)] * len(bboxes) for bboxes, _ in detections]
+        if self.embedder is not None and any(len(bboxes) for bboxes, _ in detections):
+            embeddings = self.embedder.embed_batch([(frame, kpss) for (_, kpss), frame in zip(detections, frames)])
+            flat = self.face_recognition.recognize_faces(
+                np.concatenate([embedding for embedding in embeddings if len(embedding)]))
+            offset = 0
+            for idx, embedding in enumerate(embeddings):
+                matches[idx] = flat[offset:offset + len(embedding)]
+                offset += len(embedding)
+
+        return [[(bbox, is_real, score, match) for bbox, (is_real, score), match in zip(bboxes, frame_liveness,
+                                                                                         frame_matches)]
+                for (bboxes, _), frame_liveness, frame_matches in zip(detections, liveness, matches)]
+
+    def analyze_video(self, path, stride=1):
+        """
+        :return: dict of columns (COLUMNS), one row per face, frames without face have one row with face = -1
+        """
+        columns = {name: [] for name in COLUMNS}
+
+        def add_row(frame_index, time_ms, face, bbox, is_real, score, match):
+            identity, similarity, user_id = match
+            row = (path, frame_index, time_ms, face, *bbox, is_real, score, identity or "", similarity,
+                   "" if user_id is None else str(user_id))
+            for name, value in zip(COLUMNS, row):
+                columns[name].append(value)
+
+        batch = []
+
+        def flush():
+            for (frame_index, time_ms, _), faces in zip(batch, self.analyze_batch([frame for *_, frame in batch])):
+                if not faces:
+                    add_row(frame_index, time_ms, -1, [np.nan] * 5, False, np.nan, (None, np.nan, None))
+                for face, (bbox, is_real, score, match) in enumerate(faces):
+                    add_row(frame_index, time_ms, face, bbox, is_real, score, match)
+            batch.clear()
+
+        for item in FrameReader(path, stride):
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                flush()
+        if batch:
+            flush()
+        return to_arrays(columns)
+
+
+def to_arrays(columns):
+    dtypes = {"video": str, "frame": np.int32, "time_ms": np.float32, "face": np.int16, "is_real": bool,
+              "identity": str, "user_id": str}
+    return {name: np.asarray(values, dtype=dtypes.get(name, np.float32)) for name, values in columns.items()}
+
+
+def write_columns(columns, output_path):
+    """
+    write columns as parquet (needs pyarrow) or as npz when the path ends with .npz or pyarrow is missing
+    :return: the written path
+    """
+    if not output_path.endswith(".npz"):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            print("pyarrow not installed, writing npz instead of parquet")
+            output_path = os.path.splitext(output_path)[0] + ".npz"
+        else:
+            table = pyarrow.table({name: values.tolist() if values.dtype.kind == "U" else values
+                                   for name, values in columns.items()})
+            pyarrow.parquet.write_table(table, output_path)
+            return output_path
+    np.savez_compressed(output_path, **columns)
+    return output_path
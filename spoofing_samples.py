@@ -0,0 +1,59 @@
+"""
+Face samples and evaluation helpers shared by the anti-spoofing tests and benchmarks.
+"""
+import os
+
+import cv2
+import numpy as np
+
+from library.face_antspoofing import load_crops
+
+
+def load_samples(folder="violations_folder", margin=0.4):
+    """
+    Face crops saved by Face_process.save_warning, with the face box inside the margin.
+    :return: list of (image, box, label), label is the sub-folder name (spoof / unknown)
+    """
+    return load_crops(os.path.join(folder, "*", "*.jpg"), margin)
+
+
+def make_batch(frame, num_faces, seed=0):
+    """
+    `num_faces` random face boxes in a frame
+    """
+    rng = np.random.default_rng(seed)
+    height, width = frame.shape[:2]
+    boxes = []
+    for _ in range(num_faces):
+        size = int(rng.integers(80, min(height, width) // 2))
+        x = int(rng.integers(0, width - size))
+        y = int(rng.integers(0, height - size))
+        boxes.append([x, y, x + size, min(y + int(size * 1.2), height - 1)])
+    return boxes
+
+
+def read_frame(video_path):
+    cap = cv2.VideoCapture(video_path)
+    ret, frame = cap.read()
+    cap.release()
+    if not ret:
+        raise SystemExit(f"Cannot read {video_path}")
+    return frame
+
+
+def split_crops(crops):
+    """
+    first half calibrates, second half is held out. Contiguous halves: the near-identical crops saved seconds
+    apart for one face stay on the same side
+    """
+    middle = (len(crops) + 1) // 2
+    return crops[:middle], crops[middle:]
+
+
+def evaluate(detector, crops):
+    """
+    :return: Tuple (raw scores, predicted real flags) per crop
+    """
+    scores = np.concatenate([np.asarray(detector.predict_scores([box], image), dtype=np.float64)
+                             for image, box, _ in crops])
+    return scores, scores.argmax(axis=1) == 1
@@ -0,0 +1,59 @@
+import os
+import tempfile
+from pathlib import Path
+
+import onnx
+import pytest
+from insightface.model_zoo import model_zoo
+from onnx import TensorProto, helper
+
+from utils.device import DEFAULT_DEVICE_CONFIG, create_face_analysis
+
+
+def save_model(path, input_shape, num_outputs):
+    """
+    identity graph with the input and output count insightface routes models on
+    """
+    inputs = [helper.make_tensor_value_info("input.1", TensorProto.FLOAT, input_shape)]
+    outputs = [helper.make_tensor_value_info(f"out{idx}", TensorProto.FLOAT, input_shape) for idx in range(num_outputs)]
+    nodes = [helper.make_node("Identity", ["input.1"], [f"out{idx}"]) for idx in range(num_outputs)]
+    graph = helper.make_graph(nodes, "tiny", inputs, outputs)
+    onnx.save(helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)], ir_version=8), path)
+
+
+def test_sessions_built_once_with_options(tmp_path, monkeypatch):
+    model_dir = tmp_path / "models" / "tiny"
+    os.makedirs(model_dir)
+    save_model(str(model_dir / "det.onnx"), [1, 3, "height", "width"], 9)  # RetinaFace: 9 outputs
+    save_model(str(model_dir / "w600k.onnx"), [1, 3, 112, 112], 1)  # ArcFace: square input
+
+    sessions = []
+
+    class CountingSession(model_zoo.PickableInferenceSession):
+        def __init__(self, model_path, **kwargs):
+            super().__init__(model_path, **kwargs)
+            sessions.append((os.path.basename(model_path), kwargs.get("sess_options")))
+
+    monkeypatch.setattr(model_zoo, "PickableInferenceSession", CountingSession)
+    device_config = dict(DEFAULT_DEVICE_CONFIG, intra_op_num_threads=1, graph_optimization_level="ORT_ENABLE_BASIC",
+                         ctx_id=-1)
+    face_app = create_face_analysis("tiny", device_config, root=str(tmp_path), det_size=(64, 64))
+
+    # one session per model file, built with the device options
+    assert sorted(name for name, _ in sessions) == ["det.onnx", "w600k.onnx"]
+    assert all(options.intra_op_num_threads == 1 for _, options in sessions)
+    assert sorted(face_app.models) == ["detection", "recognition"]
+    for model in face_app.models.values():
+        assert model.session.get_session_options().intra_op_num_threads == 1
+
+    # modules left out are not kept
+    sessions.clear()
+    face_app = create_face_analysis("tiny", device_config, allowed_modules=["detection"], root=str(tmp_path),
+                                    det_size=(64, 64))
+    assert list(face_app.models) == ["detection"] and len(sessions) == 2
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp, pytest.MonkeyPatch().context() as patch:
+        test_sessions_built_once_with_options(Path(tmp), patch)
+    print("FaceAnalysis sessions are built once, with the device session options")
@@ -0,0 +1,104 @@
+import glob
+import os
+import subprocess
+import sys
+import tempfile
+
+import cv2
+import numpy as np
+
+from library.face_detection import FaceDetector, OnnxFaceDetector, export_onnx, nms
+from library.task_manager import FaceDetectorWorker, stop_worker
+from library.util.image import IM_RGB
+
+MODEL_PATH = "data/pretrained/retina_face.pth.tar"
+
+
+def sample_frames(index=30):
+    """one frame of every clip, past the first frames where a clip may not show the face yet"""
+    frames = []
+    for video_path in sorted(glob.glob("face_data/*.mp4")):
+        cap = cv2.VideoCapture(video_path)
+        cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+        ret, frame = cap.read()
+        cap.release()
+        assert ret, video_path
+        frames.append(frame)
+    return frames
+
+
+def test_nms():
+    dets = np.array([[0, 0, 10, 10, 0.9], [1, 1, 10, 10, 0.8], [20, 20, 30, 30, 0.7], [0, 0, 10, 10, 0.95]],
+                    dtype=np.float32)
+    assert nms(dets, 0.4).tolist() == [3, 2]
+    assert nms(dets, 1.0).tolist() == [3, 0, 1, 2]
+
+
+def test_detect_clips():
+    detector = FaceDetector(MODEL_PATH, input_size=(320, 320))
+    for frame in sample_frames():
+        bboxes, kpss = detector.detect(frame)
+        assert bboxes.shape == (1, 5) and kpss.shape == (1, 5, 2)
+        x1, y1, x2, y2, score = bboxes[0]
+        assert score > detector.confidence_threshold and 0 <= x1 < x2 <= frame.shape[1] and y1 < y2
+        # eyes, nose and mouth corners fall inside the face box
+        assert np.all((kpss[0] >= [x1, y1]) & (kpss[0] <= [x2, y2]))
+
+
+def test_batch_rgb_and_onnx_match():
+    frames = sample_frames()[:4]
+    detector = FaceDetector(MODEL_PATH, input_size=(320, 320))
+    expected = [detector.detect(frame) for frame in frames]
+
+    rgb_detector = FaceDetector(MODEL_PATH, input_size=(320, 320), pixel_format=IM_RGB)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        onnx_detector = OnnxFaceDetector(export_onnx(MODEL_PATH, os.path.join(tmp_dir, "retina_face.onnx")),
+                                         input_size=(320, 320))
+        results = {
+            "batch": detector.detect_batch(frames),
+            "rgb": rgb_detector.detect_batch([frame[..., ::-1] for frame in frames]),
+            "onnx": onnx_detector.detect_batch(frames),
+        }
+    for name, result in results.items():
+        for (bboxes, kpss), (expected_bboxes, expected_kpss) in zip(result, expected):
+            assert np.allclose(bboxes, expected_bboxes, atol=1e-2), name
+            assert np.allclose(kpss, expected_kpss, atol=1e-2), name
+
+
+def test_onnx_backend_without_torch():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        onnx_path = export_onnx(MODEL_PATH, os.path.join(tmp_dir, "retina_face.onnx"))
+        # fresh interpreter: the shared inference workers and the onnx detector run, torch must stay unloaded
+        script = ("import sys, numpy as np\n"
+                  "import recognition.shared_inference\n"
+                  "from library.face_detection import OnnxFaceDetector\n"
+                  f"detector = OnnxFaceDetector({onnx_path!r}, input_size=(320, 320))\n"
+                  "bboxes, kpss = detector.detect(np.zeros((240, 320, 3), np.uint8))\n"
+                  "assert bboxes.shape[1:] == (5,) and kpss.shape[1:] == (5, 2)\n"
+                  "assert 'torch' not in sys.modules, 'torch imported'\n")
+        result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+    assert result.returncode == 0, result.stderr
+
+
+def test_worker_batching():
+    frames = sample_frames()[:4]
+    worker = FaceDetectorWorker(MODEL_PATH, input_size=(320, 320), max_batch_size=4, max_wait_ms=50)
+    worker.start()
+    try:
+        messages = [worker.request(frame) for frame in frames]
+        results = [msg.respond_data for msg in messages]
+    finally:
+        stop_worker(worker)
+    expected = FaceDetector(MODEL_PATH, input_size=(320, 320)).detect_batch(frames)
+    for (bboxes, _), (expected_bboxes, _) in zip(results, expected):
+        assert np.allclose(bboxes, expected_bboxes, atol=1e-2)
+
+
+if __name__ == "__main__":
+    test_nms()
+    test_detect_clips()
+    test_batch_rgb_and_onnx_match()
+    test_onnx_backend_without_torch()
+    test_worker_batching()
+    print("RetinaFace detects the clip faces, batched, RGB, ONNX and worker results match")
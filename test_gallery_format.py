@@ -0,0 +1,142 @@
+import json
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+import yaml
+
+import utils.encoding
+from recognition.face_recognition import FaceRecognition
+from recognition.index import FlatIndex, gallery_fingerprint
+from utils.encoding import (convert_yaml_encodings, encodings_fingerprint, load_face_encodings, load_npy_encodings,
+                            save_face_encodings, sidecar_path)
+from utils.registry import get_face_encodings
+
+
+def make_gallery(num=6, dim=512, seed=0):
+    rng = np.random.default_rng(seed)
+    encodings = rng.normal(size=(num, dim)) * rng.uniform(1, 30, size=(num, 1))
+    return encodings, [f"person{idx}" for idx in range(num)], list(range(100, 100 + num))
+
+
+def expected_vectors(encodings):
+    return encodings / np.linalg.norm(encodings, axis=1, keepdims=True)
+
+
+def write_yaml_gallery(path, encodings, names, ids):
+    with open(path, "w") as file:
+        yaml.dump({"encoding": encodings.tolist(), "name": names, "id": [str(i) for i in ids]}, file)
+
+
+def test_npy_round_trip(tmp_path):
+    encodings, names, ids = make_gallery()
+    path = str(tmp_path / "gallery.npy")
+    save_face_encodings(path, encodings, names, ids)
+
+    data = load_npy_encodings(path)
+    with open(sidecar_path(path)) as file:
+        assert json.load(file) == {"name": names, "id": [str(i) for i in ids], "normalized": True,
+                                   "fingerprint": encodings_fingerprint(data["encoding"])}
+    assert isinstance(data["encoding"], np.memmap) and data["encoding"].dtype == np.float32
+    np.testing.assert_allclose(data["encoding"], expected_vectors(encodings), atol=1e-6)
+    assert data["name"] == names and data["id"] == [str(i) for i in ids] and data["normalized"]
+    assert load_face_encodings(path)["name"] == names
+
+
+def test_float16_gallery(tmp_path):
+    encodings, names, ids = make_gallery()
+    path = str(tmp_path / "gallery.npy")
+    save_face_encodings(path, encodings, names, ids, dtype="float16")
+
+    data = load_npy_encodings(path)
+    assert data["encoding"].dtype == np.float16 and data["encoding"].shape == encodings.shape
+    np.testing.assert_allclose(data["encoding"], expected_vectors(encodings), atol=1e-3)
+
+
+def test_convert_yaml_encodings(tmp_path):
+    encodings, names, ids = make_gallery()
+    yaml_path, npy_path = str(tmp_path / "gallery.yaml"), str(tmp_path / "gallery.npy")
+    write_yaml_gallery(yaml_path, encodings, names, ids)
+    convert_yaml_encodings(yaml_path, npy_path)
+
+    data = load_npy_encodings(npy_path)
+    np.testing.assert_allclose(data["encoding"], expected_vectors(encodings), atol=1e-6)
+    assert data["name"] == names and data["id"] == [str(i) for i in ids]
+
+
+def test_missing_npy_falls_back_to_yaml(tmp_path, monkeypatch):
+    encodings, names, ids = make_gallery()
+    write_yaml_gallery(str(tmp_path / "encoding_face.yaml"), encodings, names, ids)
+    npy_path = str(tmp_path / "encoding_face.npy")
+
+    # read-only deployment: the YAML gallery is loaded as is
+    def read_only(*args, **kwargs):
+        raise PermissionError("read-only file system")
+
+    monkeypatch.setattr(utils.encoding, "convert_yaml_encodings", read_only)
+    data = load_face_encodings(npy_path)
+    np.testing.assert_allclose(data["encoding"], encodings)
+    monkeypatch.undo()
+
+    # else the binary gallery is written next to it once
+    data = load_face_encodings(npy_path)
+    assert isinstance(data["encoding"], np.memmap) and data["name"] == names
+    assert Path(npy_path).is_file() and Path(sidecar_path(npy_path)).is_file()
+
+
+def test_gallery_indexed_in_place(tmp_path, monkeypatch):
+    encodings, names, ids = make_gallery()
+    path = str(tmp_path / "gallery.npy")
+    save_face_encodings(path, encodings, names, ids, dtype="float16")
+    data = load_npy_encodings(path)
+
+    # the sidecar fingerprint is trusted, the matrix is not read to hash it
+    def read_matrix(*args, **kwargs):
+        raise AssertionError("gallery hashed at startup")
+
+    monkeypatch.setattr(np, "ascontiguousarray", read_matrix)
+    face_recognition = SimpleNamespace(known_encodings=data["encoding"], normalized_encodings=True, data=data,
+                                       configs={"recognition": {"index": {"type": "flat"}},
+                                                "encoding": {"dtype": "float16"}})
+    index = FaceRecognition.load_gallery_index(face_recognition)
+    monkeypatch.undo()
+
+    # float16 memmap kept as the index storage, no float32 copy
+    assert isinstance(index, FlatIndex) and index.vectors is data["encoding"]
+    assert index.fingerprint == gallery_fingerprint(None, "flat", {"dtype": "float16"}, content=data["fingerprint"])
+    queries = expected_vectors(encodings[:3]).astype(np.float32)
+    assert (index.search(queries, 1)[1][:, 0] == [0, 1, 2]).all()
+
+
+def test_gallery_shared_between_cameras(tmp_path):
+    encodings, names, ids = make_gallery()
+    path = str(tmp_path / "gallery.npy")
+    save_face_encodings(path, encodings, names, ids)
+
+    def camera():
+        """FaceRecognition.__init__ of one source, without the models"""
+        face_recognition = FaceRecognition.__new__(FaceRecognition)
+        face_recognition.configs = {"recognition": {"index": {"type": "flat"}}, "encoding": {"dtype": "float32"}}
+        face_recognition.margin, face_recognition.s = 0.3, 64
+        face_recognition.encoding_path = path
+        face_recognition.data = get_face_encodings(path)
+        face_recognition.load_face_encoding_parameters()
+        return face_recognition
+
+    # the gallery is loaded and indexed once for every camera of the process
+    first, second = camera(), camera()
+    assert first.data is second.data and first.matcher is second.matcher
+    assert (first.matcher.search(expected_vectors(encodings[:2]), 1)[1][:, 0] == [0, 1]).all()
+
+
+if __name__ == "__main__":
+    for test in [test_npy_round_trip, test_float16_gallery, test_convert_yaml_encodings,
+                 test_gallery_shared_between_cameras]:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            test(Path(tmp_dir))
+    for test in [test_missing_npy_falls_back_to_yaml, test_gallery_indexed_in_place]:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            test(Path(tmp_dir), pytest.MonkeyPatch())
+    print("Binary galleries round-trip and legacy YAML galleries are converted")
@@ -0,0 +1,91 @@
+import io
+import json
+import os
+import socket
+import tempfile
+import threading
+
+import numpy as np
+
+from gui.headless import HeadlessApp
+from utils.sinks import FileSink, SocketSink, StdoutSink, create_sink
+
+
+class ListSink:
+    def __init__(self):
+        self.events = []
+
+    def write(self, event):
+        self.events.append(event)
+
+
+def test_headless_app_events():
+    sink = ListSink()
+    app = HeadlessApp(sink, source=0)
+    for status in ["waiting", "waiting", "", "image", "image"]:
+        app.update_processed_frame(np.zeros((4, 4, 3), dtype=np.uint8))
+        app.update_image_label(status)
+    app.set_infor_label("Kien", "AI")
+    app.update_image_label("success")
+    app.update_image_label("image")
+    app.reset_infor_label()
+    app.reset_infor_label()
+
+    # face status on change only, every attendance result, identity changes
+    assert app.frames == 5
+    assert [(event["type"], event.get("status", event.get("name"))) for event in sink.events] == [
+        ("face_status", "waiting"), ("face_status", ""), ("face_status", "image"), ("identity", "Kien"),
+        ("attendance", "success"), ("identity", None)]
+    assert all(event["source"] == 0 for event in sink.events)
+
+
+def test_stream_and_file_sinks():
+    stream = io.StringIO()
+    StdoutSink(stream).write({"type": "stats", "fps": np.float32(12.5), "bbox": np.arange(4)})
+    assert json.loads(stream.getvalue()) == {"type": "stats", "fps": 12.5, "bbox": [0, 1, 2, 3]}
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "events.jsonl")
+        sink = create_sink(f"file:{path}")
+        assert isinstance(sink, FileSink)
+        for idx in range(3):
+            sink.write({"idx": idx})
+        sink.close()
+        with open(path) as f:
+            assert [json.loads(line)["idx"] for line in f] == [0, 1, 2]
+
+
+def test_socket_sink():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "events.sock")
+        sink = create_sink(f"unix:{path}")
+        assert isinstance(sink, SocketSink)
+        sink.write({"idx": 0})  # nobody listens yet: dropped, not raised
+        assert sink.dropped == 1
+
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(path)
+        server.listen(1)
+        received = []
+
+        def listen():
+            conn, _ = server.accept()
+            with conn, conn.makefile() as lines:
+                received.extend(json.loads(line) for line in lines)
+
+        listener = threading.Thread(target=listen)
+        listener.start()
+        sink._next_attempt = 0  # skip the retry delay
+        for idx in range(1, 4):
+            sink.write({"idx": idx})
+        sink.close()
+        listener.join(5)
+        server.close()
+        assert [event["idx"] for event in received] == [1, 2, 3]
+
+
+if __name__ == "__main__":
+    test_headless_app_events()
+    test_stream_and_file_sinks()
+    test_socket_sink()
+    print("Headless app events reach stdout, file and socket sinks")
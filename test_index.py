@@ -0,0 +1,112 @@
+import os
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from recognition.face_recognition import FaceRecognition
+from recognition.index import FlatIndex, create_index, gallery_fingerprint, load_index
+from recognition.matcher import GalleryMatcher
+
+
+def synthetic_gallery(size=4000, dim=128, num_queries=200, noise=0.05, per_identity=10, seed=0):
+    """
+    normalized gallery, `per_identity` enrollments around each identity like face embeddings,
+    and noisy queries of known gallery entries
+    """
+    rng = np.random.default_rng(seed)
+    identities = rng.normal(size=(size // per_identity, dim))
+    gallery = GalleryMatcher.normalize(np.repeat(identities, per_identity, axis=0)
+                                       + rng.normal(scale=0.5, size=(size, dim)))
+    truth = rng.choice(size, num_queries, replace=False)
+    queries = GalleryMatcher.normalize(gallery[truth] + rng.normal(scale=noise, size=(num_queries, dim)))
+    return gallery, queries, truth
+
+
+def recall(indices, expected):
+    """
+    share of the expected neighbours found, per query then averaged
+    """
+    return np.mean([len(set(row) & set(ref)) / len(ref) for row, ref in zip(indices, expected)])
+
+
+def test_ivf_recall():
+    gallery, queries, truth = synthetic_gallery()
+    _, flat_indices = FlatIndex().build(gallery).search(queries, 10)
+    assert (flat_indices[:, 0] == truth).all()
+
+    _, indices = create_index("ivf", nprobe=8).build(gallery).search(queries, 10)
+    assert recall(indices[:, :1], flat_indices[:, :1]) >= 0.95
+    assert recall(indices, flat_indices) >= 0.8
+
+
+def test_hnsw_recall():
+    pytest.importorskip("hnswlib")
+    gallery, queries, _ = synthetic_gallery()
+    _, flat_indices = FlatIndex().build(gallery).search(queries, 10)
+    _, indices = create_index("hnsw").build(gallery).search(queries, 10)
+    assert recall(indices[:, :1], flat_indices[:, :1]) >= 0.95
+    assert recall(indices, flat_indices) >= 0.9
+
+
+@pytest.mark.parametrize("kind", ["flat", "ivf", "hnsw"])
+def test_save_load_round_trip(kind, tmp_path):
+    if kind == "hnsw":
+        pytest.importorskip("hnswlib")
+    gallery, queries, _ = synthetic_gallery(size=500)
+    index = create_index(kind).build(gallery)
+    index.fingerprint = gallery_fingerprint(gallery, kind, {})
+    path = str(tmp_path / f"{kind}_index")
+    index.save(path)
+
+    loaded = load_index(path)
+    assert type(loaded) is type(index) and len(loaded) == len(index)
+    assert loaded.fingerprint == index.fingerprint
+    for expected, result in zip(index.search(queries, 5), loaded.search(queries, 5)):
+        np.testing.assert_array_equal(expected, result)
+
+
+def load_gallery_index(encodings, path, **index_config):
+    """
+    FaceRecognition.load_gallery_index without the models
+    """
+    face_recognition = SimpleNamespace(known_encodings=encodings, normalized_encodings=True, data={},
+                                       configs={"recognition": {"index": dict(index_config, path=path)}})
+    return FaceRecognition.load_gallery_index(face_recognition)
+
+
+def test_saved_index_rebuilt_when_gallery_changes(tmp_path):
+    gallery, queries, truth = synthetic_gallery(size=500)
+    path = str(tmp_path / "gallery_index")
+    saved = load_gallery_index(gallery, path, type="ivf", nprobe=4)
+    saved_mtime = os.path.getmtime(f"{path}.npz")
+
+    # same gallery and config: the saved index is reused
+    assert load_gallery_index(gallery, path, type="ivf", nprobe=4).fingerprint == saved.fingerprint
+    assert os.path.getmtime(f"{path}.npz") == saved_mtime
+
+    # same size, reordered (re-enrolled) gallery: the ids must follow the new order
+    order = np.random.default_rng(1).permutation(len(gallery))
+    index = load_gallery_index(gallery[order], path, type="ivf", nprobe=4)
+    assert index.fingerprint != saved.fingerprint
+    _, indices = index.search(queries, 1)
+    assert (order[indices[:, 0]] == truth).mean() >= 0.95
+
+    # other index parameters or type
+    assert load_gallery_index(gallery[order], path, type="ivf", nprobe=8).fingerprint != index.fingerprint
+    assert isinstance(load_gallery_index(gallery[order], path, type="flat"), FlatIndex)
+
+
+if __name__ == "__main__":
+    test_ivf_recall()
+    try:
+        test_hnsw_recall()
+    except pytest.skip.Exception:
+        print("hnswlib not installed, HNSW skipped")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for kind in ["flat", "ivf"]:
+            test_save_load_round_trip(kind, Path(tmp_dir))
+        test_saved_index_rebuilt_when_gallery_changes(Path(tmp_dir))
+    print("Gallery indexes find the exact neighbours and are rebuilt when the gallery changes")
@@ -0,0 +1,56 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from recognition.face_recognition import FaceRecognition
+from recognition.matcher import GalleryMatcher
+
+MARGIN = 0.1
+S = 1.0
+
+
+def reference_similarity(embedding1, embedding2):
+    """
+    per-pair FaceRecognition.calculate_similarity the batched matcher replaces
+    """
+    return FaceRecognition.calculate_similarity(SimpleNamespace(margin=MARGIN, s=S), embedding1, embedding2)
+
+
+def test_margin_score_matches_calculate_similarity():
+    rng = np.random.default_rng(0)
+    gallery = rng.normal(size=(50, 512)).astype(np.float32) * rng.uniform(0.5, 20, size=(50, 1))
+    queries = np.concatenate([gallery[:5] + rng.normal(scale=0.3, size=(5, 512)), -gallery[5:7],
+                              rng.normal(size=(3, 512))]).astype(np.float32)
+    matcher = GalleryMatcher(gallery, MARGIN, S)
+
+    # every cosine, negative and above pi - margin included
+    cosine = np.linspace(-1, 1, 201)
+    expected = [reference_similarity(np.array([1.0, 0.0]), np.array([c, np.sqrt(1 - c * c)])) for c in cosine]
+    np.testing.assert_allclose(matcher.margin_score(cosine), expected, atol=1e-6)
+
+    # pairwise scores of the gallery
+    scores = matcher.margin_score(GalleryMatcher.normalize(queries) @ GalleryMatcher.normalize(gallery).T)
+    expected = [[reference_similarity(query, encoding) for encoding in gallery] for query in queries]
+    np.testing.assert_allclose(scores, expected, atol=1e-4)  # float32 gallery
+
+    # same best identity as the original loop over the gallery
+    top_scores, top_indices = matcher.search(queries, top_k=3)
+    for row_scores, row_indices, row_expected in zip(top_scores, top_indices, expected):
+        assert row_indices[0] == int(np.argmax(row_expected))
+        np.testing.assert_allclose(row_scores, np.sort(row_expected)[::-1][:3], atol=1e-4)
+
+
+def test_single_query_and_empty_gallery():
+    rng = np.random.default_rng(1)
+    gallery = rng.normal(size=(4, 8)).astype(np.float32)
+    scores, indices = GalleryMatcher(gallery, MARGIN, S).search(gallery[2], top_k=10)
+    assert scores.shape == indices.shape == (1, 4) and indices[0, 0] == 2
+
+    scores, indices = GalleryMatcher(np.empty((0, 8), np.float32), MARGIN, S).search(gallery, top_k=1)
+    assert scores.shape == indices.shape == (4, 0)
+
+
+if __name__ == "__main__":
+    test_margin_score_matches_calculate_similarity()
+    test_single_query_and_empty_gallery()
+    print("Batched gallery matcher matches calculate_similarity")
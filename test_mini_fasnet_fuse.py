@@ -0,0 +1,48 @@
+import copy
+
+import numpy as np
+import torch
+
+from spoofing_samples import load_samples
+from library.face_antspoofing import SpoofingDetector
+from library.models.mini_fasnet import MiniFASNetV1SE, MiniFASNetV2
+from library.util import remove_prefix
+
+MODEL_PATH = "data/pretrained/fasnet_v1se_v2.pth.tar"
+
+
+def load_models():
+    """unfused MiniFASNet models of the checkpoint"""
+    model_load = torch.load(MODEL_PATH, map_location="cpu", weights_only=True)
+    models = [MiniFASNetV1SE(conv6_kernel=(5, 5)), MiniFASNetV2(conv6_kernel=(5, 5))]
+    for model in models:
+        model.load_state_dict(remove_prefix(model_load[model.__class__.__name__], 'module.'), strict=False)
+        model.eval()
+    return models
+
+
+def test_fuse_drift(atol=1e-3):
+    detector = SpoofingDetector(MODEL_PATH, device="cpu")
+    samples = load_samples()
+
+    for model, scale in zip(load_models(), detector.model.max_scale):
+        fused = copy.deepcopy(model).fuse_for_inference()
+        assert not any(isinstance(m, (torch.nn.BatchNorm1d, torch.nn.BatchNorm2d, torch.nn.Dropout))
+                       for m in fused.modules())
+
+        images = torch.cat([detector.preprocess([box], image)[detector.model.max_scale.index(scale)]
+                            for image, box, _ in samples])
+        with torch.no_grad():
+            expected = model(images)
+            result = fused(images)
+
+        max_diff = (expected - result).abs().max().item()
+        print(f"{model.__class__.__name__}: {len(images)} crops, max logit diff: {max_diff:.2e}")
+        assert max_diff < atol
+        assert torch.equal(expected.argmax(dim=1), result.argmax(dim=1))
+        np.testing.assert_allclose(torch.softmax(expected, 1).numpy(), torch.softmax(result, 1).numpy(), atol=1e-5)
+
+
+if __name__ == "__main__":
+    test_fuse_drift()
+    print("Fused models match the unfused models")
@@ -0,0 +1,156 @@
+import numpy as np
+from insightface.app.common import Face
+
+from recognition.face_recognition import FaceRecognition
+from recognition.matcher import GalleryMatcher
+
+TARGET = ((0, 0), (1000, 1000))
+GALLERY = np.eye(4, 8, dtype=np.float32)
+NAMES = ["Kien", "Lan", "Minh", "Hoa"]
+USER_IDS = ["1", "2", "3", "4"]
+
+
+class StubDrawer:
+    """
+    DrawingTool recording the labels it is asked to draw
+    """
+
+    def __init__(self):
+        self.texts = []
+        self.rectangles = []
+
+    def draw_rectangle(self, frame, bbox, color):
+        self.rectangles.append(tuple(bbox))
+
+    def put_text(self, frame, text, position, color):
+        self.texts.append(text)
+
+
+class StubSpoofing:
+    """
+    anti-spoofing detector answering from the left edge of each box, counting the predicts
+    """
+
+    def __init__(self, labels):
+        self.labels = labels
+        self.calls = []
+
+    def __call__(self, bboxes, frame):
+        self.calls.append(len(bboxes))
+        return [(self.labels[int(bbox[0])], 0.9) for bbox in bboxes]
+
+
+def face_recognition(labels, real_threshold=1, spoof_threshold=1):
+    """
+    FaceRecognition without the models: stub anti-spoofing, gallery of 4 orthogonal identities
+    """
+    recognition = FaceRecognition.__new__(FaceRecognition)
+    recognition.configs = {"recognition": {"similarity_threshold": 16, "margin": 0.3, "s": 64,
+                                           "real_threshold": real_threshold, "spoof_threshold": spoof_threshold,
+                                           "num_true": 0, "num_false": 0, "unknown_time_threshold": 20,
+                                           "spoof_time_threshold": 15, "multi_face": True},
+                           "tracking": {}}
+    recognition.services = None
+    recognition.show_landmarks = False
+    recognition.load_face_recognition_parameters()
+    recognition.user_ids, recognition.known_names = USER_IDS, NAMES
+    recognition.matcher = GalleryMatcher(GALLERY, recognition.margin, recognition.s)
+    recognition.spoofing_detector = StubSpoofing(labels)
+    return recognition
+
+
+def make_face(x, embedding):
+    """
+    detected face at column x, embedding already computed like FaceAnalysis does
+    """
+    return Face(bbox=np.array([x, 100, x + 80, 200], dtype=np.float32), embedding=np.asarray(embedding))
+
+
+def test_no_face():
+    recognition = face_recognition({})
+    drawer = StubDrawer()
+    frame = np.zeros((10, 10, 3), dtype=np.uint8)
+
+    assert recognition.process_frame_multi(frame, [], *TARGET, drawer) == (frame, [])
+    assert drawer.texts == ["No Face Detected"]
+    assert recognition.spoofing_detector.calls == []
+    assert recognition.summarize_results([]) == ([], "waiting")
+
+    # faces outside the target are dropped before the spoof check
+    drawer = StubDrawer()
+    outside = [make_face(950, GALLERY[0])]
+    assert recognition.process_frame_multi(frame, outside, *TARGET, drawer) == (frame, [])
+    assert drawer.texts == ["Face Outside"]
+    assert recognition.spoofing_detector.calls == []
+
+
+def test_one_face():
+    recognition = face_recognition({10: True})
+    drawer = StubDrawer()
+    frame = np.zeros((10, 10, 3), dtype=np.uint8)
+
+    _, results = recognition.process_frame_multi(frame, [make_face(10, GALLERY[1] * 3)], *TARGET, drawer)
+    assert len(results) == 1
+    bbox, user_id, status = results[0]
+    assert list(bbox) == [10, 100, 90, 200] and user_id == "2" and status == "image"
+    assert recognition.spoofing_detector.calls == [1]
+    assert recognition.summarize_results(results) == (bbox, "image")
+
+
+def test_several_faces_mixed():
+    labels = {10: True, 200: False, 400: True, 600: True}
+    recognition = face_recognition(labels)
+    drawer = StubDrawer()
+    frame = np.zeros((10, 10, 3), dtype=np.uint8)
+    unknown = np.array([0, 0, 0, 0, 1, 1, 1, 1], dtype=np.float32)  # orthogonal to the gallery
+    faces = [make_face(10, GALLERY[0]), make_face(200, GALLERY[1]), make_face(400, unknown),
+             make_face(600, GALLERY[3])]
+
+    _, results = recognition.process_frame_multi(frame, faces, *TARGET, drawer)
+    # one spoof predict over every box, results in the order of the faces
+    assert recognition.spoofing_detector.calls == [4]
+    assert [(int(bbox[0]), user_id, status) for bbox, user_id, status in results] == [
+        (10, "1", "image"), (200, None, "spoof"), (400, None, "unknown"), (600, "4", "image")]
+    assert "Spoof" in drawer.texts and any(text.startswith("Unknown") for text in drawer.texts)
+
+    # the spoof drives the label, then the unknown face, then the recognized ones
+    assert recognition.summarize_results(results) == (results[1][0], "spoof")
+    assert recognition.summarize_results([results[0], results[2], results[3]]) == (results[2][0], "unknown")
+    assert recognition.summarize_results([results[3], results[0]]) == (results[3][0], "image")
+
+
+def test_faces_wait_for_real_threshold():
+    recognition = face_recognition({10: True, 200: False}, real_threshold=2, spoof_threshold=2)
+    drawer = StubDrawer()
+    frame = np.zeros((10, 10, 3), dtype=np.uint8)
+    faces = [make_face(10, GALLERY[0]), make_face(200, GALLERY[1])]
+
+    # first frame: counted, not decided yet
+    _, results = recognition.process_frame_multi(frame, faces, *TARGET, drawer)
+    assert [(user_id, status) for _, user_id, status in results] == [(None, ""), (None, "")]
+    assert recognition.summarize_results(results)[1] == ""
+
+    # second frame: the tracks reach their thresholds
+    _, results = recognition.process_frame_multi(frame, faces, *TARGET, drawer)
+    assert [(user_id, status) for _, user_id, status in results] == [("1", "image"), (None, "spoof")]
+    assert recognition.spoofing_detector.calls == [2, 2]
+
+
+def test_check_spoofing_batch():
+    recognition = face_recognition({10: True, 200: False})
+    frame = np.zeros((10, 10, 3), dtype=np.uint8)
+
+    assert recognition.check_spoofing_batch([], frame) == []
+    assert recognition.spoofing_detector.calls == []
+    bboxes = [np.array([200, 0, 280, 80]), np.array([10, 0, 90, 80])]
+    assert recognition.check_spoofing_batch(bboxes, frame) == [(False, 0.9), (True, 0.9)]
+    assert recognition.spoofing_detector.calls == [2]
+
+
+if __name__ == "__main__":
+    test_no_face()
+    test_one_face()
+    test_several_faces_mixed()
+    test_faces_wait_for_real_threshold()
+    test_check_spoofing_batch()
+    print("Multi-face frames: one spoof predict and one gallery match, results summarized spoof > unknown > image")
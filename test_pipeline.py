@@ -0,0 +1,107 @@
+import itertools
+import threading
+import time
+from queue import Empty
+
+from utils.pipeline import DropOldestQueue, Pipeline, QueueClosed
+
+
+def test_drop_oldest_queue():
+    queue = DropOldestQueue(maxsize=2)
+    for item in range(5):
+        queue.put(item)
+    assert len(queue) == 2 and queue.dropped == 3
+    assert [queue.get(), queue.get()] == [3, 4]
+    try:
+        queue.get(timeout=0.01)
+        assert False, "get of an empty queue must time out"
+    except Empty:
+        pass
+    queue.put(5)
+    queue.close()
+    assert queue.get() == 5
+    try:
+        queue.get()
+        assert False, "get of a closed, drained queue must raise"
+    except QueueClosed:
+        pass
+
+
+def test_pipeline_bounded_by_slowest_stage():
+    frames = iter(range(200))
+    published = []
+
+    def capture():
+        time.sleep(0.002)
+        return next(frames, None)
+
+    def slow(item):
+        time.sleep(0.02)
+        return item
+
+    pipeline = (Pipeline(queue_size=2)
+                .add("capture", capture)
+                .add("slow", slow)
+                .add("double", lambda item: item * 2)
+                .add("publish", published.append))
+    pipeline.run()
+
+    # the end of the stream reaches every stage, the slow stage skipped frames instead of queueing them
+    assert not pipeline.is_alive()
+    stats = pipeline.stats()
+    assert stats["capture"]["processed"] == 200 and stats["slow"]["dropped"] > 0
+    assert stats["slow"]["processed"] + stats["slow"]["dropped"] == 200
+    assert len(published) == stats["slow"]["processed"]
+    assert published == sorted(published) and published[-1] == 398
+    assert stats["slow"]["latency_ms"] >= 20  # the sleep is a lower bound whatever the machine load
+
+
+def test_pipeline_stop_and_errors():
+    stop_event = threading.Event()
+    seen = []
+    counter = itertools.count()
+
+    def flaky(item):
+        if item % 2:
+            raise ValueError("bad frame")
+        return item
+
+    pipeline = (Pipeline(queue_size=4, stop_event=stop_event)
+                .add("capture", lambda: time.sleep(0.005) or next(counter))
+                .add("flaky", flaky)
+                .add("publish", seen.append)).start()
+    time.sleep(0.2)
+    stop_event.set()
+    for stage in pipeline.stages:
+        stage.join(1)
+    # a failing item is skipped, the stage keeps running until stopped
+    assert not pipeline.is_alive() and seen and all(item % 2 == 0 for item in seen)
+    assert pipeline.stats()["flaky"]["errors"] > 0
+
+
+def test_failing_source_backs_off_and_ends(capsys):
+    calls = []
+
+    def broken_camera():
+        calls.append(time.monotonic())
+        raise OSError("camera unplugged")
+
+    pipeline = Pipeline().add("capture", broken_camera).add("publish", lambda item: None)
+    pipeline.stages[0].max_source_errors = 5
+    pipeline.run()
+
+    # gives up after max_source_errors failures in a row, waiting longer before each retry
+    assert not pipeline.is_alive() and len(calls) == 5
+    gaps = [b - a for a, b in zip(calls, calls[1:])]
+    assert all(gap >= 0.01 * 2 ** idx for idx, gap in enumerate(gaps))
+    assert pipeline.stats()["capture"]["errors"] == 5
+
+    # one error printed, the next ones fall in the rate limit interval
+    assert capsys.readouterr().out.count("camera unplugged") == 1
+
+
+if __name__ == "__main__":
+    test_drop_oldest_queue()
+    test_pipeline_bounded_by_slowest_stage()
+    test_pipeline_stop_and_errors()
+    print("Pipeline stages drop the oldest frames, report their throughput and stop")
@@ -0,0 +1,87 @@
+import threading
+
+import numpy as np
+
+from spoofing_samples import make_batch
+from library.task_manager import stop_worker
+from recognition.shared_inference import EmbeddingWorker, FaceEmbedder, SharedInference
+from test_face_detection import sample_frames
+from utils.config import load_config
+from utils.registry import get_face_detector, get_spoofing_detector
+
+
+class MeanColorModel:
+    """stand-in of the arcface model: mean color of the aligned crop"""
+    input_size = (112, 112)
+
+    def get_feat(self, imgs):
+        assert all(img.shape == (112, 112, 3) for img in imgs)
+        return np.stack([img.reshape(-1, 3).mean(axis=0) for img in imgs])
+
+
+def test_embedding_batch():
+    frames = sample_frames()[:3]
+    kpss = [get_face_detector(retinaface_configs()).detect(frame)[1] for frame in frames]
+    embedder = FaceEmbedder(MeanColorModel())
+    expected = [embedder(frame, kps) for frame, kps in zip(frames, kpss)]
+
+    worker = EmbeddingWorker(model=MeanColorModel(), max_batch_size=3, max_wait_ms=100)
+    worker.start()
+    messages = [worker.request(frame, kps) for frame, kps in zip(frames, kpss)]
+    results = [msg.respond_data for msg in messages]
+    stop_worker(worker)
+
+    assert [len(result) for result in results] == [len(kps) for kps in kpss]
+    for result, reference in zip(results, expected):
+        assert np.allclose(result, reference)
+
+
+def retinaface_configs():
+    configs = load_config()
+    configs["models"] = dict(configs["models"], face_detector="retinaface")
+    return configs
+
+
+def test_cameras_share_batched_models():
+    configs = retinaface_configs()
+    frames = sample_frames()[:4]
+    boxes = [make_batch(frame, 2, seed=idx) for idx, frame in enumerate(frames)]
+    expected_faces = [get_face_detector(configs).detect(frame) for frame in frames]
+    expected_spoof = [get_spoofing_detector(configs).predict(frame_boxes, frame)
+                      for frame_boxes, frame in zip(boxes, frames)]
+
+    services = SharedInference(configs, max_batch_size=4, max_wait_ms=100)
+    services.embedding.close()
+    services.embedding = EmbeddingWorker(model=MeanColorModel())
+    batch_sizes = []
+    for worker in (services.detector, services.spoofing):
+        worker.process_batch = lambda processor, calls, batch=worker.process_batch: (
+            batch_sizes.append(len(calls)) or batch(processor, calls))
+    services.start()
+
+    # one thread per camera, like the capture stages of main.py
+    results = [None] * len(frames)
+    barrier = threading.Barrier(len(frames))
+
+    def camera(idx):
+        barrier.wait()
+        results[idx] = (services.detector.call(frames[idx]), services.spoofing.call(boxes[idx], frames[idx]))
+
+    threads = [threading.Thread(target=camera, args=(idx,)) for idx in range(len(frames))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    services.stop()
+
+    assert batch_sizes and max(batch_sizes) > 1
+    for (faces, spoof), (bboxes, _), reference in zip(results, expected_faces, expected_spoof):
+        assert np.allclose(faces[0], bboxes, atol=1e-2)
+        assert [label for label, _ in spoof] == [label for label, _ in reference]
+        assert np.allclose([score for _, score in spoof], [score for _, score in reference], atol=1e-5)
+
+
+if __name__ == "__main__":
+    test_embedding_batch()
+    test_cameras_share_batched_models()
+    print("Cameras share batched detection, anti-spoofing and embedding workers")
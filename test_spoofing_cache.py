@@ -0,0 +1,68 @@
+import glob
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pytest
+import torch
+
+import library.face_antspoofing.cache as spoofing_cache
+from spoofing_samples import make_batch, read_frame
+from library.face_antspoofing import SpoofingDetector, cache_key
+from library.util.image import IM_BGR
+
+MODEL_PATH = "data/pretrained/fasnet_v1se_v2.pth.tar"
+
+
+def test_cache_matches_eager():
+    frame = read_frame("face_data/kien.mp4")
+    boxes = make_batch(frame, 4)
+    expected = SpoofingDetector(MODEL_PATH, device="cpu", pixel_format=IM_BGR).predict_scores(boxes, frame)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cold = SpoofingDetector(MODEL_PATH, device="cpu", pixel_format=IM_BGR, cache_dir=cache_dir)
+        files = sorted(glob.glob(os.path.join(cache_dir, "*.pt")))
+        assert len(files) == 2 and all(cache_key(MODEL_PATH, "cpu", (80, 80)) in path for path in files)
+
+        warm = SpoofingDetector(MODEL_PATH, device="cpu", pixel_format=IM_BGR, cache_dir=cache_dir)
+        assert all(isinstance(model, torch.jit.ScriptModule) for model in warm.model.models)
+        for detector in (cold, warm):
+            assert np.allclose(detector.predict_scores(boxes, frame), expected, atol=1e-5)
+
+
+def test_cache_rebuilds_invalid_artifacts():
+    with tempfile.TemporaryDirectory() as cache_dir:
+        SpoofingDetector(MODEL_PATH, device="cpu", cache_dir=cache_dir)
+        files = sorted(glob.glob(os.path.join(cache_dir, "*.pt")))
+
+        # corrupt artifact of the current key, and one left by another torch version
+        with open(files[0], "wb") as f:
+            f.write(b"not a torchscript file")
+        stale_path = files[1].replace(cache_key(MODEL_PATH, "cpu", (80, 80)), "0123456789abcdef")
+        os.rename(files[1], stale_path)
+
+        detector = SpoofingDetector(MODEL_PATH, device="cpu", cache_dir=cache_dir)
+        assert sorted(glob.glob(os.path.join(cache_dir, "*.pt"))) == files
+        assert all(isinstance(model, torch.jit.ScriptModule) for model in detector.model.models)
+
+
+def test_cache_key_follows_model_code(tmp_path, monkeypatch):
+    key = cache_key(MODEL_PATH, "cpu", (80, 80))
+    monkeypatch.setattr(spoofing_cache, "CACHE_VERSION", spoofing_cache.CACHE_VERSION + 1)
+    assert cache_key(MODEL_PATH, "cpu", (80, 80)) != key
+    monkeypatch.undo()
+
+    # edited model source
+    source = tmp_path / "mini_fasnet.py"
+    source.write_text(open(spoofing_cache.mini_fasnet.__file__).read() + "\n# edited\n")
+    monkeypatch.setattr(spoofing_cache.mini_fasnet, "__file__", str(source))
+    assert cache_key(MODEL_PATH, "cpu", (80, 80)) != key
+
+
+if __name__ == "__main__":
+    test_cache_matches_eager()
+    test_cache_rebuilds_invalid_artifacts()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        test_cache_key_follows_model_code(Path(tmp_dir), pytest.MonkeyPatch())
+    print("Compiled model cache matches the eager models and rebuilds invalid artifacts")
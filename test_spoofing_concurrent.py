@@ -0,0 +1,25 @@
+import numpy as np
+
+from spoofing_samples import make_batch, read_frame
+from library.face_antspoofing import SpoofingDetector
+from library.util.image import IM_BGR
+
+MODEL_PATH = "data/pretrained/fasnet_v1se_v2.pth.tar"
+
+
+def test_concurrent_matches_sequential():
+    sequential = SpoofingDetector(MODEL_PATH, device="cpu", pixel_format=IM_BGR)
+    concurrent = SpoofingDetector(MODEL_PATH, device="cpu", pixel_format=IM_BGR, concurrent=True)
+    frame = read_frame("face_data/kien.mp4")
+
+    for num_faces in [1, 4, 16]:
+        boxes = make_batch(frame, num_faces, seed=num_faces)
+        expected = sequential.predict_scores(boxes, frame)
+        scores = concurrent.predict_scores(boxes, frame)
+        assert scores.dtype == np.float32
+        assert np.array_equal(scores, expected)
+
+
+if __name__ == "__main__":
+    test_concurrent_matches_sequential()
+    print("Concurrent MulFasNet matches the sequential forward")
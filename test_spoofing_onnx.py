@@ -0,0 +1,52 @@
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from spoofing_samples import load_samples
+from library.face_antspoofing import SpoofingDetector, OnnxSpoofingDetector, export_onnx
+
+MODEL_PATH = "data/pretrained/fasnet_v1se_v2.pth.tar"
+
+
+def score_vectors(detector, samples):
+    """
+    raw [2D_SPOOF | REAL | 3D_SPOOF] scores of the ensemble, one row per sample
+    """
+    return np.concatenate([np.asarray(detector.predict_scores([box], image), dtype=np.float64)
+                           for image, box, _ in samples])
+
+
+def test_onnx_parity(tmp_path, atol=1e-4):
+    onnx_path = export_onnx(MODEL_PATH, str(tmp_path / "fasnet_v1se_v2.onnx"))
+    samples = load_samples()
+
+    torch_scores = score_vectors(SpoofingDetector(MODEL_PATH, device="cpu"), samples)
+    onnx_scores = score_vectors(OnnxSpoofingDetector(onnx_path), samples)
+
+    max_diff = np.abs(torch_scores - onnx_scores).max()
+    print(f"samples: {len(samples)}, max score diff: {max_diff:.2e}")
+    assert max_diff < atol
+    assert (torch_scores.argmax(axis=1) == onnx_scores.argmax(axis=1)).all()
+
+
+def test_onnx_backend_without_torch(tmp_path):
+    onnx_path = export_onnx(MODEL_PATH, str(tmp_path / "fasnet_v1se_v2.onnx"))
+    # fresh interpreter: build and run the onnx detector, torch must stay unloaded
+    script = ("import sys, numpy as np\n"
+              "from library.face_antspoofing import OnnxSpoofingDetector\n"
+              f"detector = OnnxSpoofingDetector({onnx_path!r})\n"
+              "print(detector.predict([[10, 10, 90, 110]], np.zeros((120, 100, 3), np.uint8)))\n"
+              "assert 'torch' not in sys.modules, 'torch imported'\n")
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True,
+                            cwd=str(Path(__file__).parent))
+    assert result.returncode == 0, result.stderr
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        test_onnx_parity(Path(tmp_dir))
+        test_onnx_backend_without_torch(Path(tmp_dir))
+    print("ONNX backend matches torch backend")
@@ -0,0 +1,74 @@
+import cv2
+import numpy as np
+import torch
+
+from spoofing_samples import load_samples, make_batch
+from library.face_antspoofing import SpoofingDetector
+from library.util import scale_box
+from library.util.image import IM_BGR
+from library.util.transform import Transform, resize
+from utils.registry import get_spoofing_detector
+
+MODEL_PATH = "data/pretrained/fasnet_v1se_v2.pth.tar"
+
+
+def reference_preprocess(detector, boxes, image):
+    """
+    per-crop Transform chain the buffered preprocess replaces
+    """
+    transform = Transform([
+        lambda x: cv2.cvtColor(x, cv2.COLOR_RGB2BGR),
+        resize(*detector.face_size),
+        lambda x: torch.from_numpy(x.transpose((2, 0, 1))).float()
+    ])
+    faces_scale = []
+    for scale in detector.model.max_scale:
+        face_tensor = torch.zeros(len(boxes), 3, *detector.face_size, dtype=torch.float32)
+        for idx, box in enumerate(boxes):
+            height, width = image.shape[:2]
+            x1, y1, x2, y2 = scale_box(width, height, box, scale)
+            face_tensor[idx] = transform(image[y1:y2, x1:x2])
+        faces_scale.append(face_tensor)
+    return faces_scale
+
+
+def test_preprocess_matches_reference():
+    detector = SpoofingDetector(MODEL_PATH, device="cpu", max_faces=4)
+    image, _, _ = load_samples()[0]
+    frame = cv2.resize(image, (640, 480))
+
+    # growing past max_faces and shrinking back reuses the buffers
+    for num_faces in [1, 4, 9, 2]:
+        boxes = make_batch(frame, num_faces, seed=num_faces)
+        for faces, expected in zip(detector.preprocess(boxes, frame), reference_preprocess(detector, boxes, frame)):
+            assert torch.equal(faces, expected)
+
+
+def test_bgr_input():
+    rgb_detector = SpoofingDetector(MODEL_PATH, device="cpu")
+    bgr_detector = SpoofingDetector(MODEL_PATH, device="cpu", pixel_format=IM_BGR)
+    image, box, _ = load_samples()[0]
+
+    rgb_scores = rgb_detector.predict_scores([box], cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+    bgr_scores = bgr_detector.predict_scores([box], image)
+    assert np.array_equal(rgb_scores, bgr_scores)
+
+
+def test_registry_keeps_channel_order():
+    image, box, _ = load_samples()[0]
+    configs = {"models": {"antispoofing_model": MODEL_PATH}}
+
+    # OpenCV frames reach the models channel-swapped, as through the original Transform chain
+    detector = get_spoofing_detector(configs)
+    for faces, expected in zip(detector.preprocess([box], image), reference_preprocess(detector, [box], image)):
+        assert torch.equal(faces, expected)
+
+    configs["models"]["antispoofing_swap_channels"] = False
+    assert get_spoofing_detector(configs).pixel_format == IM_BGR
+
+
+if __name__ == "__main__":
+    test_preprocess_matches_reference()
+    test_bgr_input()
+    test_registry_keeps_channel_order()
+    print("Buffered preprocessing matches the Transform chain")
@@ -0,0 +1,56 @@
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from spoofing_samples import evaluate, split_crops
+from library.face_antspoofing import (SpoofingDetector, OnnxSpoofingDetector, export_onnx, calibration_crops,
+                                      quantize_dynamic_models, quantize_onnx)
+from utils.registry import get_spoofing_detector
+
+MODEL_PATH = "data/pretrained/fasnet_v1se_v2.pth.tar"
+
+
+def test_dynamic_quantization(atol=0.05):
+    _, held_out = split_crops(calibration_crops())
+    float_scores, float_real = evaluate(SpoofingDetector(MODEL_PATH, device="cpu"), held_out)
+    detector = SpoofingDetector(MODEL_PATH, device="cpu")
+    quantize_dynamic_models(detector.model)
+    scores, real = evaluate(detector, held_out)
+
+    print(f"dynamic: max score diff {np.abs(scores - float_scores).max():.4f}")
+    assert np.abs(scores - float_scores).max() < atol
+    assert (real == float_real).all()
+
+
+def test_static_quantization(tmp_path, min_agreement=0.9):
+    onnx_path = export_onnx(MODEL_PATH, str(tmp_path / "fasnet_v1se_v2.onnx"))
+    calibration, held_out = split_crops(calibration_crops())
+    quantized_path = quantize_onnx(onnx_path, str(tmp_path / "fasnet_v1se_v2.int8.onnx"),
+                                   OnnxSpoofingDetector(onnx_path), calibration)
+    _, real = evaluate(OnnxSpoofingDetector(quantized_path), held_out)
+    _, float_real = evaluate(OnnxSpoofingDetector(onnx_path), held_out)
+
+    agreement = (real == float_real).mean()
+    print(f"static: label agreement with float {agreement:.3f} on {len(held_out)} held-out crops")
+    assert agreement >= min_agreement
+
+
+def test_static_quantization_is_not_built_at_startup(tmp_path):
+    quantized_path = str(tmp_path / "fasnet_v1se_v2.int8.onnx")
+    configs = {"models": {"antispoofing_model": MODEL_PATH, "antispoofing_backend": "onnx",
+                          "antispoofing_quantization": "static", "antispoofing_onnx": str(tmp_path / "float.onnx"),
+                          "antispoofing_quantized_onnx": quantized_path}}
+    with pytest.raises(FileNotFoundError, match="library.face_antspoofing.quantization"):
+        get_spoofing_detector(configs)
+    assert list(tmp_path.iterdir()) == []
+
+
+if __name__ == "__main__":
+    test_dynamic_quantization()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        test_static_quantization(Path(tmp_dir))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        test_static_quantization_is_not_built_at_startup(Path(tmp_dir))
+    print("Quantized spoofing detectors agree with the float model")
@@ -0,0 +1,266 @@
+import asyncio
+import os
+import time
+
+import numpy as np
+
+from spoofing_samples import make_batch, read_frame
+from library.face_antspoofing import SpoofingDetector
+from library.shared_frames import FrameRef
+from library.task_manager import ProcessWorker, SpoofingDetectorWorker, Worker, WorkerPool, stop_worker
+
+MODEL_PATH = "data/pretrained/fasnet_v1se_v2.pth.tar"
+
+
+def frame_stats(frame, scale=1):
+    return frame.shape, int(frame.sum()) * scale
+
+
+class FrameStatsWorker(Worker):
+    def processor(self):
+        return frame_stats
+
+
+class FailingStatsWorker(Worker):
+    """frame stats, raises for frames whose first pixel is 255"""
+    batch_sizes = []
+
+    def processor(self):
+        def stats(frame, scale=1):
+            if frame.flat[0] == 255:
+                raise ValueError("overexposed frame")
+            return frame_stats(frame, scale)
+        return stats
+
+    def process_batch(self, processor, calls):
+        self.batch_sizes.append(len(calls))
+        return super().process_batch(processor, calls)
+
+
+class FailingStatsProcessWorker(ProcessWorker):
+    def processor(self):
+        def stats(frame):
+            if frame.flat[0] == 255:
+                raise ValueError("overexposed frame")
+            return frame_stats(frame) + (os.getpid(),)
+        return stats
+
+
+class FrameIdentityWorker(Worker):
+    def processor(self):
+        return id
+
+
+class FrameStatsProcessWorker(ProcessWorker):
+    def processor(self):
+        def stats(frame, scale=1, delay=0.0):
+            time.sleep(delay)
+            return frame_stats(frame, scale) + (os.getpid(),)
+        return stats
+
+
+def test_shared_frames():
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 255, (480, 640, 3), dtype=np.uint8) for _ in range(6)]
+    worker = FrameStatsProcessWorker(frame_slots=2, frame_bytes=frames[0].nbytes)
+    worker.start()
+
+    # more requests in flight than slots: the extra frames are pickled
+    messages = [worker.request(frame, scale=2) for frame in frames]
+    big_frame = np.ones((481, 640, 3), dtype=np.uint8)
+    messages.append(worker.request(frame=big_frame))
+
+    for msg, frame in zip(messages, frames + [big_frame]):
+        scale = msg.request_data[1].get("scale", 1)
+        assert msg.respond_data[:2] == (frame.shape, int(frame.sum()) * scale)
+        assert msg.respond_data[:2] == (frame.shape, int(frame.sum()) * scale)  # fetched once
+    assert worker.frames.in_use() == 0
+
+    # only images take a slot, small arrays like landmarks are pickled with the request
+    kpss = np.zeros((2, 5, 2), dtype=np.float32)
+    (ref, packed_kpss), _ = worker._pack_frames((frames[0], kpss), {})
+    assert isinstance(ref, FrameRef) and packed_kpss is kpss
+    worker.frames.release(ref)
+
+    stop_worker(worker)
+    assert worker.frames is None
+
+
+def test_thread_worker_without_copy():
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    worker = FrameIdentityWorker(frame_slots=2, frame_bytes=frame.nbytes)
+    worker.start()
+
+    # same process: the processor gets the caller's array, no frame ring
+    assert worker.frames is None
+    assert worker.call(frame) == id(frame)
+    assert asyncio.run(worker.submit(frame)) == id(frame)
+    stop_worker(worker)
+
+
+def test_process_pool():
+    frame = np.random.default_rng(0).integers(0, 255, (480, 640, 3), dtype=np.uint8)
+    pool = WorkerPool(lambda: FrameStatsProcessWorker(frame_slots=2, frame_bytes=frame.nbytes),
+                      replicas=2, dispatch="round_robin", health_interval=None).start()
+
+    results = [pool.request(frame, scale=3).respond_data for _ in range(4)]
+    assert all(result[:2] == (frame.shape, int(frame.sum()) * 3) for result in results)
+    pids = {result[2] for result in results}
+    assert len(pids) == 2 and os.getpid() not in pids
+
+    # a request in flight on a killed replica fails instead of hanging, the pool restarts the replica
+    msg = pool.replicas[0].request(frame, delay=5)
+    pool.replicas[0].kill()
+    try:
+        msg.respond_data
+        assert False, "respond_data of a dead replica must raise"
+    except EOFError:
+        pass
+    pool.replicas[0].join()
+    assert pool.check_health() == 1
+    assert {pool.request(frame).respond_data[2] for _ in range(4)}.isdisjoint(pids - {pool.replicas[1].pid})
+
+    # least loaded dispatch avoids the busy replica
+    pool.dispatch = "least_loaded"
+    busy = pool.request(frame, delay=1)
+    assert sorted(replica.pending.value for replica in pool.replicas) == [0, 1]
+    assert pool._select().pending.value == 0
+    busy.respond_data
+
+    stop_worker(pool)
+    assert not pool.is_alive()
+    assert all(replica.frames is None for replica in pool.replicas)
+
+
+def test_idle_pool_restarts_replicas():
+    pool = WorkerPool(FrameStatsProcessWorker, replicas=2, health_interval=0.1).start()
+    frame = np.zeros((4, 4, 3), dtype=np.uint8)
+    killed = pool.replicas[0]
+    killed.kill()
+    killed.join()
+
+    # no request routed: the monitor thread replaces the replica on its own
+    deadline = time.monotonic() + 10
+    while pool.replicas[0] is killed and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert pool.replicas[0] is not killed
+    assert pool.replicas[0].call(frame)[2] == pool.replicas[0].pid
+
+    stop_worker(pool)
+    pool._monitor.join(1)
+    assert not pool.is_alive() and not pool._monitor.is_alive()
+
+
+def test_async_submit():
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 255, (480, 640, 3), dtype=np.uint8) for _ in range(4)]
+    worker = FrameStatsWorker(frame_slots=4, frame_bytes=frames[0].nbytes)
+    worker.start()
+    pool = WorkerPool(lambda: FrameStatsProcessWorker(frame_slots=4, frame_bytes=frames[0].nbytes),
+                      replicas=2).start()
+
+    async def main():
+        # one event loop drives the thread worker and both replicas at once
+        start = time.perf_counter()
+        results = await asyncio.gather(*(worker.submit(frame, scale=2) for frame in frames),
+                                       *(pool.submit(frame, delay=0.5) for frame in frames))
+        elapsed = time.perf_counter() - start
+
+        # a coroutine waiting on a killed replica fails instead of hanging
+        task = asyncio.ensure_future(pool.replicas[0].submit(frames[0], delay=5))
+        await asyncio.sleep(0.5)
+        pool.replicas[0].kill()
+        try:
+            await task
+            assert False, "submit to a dead replica must raise"
+        except EOFError:
+            pass
+        return results, elapsed
+
+    results, elapsed = asyncio.run(main())
+    stop_worker(worker, pool)
+
+    assert results[:4] == [(frame.shape, int(frame.sum()) * 2) for frame in frames]
+    assert [result[:2] for result in results[4:]] == [(frame.shape, int(frame.sum())) for frame in frames]
+    assert elapsed < 1.9  # 4 x 0.5 s spread on 2 replicas
+
+
+def test_processor_error_returned_to_its_caller():
+    frames = [np.full((4, 4, 3), value, dtype=np.uint8) for value in [1, 255, 2, 3]]
+    worker = FailingStatsWorker(frame_slots=4, frame_bytes=frames[0].nbytes, max_batch_size=4, max_wait_ms=200)
+    worker.start()
+
+    # one request of the batch raises: its caller gets the error, the others their result
+    messages = [worker.request(frame, scale=2) for frame in frames]
+    for idx, msg in enumerate(messages):
+        if idx == 1:
+            try:
+                msg.respond_data
+                assert False, "the error of the processor must be raised for its request"
+            except ValueError as e:
+                assert str(e) == "overexposed frame" and "stats" in str(e.__cause__)
+        else:
+            assert msg.respond_data == frame_stats(frames[idx], 2)
+    assert max(worker.batch_sizes) > 1
+
+    # the worker survived, nothing of the batch left in flight
+    assert worker.is_alive() and worker.pending.value == 0
+    assert [worker.call(frame) for frame in frames[2:]] == [frame_stats(frame) for frame in frames[2:]]
+
+    async def main():
+        try:
+            await worker.submit(frames[1])
+            assert False, "submit must raise the error of the processor"
+        except ValueError:
+            pass
+        return await worker.submit(frames[0])
+    assert asyncio.run(main()) == frame_stats(frames[0])
+
+    # process worker: same respond, the process is not restarted
+    process_worker = FailingStatsProcessWorker(frame_slots=2, frame_bytes=frames[0].nbytes)
+    process_worker.start()
+    try:
+        process_worker.call(frames[1])
+        assert False, "the error of the processor must be raised for its request"
+    except ValueError:
+        pass
+    assert process_worker.call(frames[0])[:2] == frame_stats(frames[0])
+    assert process_worker.is_alive()
+    stop_worker(worker, process_worker)
+
+
+class BatchRecordingWorker(SpoofingDetectorWorker):
+    batch_sizes = []
+
+    def process_batch(self, processor, calls):
+        self.batch_sizes.append(len(calls))
+        return super().process_batch(processor, calls)
+
+
+def test_micro_batching():
+    frame = read_frame("face_data/kien.mp4")
+    requests = [(make_batch(frame, num_faces, seed=num_faces), frame) for num_faces in [1, 3, 0, 2, 4, 1]]
+    expected = [SpoofingDetector(MODEL_PATH, device="cpu").predict(boxes, image) for boxes, image in requests]
+
+    worker = BatchRecordingWorker(MODEL_PATH, device="cpu", frame_slots=8, max_batch_size=4, max_wait_ms=200)
+    worker.start()
+    worker.request(*requests[0]).respond_data  # model loaded
+    messages = [worker.request(boxes, image=image) for boxes, image in requests]
+    results = [msg.respond_data for msg in messages]
+    stop_worker(worker)
+
+    assert max(worker.batch_sizes) > 1 and all(size <= 4 for size in worker.batch_sizes)
+    for result, reference in zip(results, expected):
+        assert [label for label, _ in result] == [label for label, _ in reference]
+        assert np.allclose([score for _, score in result], [score for _, score in reference], atol=1e-5)
+
+
+if __name__ == "__main__":
+    test_shared_frames()
+    test_thread_worker_without_copy()
+    test_process_pool()
+    test_idle_pool_restarts_replicas()
+    test_async_submit()
+    test_processor_error_returned_to_its_caller()
+    test_micro_batching()
+    print("Workers, pools, async submit and batching return every result to its caller")
@@ -0,0 +1,64 @@
+from recognition.tracker import IoUTracker, Track, bbox_iou
+
+
+def test_bbox_iou():
+    assert bbox_iou((0, 0, 10, 10), (0, 0, 10, 10)) == 1.0
+    assert bbox_iou((0, 0, 10, 10), (5, 0, 15, 10)) == 50 / 150
+    assert bbox_iou((0, 0, 10, 10), (10, 0, 20, 10)) == 0.0
+
+
+def test_tracks_follow_moving_boxes():
+    tracker = IoUTracker(iou_threshold=0.3, max_age=2)
+    first = tracker.update([(0, 0, 100, 100), (200, 0, 300, 100)])
+    assert [track.track_id for track in first] == [0, 1]
+
+    # boxes moved a little and given in the other order: same tracks, in the order of the boxes
+    second = tracker.update([(205, 5, 305, 105), (10, 0, 110, 100)])
+    assert [track.track_id for track in second] == [1, 0]
+    assert second[0].bbox == (205, 5, 305, 105)
+
+    # a box far from every track starts a new one, the greedy match gives each track one box only
+    third = tracker.update([(10, 0, 110, 100), (12, 0, 112, 100), (400, 0, 500, 100)])
+    assert [track.track_id for track in third] == [0, 2, 3]
+
+
+def test_max_age_expiry():
+    tracker = IoUTracker(iou_threshold=0.3, max_age=2)
+    track = tracker.update([(0, 0, 100, 100)])[0]
+    track.num_true = 5
+
+    # kept while missing for up to max_age frames, then dropped
+    for misses in [1, 2]:
+        tracker.update([])
+        assert tracker.tracks == [track] and track.misses == misses
+    assert tracker.update([(0, 0, 100, 100)])[0] is track and track.misses == 0 and track.num_true == 5
+
+    for _ in range(3):
+        tracker.update([])
+    assert tracker.tracks == []
+    assert tracker.update([(0, 0, 100, 100)])[0].track_id == 1
+
+    # max_age 0 (tracking off): no track survives a frame without its box
+    tracker = IoUTracker(max_age=0)
+    tracker.update([(0, 0, 100, 100)])
+    tracker.update([])
+    assert tracker.tracks == []
+
+
+def test_track_reset():
+    track = Track(0, (0, 0, 10, 10))
+    track.num_true, track.num_false = 3, 1
+    track.match, track.status, track.verified_at = ("Kien", 0.8, "1"), "real", 12
+
+    # the cached result is dropped, the liveness votes are kept
+    track.reset()
+    assert (track.match, track.status, track.verified_at) == (None, "", None)
+    assert (track.num_true, track.num_false) == (3, 1)
+
+
+if __name__ == "__main__":
+    test_bbox_iou()
+    test_tracks_follow_moving_boxes()
+    test_max_age_expiry()
+    test_track_reset()
+    print("IoU tracker matches boxes, expires tracks and resets cached results")
@@ -0,0 +1,231 @@
+import os
+import tempfile
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from recognition.face_process import Face_process
+from utils.uploads import EncodedImage, LocalUploader, UploadExecutor, UploadJournal
+
+
+def make_images(folder, count):
+    paths = []
+    for idx in range(count):
+        path = os.path.join(folder, f"spoof_{idx}.jpg")
+        with open(path, "wb") as f:
+            f.write(b"jpeg %d" % idx)
+        paths.append(path)
+    return paths
+
+
+def wait_until(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timeout"
+        time.sleep(0.01)
+
+
+class FlakyUploader:
+    """LocalUploader failing the first `failures` calls, records how many uploads run at the same time"""
+
+    def __init__(self, folder, failures=0, delay=0.0):
+        self.local = LocalUploader(folder)
+        self.failures = failures
+        self.delay = delay
+        self.calls = []
+        self.running = 0
+        self.max_running = 0
+        self._lock = threading.Lock()
+
+    def upload(self, image_path, status):
+        with self._lock:
+            self.calls.append((time.monotonic(), image_path))
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+            fail = len(self.calls) <= self.failures
+        time.sleep(self.delay)
+        with self._lock:
+            self.running -= 1
+        if fail:
+            raise ConnectionError("network down")
+        return self.local.upload(image_path, status)
+
+
+def test_bounded_concurrency():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        uploader = FlakyUploader(os.path.join(tmp_dir, "cloud"), delay=0.05)
+        uploaded = []
+        executor = UploadExecutor(uploader.upload, os.path.join(tmp_dir, "uploads.sqlite3"), workers=2,
+                                  on_uploaded=lambda url, status: uploaded.append((url, status))).start()
+        threads_before = threading.active_count()
+        for path in make_images(tmp_dir, 10):
+            executor.submit(path, "spoof")
+        assert threading.active_count() == threads_before  # submitting does not start threads
+
+        wait_until(lambda: executor.stats() == {"pending": 0, "in_flight": 0, "uploaded": 10, "failures": 0})
+        assert uploader.max_running == 2
+        assert len(uploaded) == 10 and all(url.startswith("file://") for url, _ in uploaded)
+        assert len(os.listdir(os.path.join(tmp_dir, "cloud", "spoof"))) == 10
+        executor.stop()
+
+
+def test_retry_with_backoff():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        uploader = FlakyUploader(os.path.join(tmp_dir, "cloud"), failures=3)
+        executor = UploadExecutor(uploader.upload, os.path.join(tmp_dir, "uploads.sqlite3"), workers=1,
+                                  backoff=0.05).start()
+        executor.submit(make_images(tmp_dir, 1)[0], "unknown")
+
+        wait_until(lambda: executor.stats()["uploaded"] == 1)
+        assert executor.stats()["failures"] == 3
+        times = [call_time for call_time, _ in uploader.calls]
+        gaps = [later - earlier for earlier, later in zip(times, times[1:])]
+        for gap, backoff in zip(gaps, [0.05, 0.1, 0.2]):
+            assert gap >= backoff * 0.9
+        executor.stop()
+
+
+def test_pending_uploads_survive_restart():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        journal_path = os.path.join(tmp_dir, "violations", "uploads.sqlite3")
+        paths = make_images(tmp_dir, 3)
+
+        # network down: every upload fails and stays in the journal
+        executor = UploadExecutor(lambda *_: None, journal_path, backoff=60).start()
+        for path in paths:
+            executor.submit(path, "spoof")
+        wait_until(lambda: executor.stats()["failures"] == 3)
+        assert executor.stats()["pending"] == 3
+        executor.stop()
+
+        journal = UploadJournal(journal_path)
+        assert len(journal) == 3 and journal.next_due(time.time()) is None  # backing off
+        journal._conn.execute("UPDATE uploads SET next_attempt = 0")
+        journal._conn.commit()
+        journal.close()
+
+        os.remove(paths[0])  # deleted meanwhile: skipped, not retried forever
+        uploader = FlakyUploader(os.path.join(tmp_dir, "cloud"))
+        executor = UploadExecutor(uploader.upload, journal_path).start()
+        wait_until(lambda: executor.stats()["pending"] == 0 and executor.stats()["in_flight"] == 0)
+        assert sorted(path for _, path in uploader.calls) == sorted(paths[1:])
+        executor.stop()
+
+
+class RecordingConnection:
+    """
+    SQLite connection recording the threads its statements run on, every statement made slow like a busy disk
+    """
+
+    def __init__(self, conn, delay):
+        self.conn = conn
+        self.delay = delay
+        self.threads = []
+
+    def execute(self, *args):
+        self.threads.append(threading.current_thread())
+        time.sleep(self.delay)
+        return self.conn.execute(*args)
+
+    def __enter__(self):
+        return self.conn.__enter__()
+
+    def __exit__(self, *exc_info):
+        return self.conn.__exit__(*exc_info)
+
+    def close(self):
+        self.conn.close()
+
+
+def test_submit_without_disk_io():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        uploader = FlakyUploader(os.path.join(tmp_dir, "cloud"))
+        executor = UploadExecutor(uploader.upload, os.path.join(tmp_dir, "uploads.sqlite3"),
+                                  persist_folder=os.path.join(tmp_dir, "violations")).start()
+        connection = executor.journal._conn = RecordingConnection(executor.journal._conn, delay=0.05)
+        images = [EncodedImage(f"spoof_{idx}.jpg", b"jpeg %d" % idx) for idx in range(5)]
+
+        start = time.perf_counter()
+        for image in images:
+            executor.submit(image, "spoof")
+        assert time.perf_counter() - start < 0.05  # queued, the journal writes come later
+        assert threading.current_thread() not in connection.threads
+        assert executor.stats()["pending"] == 5
+
+        wait_until(lambda: executor.stats()["uploaded"] == 5)
+        assert {thread.name for thread in connection.threads} >= {"upload-journal"}
+        assert len(os.listdir(os.path.join(tmp_dir, "violations", "spoof"))) == 5
+        executor.stop()
+
+        # submitted after stop: journaled by stop on the next start
+        executor = UploadExecutor(uploader.upload, os.path.join(tmp_dir, "uploads.sqlite3"))
+        executor.submit(images[0], "spoof")
+        executor.stop()
+        journal = UploadJournal(os.path.join(tmp_dir, "uploads.sqlite3"))
+        assert len(journal) == 1
+        journal.close()
+
+
+def test_encode_warning():
+    face_process = Face_process()
+    frame = np.random.default_rng(0).integers(0, 255, (720, 1280, 3), dtype=np.uint8)
+    image = face_process.encode_warning(frame, (400, 100, 900, 600), "spoof")
+
+    max_size = face_process.configs["uploads"]["max_size"]
+    crop = cv2.imdecode(np.frombuffer(image.data, np.uint8), cv2.IMREAD_COLOR)
+    assert image.name.startswith("spoof_") and image.name.endswith(".jpg")
+    assert max(crop.shape[:2]) == max_size  # 40% margin, clipped to the frame, then downscaled
+    assert crop.shape[1] / crop.shape[0] == (1100 - 200) / 720
+
+
+def test_in_memory_uploads():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        journal_path = os.path.join(tmp_dir, "violations", "uploads.sqlite3")
+        uploader = FlakyUploader(os.path.join(tmp_dir, "cloud"), failures=1)
+        executor = UploadExecutor(uploader.upload, journal_path, workers=1, backoff=0.05,
+                                  persist_folder=os.path.join(tmp_dir, "violations")).start()
+        images = [EncodedImage(f"unknown_{idx}.jpg", b"jpeg %d" % idx) for idx in range(3)]
+        for image in images:
+            executor.submit(image, "unknown")
+
+        # the first upload fails and is retried from the journal, each row is removed once uploaded
+        wait_until(lambda: executor.stats() == {"pending": 0, "in_flight": 0, "uploaded": 3, "failures": 1})
+        for image in images:
+            for folder in ["violations", "cloud"]:
+                with open(os.path.join(tmp_dir, folder, "unknown", image.name), "rb") as f:
+                    assert f.read() == image.data
+        executor.stop()
+
+        # journaled with their bytes by the journal thread, in memory or not: a crash during the upload loses nothing
+        release = threading.Event()
+        executor = UploadExecutor(lambda *_: release.wait() and None, journal_path, workers=1, backoff=0,
+                                  max_in_memory=1).start()
+        executor.submit(images[0], "unknown")
+        executor.submit(images[1], "unknown")
+        crashed = UploadJournal(journal_path)  # the process dies here, executor.stop never runs
+        wait_until(lambda: len(crashed) == 2)
+        first = crashed.next_due(time.time())
+        second = crashed.next_due(time.time(), (first[0],))
+        assert [first[1:], second[1:]] == [(image, "unknown", 0) for image in images[:2]]
+        crashed.close()
+        release.set()
+        executor.stop()
+
+        # uploaded after the restart, each image once
+        uploader = FlakyUploader(os.path.join(tmp_dir, "cloud"))
+        executor = UploadExecutor(uploader.upload, journal_path).start()
+        wait_until(lambda: executor.stats() == {"pending": 0, "in_flight": 0, "uploaded": 2, "failures": 0})
+        assert sorted(image.name for _, image in uploader.calls) == [images[0].name, images[1].name]
+        executor.stop()
+
+
+if __name__ == "__main__":
+    test_bounded_concurrency()
+    test_retry_with_backoff()
+    test_pending_uploads_survive_restart()
+    test_submit_without_disk_io()
+    test_encode_warning()
+    test_in_memory_uploads()
+    print("Violation uploads are bounded, retried with backoff and survive restarts")
@@ -0,0 +1,52 @@
+import os
+import tempfile
+
+import cv2
+import numpy as np
+
+from recognition.video_analysis import COLUMNS, FrameReader, VideoAnalyzer, write_columns
+from utils.config import load_config
+
+VIDEO = "face_data/phuc.mp4"
+
+
+def test_frame_reader_stride():
+    cap = cv2.VideoCapture(VIDEO)
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+
+    indices = [index for index, *_ in FrameReader(VIDEO, stride=7, queue_size=2)]
+    assert indices == list(range(0, total, 7))
+
+    # leaving the loop early stops the reader
+    reader = FrameReader(VIDEO, queue_size=2)
+    for _ in reader:
+        break
+    reader.join(5)
+    assert not reader.is_alive()
+
+
+def test_analyze_video_columns():
+    configs = load_config()
+    analyzer = VideoAnalyzer(configs, recognition=False, batch_size=4, face_detector="retinaface")
+    columns = analyzer.analyze_video(VIDEO, stride=25)
+
+    assert tuple(columns) == COLUMNS
+    assert len({len(values) for values in columns.values()}) == 1
+    assert set(np.unique(columns["frame"]) % 25) == {0}
+    faces = columns["face"] >= 0
+    assert faces.any()
+    assert (columns["x2"][faces] > columns["x1"][faces]).all()
+    assert (columns["identity"] == "").all() and np.isnan(columns["similarity"]).all()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        written = write_columns(columns, os.path.join(tmp_dir, "phuc.npz"))
+        with np.load(written) as loaded:
+            for name in COLUMNS:
+                np.testing.assert_array_equal(loaded[name], columns[name])
+
+
+if __name__ == "__main__":
+    test_frame_reader_stride()
+    test_analyze_video_columns()
+    print("Video files are decoded in the background and analysed into columns")
@@ -0,0 +1,132 @@
+import glob
+import os
+import sys
+
+import onnxruntime
+from insightface.app import FaceAnalysis
+from insightface.model_zoo.model_zoo import ModelRouter
+from insightface.utils.storage import ensure_available
+
+DEFAULT_DEVICE_CONFIG = {
+    "providers": ["CPUExecutionProvider"],
+    "intra_op_num_threads": 0,
+    "inter_op_num_threads": 0,
+    "graph_optimization_level": "ORT_ENABLE_ALL",
+    "torch_device": "cpu",
+    "torch_num_threads": 0,
+    "torch_interop_threads": 0,
+}
+
+
+def load_device_config(configs):
+    """
+    `device` section of config.yaml merged over CPU-first defaults.
+    Providers missing from this onnxruntime build are dropped.
+    :param configs: loaded config.yaml
+    :return: dict
+    """
+    device_config = dict(DEFAULT_DEVICE_CONFIG, **(configs.get("device") or {}))
+
+    available = onnxruntime.get_available_providers()
+    providers = [provider for provider in device_config["providers"] if provider in available]
+    for provider in device_config["providers"]:
+        if provider not in available:
+            print(f"Execution provider {provider} is not available, skipped. Available: {available}")
+    device_config["providers"] = providers or ["CPUExecutionProvider"]
+
+    # torch is only imported for a CUDA device, the onnx backends run without it
+    if device_config["torch_device"].startswith("cuda") and not _torch_cuda_available():
+        print(f"Torch device {device_config['torch_device']} is not available, using cpu.")
+        device_config["torch_device"] = "cpu"
+
+    # insightface ctx_id: 0 = GPU, -1 = CPU
+    device_config.setdefault("ctx_id", 0 if "CUDAExecutionProvider" in device_config["providers"] else -1)
+    return device_config
+
+
+def _torch_cuda_available():
+    import torch
+    return torch.cuda.is_available()
+
+
+def session_options(device_config):
+    """
+    onnxruntime.SessionOptions from device config
+    """
+    options = onnxruntime.SessionOptions()
+    options.intra_op_num_threads = device_config["intra_op_num_threads"]
+    options.inter_op_num_threads = device_config["inter_op_num_threads"]
+    options.graph_optimization_level = getattr(onnxruntime.GraphOptimizationLevel,
+                                               device_config["graph_optimization_level"])
+    return options
+
+
+class SessionFaceAnalysis(FaceAnalysis):
+    """
+    FaceAnalysis building the session of each model once with `sess_options`,
+    FaceAnalysis itself only forwards providers to its models.
+    """
+
+    def __init__(self, name, root="~/.insightface", allowed_modules=None, providers=None, sess_options=None):
+        onnxruntime.set_default_logger_severity(3)
+        self.models = {}
+        self.model_dir = ensure_available("models", name, root=root)
+        for onnx_file in sorted(glob.glob(os.path.join(self.model_dir, "*.onnx"))):
+            model = ModelRouter(onnx_file).get_model(providers=providers, sess_options=sess_options)
+            if model is None:
+                print("model not recognized:", onnx_file)
+            elif allowed_modules is not None and model.taskname not in allowed_modules:
+                print("model ignore:", onnx_file, model.taskname)
+            elif model.taskname in self.models:
+                print("duplicated model task type, ignore:", onnx_file, model.taskname)
+            else:
+                self.models[model.taskname] = model
+        assert "detection" in self.models
+        self.det_model = self.models["detection"]
+
+
+def create_face_analysis(name, device_config, allowed_modules=None, det_size=(640, 640), root="~/.insightface"):
+    """
+    FaceAnalysis with providers, threads and graph optimization from device config
+    """
+    face_app = SessionFaceAnalysis(name=name, root=root, allowed_modules=allowed_modules,
+                                   providers=device_config["providers"], sess_options=session_options(device_config))
+    face_app.prepare(ctx_id=device_config["ctx_id"], det_size=det_size)
+    return face_app
+
+
+def apply_torch_threads(device_config):
+    """
+    torch thread pools are process-wide, 0 keeps the torch default (and torch is not imported)
+    """
+    if device_config["torch_num_threads"] <= 0 and device_config["torch_interop_threads"] <= 0:
+        return
+    import torch
+    if device_config["torch_num_threads"] > 0:
+        torch.set_num_threads(device_config["torch_num_threads"])
+    if device_config["torch_interop_threads"] > 0:
+        try:
+            torch.set_num_interop_threads(device_config["torch_interop_threads"])
+        except RuntimeError as e:
+            # can only be set once, before any inter-op parallel work
+            print(f"Cannot set torch inter-op threads: {e}")
+
+
+def log_device_settings(device_config, face_app=None):
+    """
+    print effective device settings at startup
+    """
+    print("Device settings:")
+    print(f"  onnxruntime providers: {device_config['providers']} (ctx_id={device_config['ctx_id']})")
+    print(f"  onnxruntime threads: intra_op={device_config['intra_op_num_threads']}, "
+          f"inter_op={device_config['inter_op_num_threads']}, "
+          f"graph optimization: {device_config['graph_optimization_level']}")
+    torch = sys.modules.get("torch")
+    if torch is None:
+        print(f"  torch device: {device_config['torch_device']} (torch not loaded)")
+    else:
+        print(f"  torch device: {device_config['torch_device']}, threads: {torch.get_num_threads()}, "
+              f"inter-op threads: {torch.get_num_interop_threads()}")
+    if face_app is not None:
+        for taskname, model in face_app.models.items():
+            print(f"  {taskname}: {model.session.get_providers()}")
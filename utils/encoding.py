@@ -1,13 +1,47 @@
+import argparse
+import hashlib
+import json
+import os
 import yaml
 import numpy as np
 
 
+def sidecar_path(path):
+    """
+    path of the id/name sidecar of a .npy gallery
+    """
+    return os.path.splitext(path)[0] + ".json"
+
+
+def encodings_fingerprint(encodings):
+    """
+    sha256 of a gallery matrix: dtype, shape and values in order. Written to the sidecar with the .npy,
+    so startup does not read the whole matrix to know whether a saved index still matches it
+    """
+    encodings = np.ascontiguousarray(encodings)
+    digest = hashlib.sha256(f"{encodings.dtype}|{encodings.shape}".encode())
+    digest.update(encodings.reshape(-1).view(np.uint8))
+    return digest.hexdigest()
+
+
 def load_face_encodings(path="encoding_face.yaml"):
     """
-    Load dữ liệu từ file face_encoding.yaml.
-    :param path: Đường dẫn đến file YAML.
+    Load dữ liệu từ file face_encoding.yaml hoặc face_encoding.npy.
+    :param path: Đường dẫn đến file YAML hoặc NPY.
+        A missing .npy gallery is converted from the .yaml gallery of the same name when there is one
+        (galleries enrolled before the binary format).
     :return:
     """
+    if path.endswith(".npy"):
+        legacy_path = os.path.splitext(path)[0] + ".yaml"
+        if not os.path.isfile(path) and os.path.isfile(legacy_path):
+            print(f"Encoding file {path} not found, converting {legacy_path}")
+            try:
+                convert_yaml_encodings(legacy_path, path)
+            except OSError as e:
+                print(f"Cannot write {path} ({e}), loading {legacy_path}")
+                return load_face_encodings(legacy_path)
+        return load_npy_encodings(path)
     try:
         with open(path, "r") as file:
             data = yaml.safe_load(file)
@@ -18,3 +52,61 @@ def load_face_encodings(path="encoding_face.yaml"):
     except yaml.YAMLError as e:
         print(f"Error reading encoding file: {e}")
         exit(1)
+
+
+def load_npy_encodings(path="encoding_face.npy"):
+    """
+    Load a binary gallery. The matrix is memory-mapped, not read into memory.
+    :param path: path to the .npy matrix, ids and names are read from the .json sidecar
+    :return: dict with 'encoding', 'name', 'id', 'normalized' and 'fingerprint' (`encodings_fingerprint`,
+        missing in galleries written before it)
+    """
+    try:
+        with open(sidecar_path(path), "r") as file:
+            data = json.load(file)
+        data["encoding"] = np.load(path, mmap_mode="r")
+        return data
+    except FileNotFoundError as e:
+        print(f"Encoding file not found: {e}")
+        exit(1)
+    except ValueError as e:
+        print(f"Error reading encoding file: {e}")
+        exit(1)
+
+
+def save_face_encodings(path, encodings, names, ids, dtype="float32"):
+    """
+    Save a gallery in binary format: an L2-normalized (N, D) matrix in `dtype`, the dtype the index keeps, and a
+    .json sidecar with its fingerprint.
+    :param path: path to the .npy matrix
+    :param encodings: (N, D) face encodings
+    :param names: list of N names
+    :param ids: list of N user ids
+    :param dtype: float32 or float16
+    """
+    encodings = np.asarray(encodings, dtype=np.float32).reshape(len(names), -1)
+    encodings /= np.maximum(np.linalg.norm(encodings, axis=1, keepdims=True), np.finfo(np.float32).eps)
+    encodings = encodings.astype(dtype, copy=False)
+    np.save(path, encodings)
+
+    with open(sidecar_path(path), "w") as file:
+        json.dump({"name": list(names), "id": [str(i) for i in ids], "normalized": True,
+                   "fingerprint": encodings_fingerprint(encodings)}, file)
+
+
+def convert_yaml_encodings(yaml_path="encoding_face.yaml", npy_path="encoding_face.npy", dtype="float32"):
+    """
+    One-shot conversion of a YAML gallery to the binary format
+    """
+    data = load_face_encodings(yaml_path)
+    save_face_encodings(npy_path, data["encoding"], data["name"], data["id"], dtype=dtype)
+    print(f"Converted {len(data['name'])} encodings: {yaml_path} -> {npy_path}, {sidecar_path(npy_path)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert encoding_face.yaml to the binary gallery format")
+    parser.add_argument("yaml_path", nargs="?", default="encoding_face.yaml")
+    parser.add_argument("npy_path", nargs="?", default="encoding_face.npy")
+    parser.add_argument("--dtype", default="float32", choices=["float32", "float16"])
+    args = parser.parse_args()
+    convert_yaml_encodings(args.yaml_path, args.npy_path, args.dtype)
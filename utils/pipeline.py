@@ -0,0 +1,251 @@
+"""
+Staged pipeline: each stage runs on its own thread and hands items to the next one through a bounded queue.
+A full queue drops its oldest item, a slow stage works on the newest frame instead of building a backlog,
+so the frame rate is set by the slowest stage and not by the sum of all stages.
+"""
+import threading
+import time
+from collections import deque
+from queue import Empty
+
+
+class QueueClosed(Exception):
+    """the producer finished and every item was taken"""
+
+
+class DropOldestQueue:
+    """
+    bounded queue, `put` on a full queue drops the oldest item instead of blocking
+    :param maxsize: items kept
+    """
+
+    def __init__(self, maxsize=2):
+        self.maxsize = max(maxsize, 1)
+        self.dropped = 0
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def __len__(self):
+        with self._cond:
+            return len(self._items)
+
+    def put(self, item):
+        with self._cond:
+            if len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """
+        :raise queue.Empty: nothing within `timeout`
+        :raise QueueClosed: closed and drained
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items or self._closed, timeout):
+                raise Empty
+            if self._items:
+                return self._items.popleft()
+            raise QueueClosed
+
+    def close(self):
+        """no more items, consumers finish once the queue is drained"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class StageStats:
+    """
+    throughput and latency of a stage over its last `window` items
+    """
+
+    def __init__(self, window=64):
+        self.processed = 0
+        self._done_at = deque(maxlen=window)
+        self._elapsed = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, start, end):
+        with self._lock:
+            self.processed += 1
+            self._done_at.append(end)
+            self._elapsed.append(end - start)
+
+    def fps(self):
+        with self._lock:
+            if len(self._done_at) < 2:
+                return 0.0
+            span = self._done_at[-1] - self._done_at[0]
+            return (len(self._done_at) - 1) / span if span > 0 else 0.0
+
+    def latency_ms(self):
+        with self._lock:
+            return sum(self._elapsed) * 1000 / len(self._elapsed) if self._elapsed else 0.0
+
+
+class ErrorLog:
+    """
+    print errors at most once per `interval` seconds, with the number of errors not printed since
+    """
+
+    def __init__(self, interval=5.0):
+        self.interval = interval
+        self.count = 0
+        self._suppressed = 0
+        self._next_print = 0.0
+        self._lock = threading.Lock()
+
+    def error(self, message):
+        with self._lock:
+            self.count += 1
+            now = time.monotonic()
+            if now < self._next_print:
+                self._suppressed += 1
+                return
+            suppressed, self._suppressed = self._suppressed, 0
+            self._next_print = now + self.interval
+        print(message + (f" ({suppressed} more errors since the last one printed)" if suppressed else ""))
+
+
+class Stage(threading.Thread):
+    """
+    one step of a Pipeline
+    :param name: stage name, in the stats
+    :param fn: source stage (no inputs): fn() returns the next item, None ends the stream.
+        Other stages: fn(item) returns the item for the next stage, None drops it.
+    :param stop_event: stops the stage between two items
+    :param max_source_errors: a source stage failing this many times in a row ends the stream. It waits
+        backoff * 2 ** (failures - 1) seconds, capped at max_backoff, before retrying
+    """
+
+    def __init__(self, name, fn, stop_event, inputs=None, outputs=None, thread_name=None, max_source_errors=50,
+                 backoff=0.01, max_backoff=1.0):
+        super().__init__(name=thread_name or f"{name}-stage", daemon=True)
+        self.stage_name = name
+        self.fn = fn
+        self.stop_event = stop_event
+        self.inputs = inputs
+        self.outputs = outputs
+        self.max_source_errors = max_source_errors
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.stats = StageStats()
+        self.errors = ErrorLog()
+
+    def _next(self):
+        """:return: Tuple (item, end of stream)"""
+        if self.inputs is None:
+            return None, False
+        while not self.stop_event.is_set():
+            try:
+                return self.inputs.get(timeout=0.1), False
+            except Empty:
+                continue
+            except QueueClosed:
+                break
+        return None, True
+
+    def _source_failed(self, failures):
+        """
+        :return: True when the source stage gives up, else after its backoff
+        """
+        if failures >= self.max_source_errors:
+            print(f"{self.stage_name} stage failed {failures} times in a row, ending the stream")
+            return True
+        self.stop_event.wait(min(self.backoff * 2 ** (failures - 1), self.max_backoff))
+        return False
+
+    def run(self):
+        failures = 0
+        try:
+            while not self.stop_event.is_set():
+                item, end = self._next()
+                if end:
+                    break
+                start = time.perf_counter()
+                try:
+                    result = self.fn() if self.inputs is None else self.fn(item)
+                except Exception as e:
+                    self.errors.error(f"Error in {self.stage_name} stage: {e}")
+                    failures += 1
+                    # a failing item is skipped, a failing source is retried with backoff instead of spinning
+                    if self.inputs is None and self._source_failed(failures):
+                        break
+                    continue
+                failures = 0
+                if result is None and self.inputs is None:
+                    break
+                self.stats.record(start, time.perf_counter())
+                if result is not None and self.outputs is not None:
+                    self.outputs.put(result)
+        finally:
+            if self.outputs is not None:
+                self.outputs.close()
+
+    def summary(self):
+        """
+        :return: dict of fps, latency_ms (per item), processed, dropped (items this stage could not keep up with),
+            errors
+        """
+        return {"fps": self.stats.fps(), "latency_ms": self.stats.latency_ms(), "processed": self.stats.processed,
+                "dropped": self.inputs.dropped if self.inputs is not None else 0, "errors": self.errors.count}
+
+
+class Pipeline:
+    """
+    stages chained by DropOldestQueue, in the order they are added
+    :param queue_size: items buffered between two stages
+    :param stop_event: shared with the rest of the application, set by `stop`
+    :param name: prefix of the stage threads and of the printed stats
+    """
+
+    def __init__(self, queue_size=2, stop_event=None, name="pipeline"):
+        self.name = name
+        self.queue_size = queue_size
+        self.stop_event = stop_event or threading.Event()
+        self.stages = []
+
+    def add(self, name, fn):
+        inputs = None
+        if self.stages:
+            inputs = DropOldestQueue(self.queue_size)
+            self.stages[-1].outputs = inputs
+        self.stages.append(Stage(name, fn, self.stop_event, inputs=inputs, thread_name=f"{self.name}-{name}"))
+        return self
+
+    def start(self):
+        for stage in self.stages:
+            stage.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+
+    def is_alive(self):
+        return any(stage.is_alive() for stage in self.stages)
+
+    def stats(self):
+        """
+        :return: dict stage name -> Stage.summary()
+        """
+        return {stage.stage_name: stage.summary() for stage in self.stages}
+
+    def report(self):
+        return " | ".join(f"{name} {stats['fps']:.1f} fps {stats['latency_ms']:.1f} ms drop {stats['dropped']}"
+                          for name, stats in self.stats().items())
+
+    def run(self, stats_interval=0):
+        """
+        start and wait until every stage finished, print the stats every `stats_interval` seconds (0 = never)
+        """
+        self.start()
+        next_report = time.monotonic() + stats_interval
+        for stage in self.stages:
+            while stage.is_alive():
+                stage.join(0.5)
+                if stats_interval and time.monotonic() >= next_report:
+                    print(f"Pipeline {self.name}: {self.report()}")
+                    next_report = time.monotonic() + stats_interval
@@ -0,0 +1,199 @@
+"""
+Process-wide registry of configs and models.
+Every model is built once, on first use, and shared by all FaceRecognition, Face_process and workers.
+Shared configs must be treated as read-only.
+"""
+import os
+import threading
+
+from utils.config import load_config
+
+_lock = threading.Lock()
+_build_locks = {}
+_registry = {}
+
+
+def get_or_create(key, factory):
+    """
+    return the object registered under `key`, build it with `factory()` on first use.
+    Concurrent callers of the same key wait for one build; other keys are not blocked.
+    """
+    if key in _registry:
+        return _registry[key]
+
+    with _lock:
+        build_lock = _build_locks.setdefault(key, threading.Lock())
+    with build_lock:
+        if key not in _registry:
+            _registry[key] = factory()
+    return _registry[key]
+
+
+def get_config(path="config.yaml"):
+    """
+    config.yaml parsed once per process
+    """
+    return get_or_create(("config", os.path.abspath(path)), lambda: load_config(path))
+
+
+def get_device_config(configs):
+    """
+    device settings, torch threads are applied once
+    """
+    from utils.device import load_device_config, apply_torch_threads
+
+    def build():
+        device_config = load_device_config(configs)
+        apply_torch_threads(device_config)
+        return device_config
+
+    return get_or_create(("device", repr(sorted((configs.get("device") or {}).items()))), build)
+
+
+def get_face_analysis(configs, det_size=(640, 640)):
+    """
+    shared InsightFace FaceAnalysis
+    """
+    from utils.device import create_face_analysis, log_device_settings
+
+    models_config = configs["models"]
+    device_config = get_device_config(configs)
+    modules = models_config.get("face_analysis_modules")
+    key = ("face_analysis", models_config["face_analysis_model"], tuple(modules) if modules else None,
+           tuple(device_config["providers"]), tuple(det_size))
+
+    def build():
+        face_app = create_face_analysis(models_config["face_analysis_model"], device_config,
+                                        allowed_modules=modules, det_size=det_size)
+        log_device_settings(device_config, face_app)
+        return face_app
+
+    return get_or_create(key, build)
+
+
+def get_face_encodings(path):
+    """
+    gallery of `path` loaded once per process, .npy galleries stay memory-mapped
+    """
+    from utils.encoding import load_face_encodings
+
+    return get_or_create(("face_encodings", os.path.abspath(path)), lambda: load_face_encodings(path))
+
+
+def onnx_export_path(models_config, key, model_path):
+    """
+    ONNX file of a torch checkpoint: `models.<key>`, else next to the compiled models in `models.antispoofing_cache`
+    (data/cache), never beside the tracked checkpoints
+    """
+    if models_config.get(key):
+        return models_config[key]
+    cache_dir = models_config.get("antispoofing_cache") or "data/cache"
+    return os.path.join(cache_dir, os.path.basename(model_path).split(".")[0] + ".onnx")
+
+
+def get_spoofing_detector(configs):
+    """
+    shared anti-spoofing detector, torch or onnx backend from `models.antispoofing_backend`,
+    int8 mode from `models.antispoofing_quantization`. Takes BGR frames, as read by OpenCV, and swaps their
+    channels before the models unless `models.antispoofing_swap_channels` is false.
+    The onnx backend does not import torch once its ONNX file exists.
+    """
+    from library.face_antspoofing.quantization import QUANTIZATION_MODES
+    from library.util.image import IM_BGR, IM_RGB
+
+    models_config = configs["models"]
+    model_path = models_config["antispoofing_model"]
+    backend = models_config.get("antispoofing_backend", "torch")
+    quantization = models_config.get("antispoofing_quantization", "none")
+    concurrent = models_config.get("antispoofing_concurrent", False)
+    # the models were always fed channel-swapped OpenCV frames, IM_RGB keeps that swap
+    pixel_format = IM_RGB if models_config.get("antispoofing_swap_channels", True) else IM_BGR
+    device_config = get_device_config(configs)
+
+    if quantization not in QUANTIZATION_MODES:
+        raise ValueError(f"Unknown antispoofing_quantization: {quantization}, expected one of {QUANTIZATION_MODES}")
+    if quantization == "dynamic" and backend != "torch":
+        raise ValueError("antispoofing_quantization: dynamic needs antispoofing_backend: torch")
+    if quantization == "static" and backend != "onnx":
+        raise ValueError("antispoofing_quantization: static needs antispoofing_backend: onnx")
+
+    if backend == "onnx":
+        from library.face_antspoofing.onnx_detector import OnnxSpoofingDetector
+        from utils.device import session_options
+
+        onnx_path = onnx_export_path(models_config, "antispoofing_onnx", model_path)
+        quantized_path = models_config.get("antispoofing_quantized_onnx", os.path.splitext(onnx_path)[0] + ".int8.onnx")
+        session_path = quantized_path if quantization == "static" else onnx_path
+
+        def build():
+            # the int8 model is an artifact built offline, calibration does not belong in the kiosk boot
+            if session_path == quantized_path and not os.path.isfile(quantized_path):
+                raise FileNotFoundError(f"{quantized_path} not found, build it with: python -m "
+                                        f"library.face_antspoofing.quantization --output {quantized_path}")
+            if session_path == onnx_path and not os.path.isfile(onnx_path):
+                from library.face_antspoofing.onnx_export import export_onnx
+                print(f"Exporting {model_path} to {onnx_path}")
+                export_onnx(model_path, onnx_path)
+            return OnnxSpoofingDetector(session_path, providers=device_config["providers"],
+                                        sess_options=session_options(device_config), pixel_format=pixel_format,
+                                        concurrent=concurrent)
+
+        return get_or_create(("spoofing_detector", session_path, tuple(device_config["providers"]), pixel_format,
+                              concurrent), build)
+
+    from library.face_antspoofing.detector import SpoofingDetector
+    from library.face_antspoofing.quantization import quantize_dynamic_models
+
+    device = device_config["torch_device"]
+    # dynamic quantization rewrites eager modules, it cannot run on the TorchScript cache
+    cache_dir = models_config.get("antispoofing_cache") if quantization == "none" else None
+
+    def build():
+        detector = SpoofingDetector(model_path, device=device, pixel_format=pixel_format, concurrent=concurrent,
+                                    cache_dir=cache_dir)
+        if quantization == "dynamic":
+            quantize_dynamic_models(detector.model)
+        return detector
+
+    return get_or_create(("spoofing_detector", model_path, device, quantization, pixel_format, concurrent), build)
+
+
+def get_face_detector(configs):
+    """
+    shared RetinaFace detector, torch or onnx backend from `models.retinaface_backend`.
+    Takes BGR frames, results have the layout of the InsightFace detector.
+    """
+    from library.util.image import IM_BGR
+
+    models_config = configs["models"]
+    model_path = models_config.get("retinaface_model", "data/pretrained/retina_face.pth.tar")
+    backend = models_config.get("retinaface_backend", "torch")
+    input_size = tuple(models_config.get("retinaface_input_size", (640, 640)))
+    thresholds = dict(confidence_threshold=models_config.get("retinaface_confidence_threshold", 0.5),
+                      nms_threshold=models_config.get("retinaface_nms_threshold", 0.4))
+    device_config = get_device_config(configs)
+
+    if backend == "onnx":
+        from library.face_detection.onnx_detector import OnnxFaceDetector
+        from utils.device import session_options
+
+        onnx_path = onnx_export_path(models_config, "retinaface_onnx", model_path)
+
+        def build():
+            if not os.path.isfile(onnx_path):
+                from library.face_detection.onnx_export import export_onnx
+                print(f"Exporting {model_path} to {onnx_path}")
+                export_onnx(model_path, onnx_path, input_size=input_size)
+            return OnnxFaceDetector(onnx_path, providers=device_config["providers"],
+                                    sess_options=session_options(device_config), input_size=input_size,
+                                    pixel_format=IM_BGR, **thresholds)
+
+        return get_or_create(("face_detector", onnx_path, tuple(device_config["providers"]), input_size,
+                              tuple(thresholds.values())), build)
+
+    from library.face_detection.detector import FaceDetector
+
+    device = device_config["torch_device"]
+    return get_or_create(("face_detector", model_path, device, input_size, tuple(thresholds.values())),
+                         lambda: FaceDetector(model_path, device=device, input_size=input_size, pixel_format=IM_BGR,
+                                              **thresholds))
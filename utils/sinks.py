@@ -0,0 +1,122 @@
+"""
+Result sinks of the headless mode: every event is one JSON line.
+"""
+import json
+import socket
+import sys
+import threading
+import time
+
+
+def to_json_line(event):
+    # numpy scalars and arrays of the results are written as plain numbers and lists
+    return json.dumps(event, default=lambda value: value.tolist() if hasattr(value, "tolist") else str(value)) + "\n"
+
+
+class StdoutSink:
+    """JSON lines on stdout"""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self._lock = threading.Lock()
+
+    def write(self, event):
+        line = to_json_line(event)
+        with self._lock:
+            self.stream.write(line)
+            self.stream.flush()
+
+    def close(self):
+        pass
+
+
+class FileSink:
+    """
+    JSON lines appended to a file
+    :param path: output file, created if missing
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8", buffering=1)
+        self._lock = threading.Lock()
+
+    def write(self, event):
+        line = to_json_line(event)
+        with self._lock:
+            self._file.write(line)
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class SocketSink:
+    """
+    JSON lines sent to a local listener, a unix socket path or a (host, port) TCP address.
+    The connection is opened on first write and reopened after an error,
+    events written while nobody listens are dropped.
+    :param address: unix socket path (str) or (host, port)
+    :param retry_interval: seconds between two connection attempts
+    """
+
+    def __init__(self, address, retry_interval=1.0, timeout=1.0):
+        self.address = address
+        self.retry_interval = retry_interval
+        self.timeout = timeout
+        self.dropped = 0
+        self._socket = None
+        self._next_attempt = 0.0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if time.monotonic() < self._next_attempt:
+            return None
+        family = socket.AF_UNIX if isinstance(self.address, str) else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.address)
+        except OSError:
+            sock.close()
+            self._next_attempt = time.monotonic() + self.retry_interval
+            return None
+        return sock
+
+    def write(self, event):
+        data = to_json_line(event).encode("utf-8")
+        with self._lock:
+            if self._socket is None:
+                self._socket = self._connect()
+            if self._socket is None:
+                self.dropped += 1
+                return
+            try:
+                self._socket.sendall(data)
+            except OSError:
+                self._socket.close()
+                self._socket = None
+                self.dropped += 1
+
+    def close(self):
+        with self._lock:
+            if self._socket is not None:
+                self._socket.close()
+                self._socket = None
+
+
+def create_sink(spec):
+    """
+    :param spec: "stdout", "file:<path>", "unix:<socket path>" or "tcp:<host>:<port>"
+    """
+    kind, _, target = spec.partition(":")
+    if kind == "stdout":
+        return StdoutSink()
+    if kind == "file" and target:
+        return FileSink(target)
+    if kind == "unix" and target:
+        return SocketSink(target)
+    if kind == "tcp" and target:
+        host, _, port = target.rpartition(":")
+        return SocketSink((host or "127.0.0.1", int(port)))
+    raise ValueError(f"Unknown sink: {spec}, expected stdout, file:<path>, unix:<path> or tcp:<host>:<port>")
@@ -0,0 +1,330 @@
+"""
+Violation image uploads: a journal of pending uploads on disk (SQLite) and a fixed number of upload threads.
+Failed uploads stay in the journal and are retried with exponential backoff, also after a restart.
+Submitting only queues the image in memory: a journal thread writes it to disk, so the caller (the publish
+thread) never waits on the disk. Images encoded in memory (EncodedImage) are journaled with their bytes and
+uploaded from memory, their row is removed once uploaded. A crash loses at most the images submitted but not
+journaled yet, a few milliseconds worth.
+"""
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from collections import deque, namedtuple
+
+
+class EncodedImage(namedtuple("EncodedImage", ["name", "data"])):
+    """JPEG bytes of a violation image and its file name, uploaded without being written to disk first"""
+    __slots__ = ()
+
+    def __str__(self):
+        return self.name
+
+
+class UploadJournal:
+    """
+    pending uploads in a SQLite file, one row per image until it is uploaded.
+    Rows of an EncodedImage keep its name in image_path and its bytes in data.
+    Write-ahead log, synced at checkpoints only: a commit does not wait for the disk, it survives a crash of the
+    process but not necessarily a power cut.
+    :param path: SQLite file, created if missing
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS uploads ("
+                               "id INTEGER PRIMARY KEY AUTOINCREMENT, image_path TEXT NOT NULL, "
+                               "status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, "
+                               "next_attempt REAL NOT NULL, created REAL NOT NULL, data BLOB)")
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(uploads)")]
+            if "data" not in columns:
+                self._conn.execute("ALTER TABLE uploads ADD COLUMN data BLOB")
+
+    def add(self, image, status, attempts=0, next_attempt=None):
+        """
+        :param image: path of an image file or EncodedImage
+        """
+        now = time.time()
+        name, data = image if isinstance(image, EncodedImage) else (image, None)
+        with self._lock, self._conn:
+            cursor = self._conn.execute("INSERT INTO uploads "
+                                        "(image_path, status, attempts, next_attempt, created, data) "
+                                        "VALUES (?, ?, ?, ?, ?, ?)",
+                                        (name, status, attempts, now if next_attempt is None else next_attempt, now,
+                                         data))
+        return cursor.lastrowid
+
+    def next_due(self, now, exclude=()):
+        """
+        :return: oldest due row (id, image, status, attempts) not in `exclude`, None if nothing is due.
+            image is the path or an EncodedImage
+        """
+        placeholders = ",".join("?" * len(exclude))
+        with self._lock:
+            row = self._conn.execute(f"SELECT id, image_path, status, attempts, data FROM uploads "
+                                     f"WHERE next_attempt <= ? AND id NOT IN ({placeholders}) "
+                                     f"ORDER BY next_attempt, id LIMIT 1", (now, *exclude)).fetchone()
+        if row is None:
+            return None
+        row_id, image_path, status, attempts, data = row
+        return row_id, image_path if data is None else EncodedImage(image_path, bytes(data)), status, attempts
+
+    def next_attempt_time(self, exclude=()):
+        """
+        :return: time of the next retry of a row not in `exclude`, None when the journal is empty
+        """
+        placeholders = ",".join("?" * len(exclude))
+        with self._lock:
+            return self._conn.execute(f"SELECT MIN(next_attempt) FROM uploads WHERE id NOT IN ({placeholders})",
+                                      tuple(exclude)).fetchone()[0]
+
+    def retry(self, row_id, next_attempt):
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE uploads SET attempts = attempts + 1, next_attempt = ? WHERE id = ?",
+                               (next_attempt, row_id))
+
+    def remove(self, row_id):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM uploads WHERE id = ?", (row_id,))
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM uploads").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class UploadExecutor:
+    """
+    upload journaled images on `workers` threads, at most `workers` uploads run at the same time however many
+    violations are submitted. Submitted images are journaled by one more thread, in the order of submission.
+    A failed upload (exception or no URL) is retried after backoff * 2 ** attempts seconds, capped at `max_backoff`.
+    :param upload: callable (image, status) -> URL, None on failure (FirebaseService.upload_to_cloudinary).
+        image is the path of an image file or an EncodedImage
+    :param journal_path: SQLite file of the pending uploads
+    :param on_uploaded: callable (url, status) called after every successful upload
+    :param persist_folder: EncodedImage are also written to `persist_folder`/<status>/, on the upload threads.
+        None = not written
+    :param max_in_memory: EncodedImage also kept in memory for their first attempt, the next ones are read back
+        from the journal
+    """
+
+    def __init__(self, upload, journal_path, workers=2, backoff=1.0, max_backoff=300.0, on_uploaded=None,
+                 poll_interval=1.0, persist_folder=None, max_in_memory=64):
+        self.upload = upload
+        self.journal = UploadJournal(journal_path)
+        self.workers = max(workers, 1)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.on_uploaded = on_uploaded
+        self.poll_interval = poll_interval
+        self.persist_folder = persist_folder
+        self.max_in_memory = max_in_memory
+        self.uploaded = 0
+        self.failures = 0
+        # (image, status) submitted but not journaled yet, and the count being written by the journal thread.
+        # Its own lock: submit never waits on the upload threads, which query the journal under `_condition`
+        self._submitted = deque()
+        self._journaling = 0
+        self._submitted_condition = threading.Condition()
+        # (row id, image, status) of journaled images whose first attempt reuses the bytes in memory
+        self._memory = deque()
+        self._in_flight = set()
+        self._condition = threading.Condition()
+        self._stop_event = threading.Event()
+        self._threads = []
+
+    def submit(self, image, status):
+        """
+        queue an image for the journal thread, it is uploaded by the next free worker. Never blocks on the network
+        nor on the disk.
+        :param image: path of an image file or EncodedImage, journaled with its bytes
+        """
+        with self._submitted_condition:
+            self._submitted.append((image, status))
+            self._submitted_condition.notify()
+
+    def start(self):
+        thread = threading.Thread(target=self._run_journal, name="upload-journal", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+        for idx in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"upload-{idx}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self, timeout=5.0):
+        """
+        stop the workers, pending uploads stay in the journal for the next start
+        """
+        self._stop_event.set()
+        with self._submitted_condition:
+            self._submitted_condition.notify_all()
+        with self._condition:
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        # submitted after the journal thread stopped, or never started
+        while self._journal_next(block=False):
+            pass
+        with self._condition:
+            waiting, self._memory = list(self._memory), deque()
+        # already journaled, only the copy in the violations folder is still missing
+        for _, image, status in waiting:
+            self._persist(image, status)
+        self.journal.close()
+
+    def stats(self):
+        """
+        :return: dict of pending (queue depth, in flight included), in_flight, uploaded, failures
+        """
+        with self._condition:
+            with self._submitted_condition:
+                submitted = len(self._submitted) + self._journaling
+            in_flight = len(self._in_flight)
+            pending = submitted + len(self.journal)
+        return {"pending": pending, "in_flight": in_flight, "uploaded": self.uploaded,
+                "failures": self.failures}
+
+    def _journal_next(self, block=True):
+        """
+        journal the oldest submitted image, waiting for one if `block` until stop
+        :return: False when there is nothing left to journal
+        """
+        with self._submitted_condition:
+            while not self._submitted:
+                if not block or self._stop_event.is_set():
+                    return False
+                self._submitted_condition.wait()
+            image, status = self._submitted.popleft()
+            self._journaling += 1
+        # under `_condition` with the count: stats never sees the image both journaled and still being journaled
+        with self._condition:
+            try:
+                row_id = self.journal.add(image, status)
+                if isinstance(image, EncodedImage) and len(self._memory) < self.max_in_memory:
+                    self._memory.append((row_id, image, status))
+                self._condition.notify()
+            finally:
+                with self._submitted_condition:
+                    self._journaling -= 1
+        return True
+
+    def _run_journal(self):
+        # drains the submitted images before stopping
+        while True:
+            try:
+                if not self._journal_next():
+                    return
+            except sqlite3.Error as e:
+                print(f"Error journaling an upload: {e}")
+
+    def _claim(self):
+        """
+        :return: (row id, image, status, attempts), None at stop
+        """
+        with self._condition:
+            while not self._stop_event.is_set():
+                if self._memory:
+                    row_id, image, status = self._memory.popleft()
+                    self._in_flight.add(row_id)
+                    return row_id, image, status, 0
+                # rows waiting in memory are claimed from there
+                exclude = self._in_flight.union(row_id for row_id, _, _ in self._memory)
+                job = self.journal.next_due(time.time(), exclude)
+                if job is not None:
+                    self._in_flight.add(job[0])
+                    return job
+                next_attempt = self.journal.next_attempt_time(exclude)
+                wait = self.poll_interval if next_attempt is None else next_attempt - time.time()
+                self._condition.wait(min(max(wait, 0.0), self.poll_interval))
+        return None
+
+    def _run(self):
+        while True:
+            job = self._claim()
+            if job is None:
+                return
+            try:
+                self._process(*job)
+            finally:
+                with self._condition:
+                    self._in_flight.discard(job[0])
+                    self._condition.notify()
+
+    def _persist(self, image, status):
+        if self.persist_folder is None or not isinstance(image, EncodedImage):
+            return
+        try:
+            status_folder = os.path.join(self.persist_folder, status)
+            os.makedirs(status_folder, exist_ok=True)
+            with open(os.path.join(status_folder, image.name), "wb") as f:
+                f.write(image.data)
+        except OSError as e:
+            print(f"Error saving {image}: {e}")
+
+    def _process(self, row_id, image, status, attempts):
+        if isinstance(image, EncodedImage):
+            if attempts == 0:
+                self._persist(image, status)
+        elif not os.path.exists(image):
+            print(f"Upload skipped, {image} does not exist anymore")
+            self.journal.remove(row_id)
+            return
+
+        try:
+            url = self.upload(image, status)
+        except Exception as e:
+            print(f"Error uploading {image}: {e}")
+            url = None
+
+        if not url:
+            with self._condition:
+                self.failures += 1
+            delay = min(self.backoff * 2 ** attempts, self.max_backoff)
+            self.journal.retry(row_id, time.time() + delay)
+            print(f"Upload of {image} failed, retry in {delay:.1f}s")
+            return
+
+        if self.on_uploaded is not None:
+            try:
+                self.on_uploaded(url, status)
+            except Exception as e:
+                print(f"Error after upload of {image}: {e}")
+        # removed last: a crash in between uploads the image again on restart rather than losing its alert
+        self.journal.remove(row_id)
+        with self._condition:
+            self.uploaded += 1
+
+
+class LocalUploader:
+    """
+    stand-in for Cloudinary: copy the image to `folder`/<status>/ and return its file:// URL
+    """
+
+    def __init__(self, folder="uploads"):
+        self.folder = folder
+
+    def upload(self, image, status):
+        status_folder = os.path.join(self.folder, status)
+        os.makedirs(status_folder, exist_ok=True)
+        if isinstance(image, EncodedImage):
+            target = os.path.join(status_folder, image.name)
+            with open(target, "wb") as f:
+                f.write(image.data)
+        else:
+            target = shutil.copy(image, os.path.join(status_folder, os.path.basename(image)))
+        return "file://" + os.path.abspath(target)